@@ -0,0 +1,15 @@
+import hashlib
+
+# Content hashes of input files, shared by the agents and the controller:
+# template feature/preparation caches, upload registry and run checkpoints all
+# key their entries by file content, so a file replaced under the same name
+# is picked up and identical files share one entry.
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,101 @@
+import atexit
+import os
+import queue
+import sys
+import threading
+
+import cv2
+
+# Debug images of the agents (region_selector *_result.png, OCR debug_crops/roi_N.png).
+# PAPERBRAIN_DEBUG_ARTIFACTS selects how many sheets get them:
+#   "off":     none (default)
+#   "sampled": the first sheet, then every PAPERBRAIN_DEBUG_SAMPLE_EVERY-th one
+#   "all":     every sheet
+# Images are encoded and written by one background thread, so the pipeline
+# never waits on PNG encoding. Each file is written under a temporary name and
+# renamed, so the /api/outputs endpoints never list a half-written image.
+DEBUG_LEVELS = ("off", "sampled", "all")
+DEFAULT_DEBUG_LEVEL = os.environ.get("PAPERBRAIN_DEBUG_ARTIFACTS", "off")
+DEFAULT_SAMPLE_EVERY = int(os.environ.get("PAPERBRAIN_DEBUG_SAMPLE_EVERY", "10"))
+# Images waiting to be written; a full queue makes callers wait instead of growing
+MAX_PENDING = 64
+
+
+class ArtifactWriter:
+    """Decides which sheets get debug images and writes them in the background."""
+
+    def __init__(self, level=DEFAULT_DEBUG_LEVEL, sample_every=DEFAULT_SAMPLE_EVERY, max_pending=MAX_PENDING):
+        if level not in DEBUG_LEVELS:
+            raise ValueError(f"Unknown debug artifact level: {level!r} (expected one of {', '.join(DEBUG_LEVELS)})")
+        self.level = level
+        self.sample_every = max(1, sample_every)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._sheets_seen = 0
+        self._thread = None
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def enabled(self):
+        return self.level != "off"
+
+    def wants(self):
+        """Call once per sheet: True if this sheet should get debug images."""
+        if self.level == "all":
+            return True
+        if self.level == "off":
+            return False
+        with self._lock:
+            self._sheets_seen += 1
+            return (self._sheets_seen - 1) % self.sample_every == 0
+
+    def write(self, path, img):
+        """
+        Queues img to be written to path. The array is written as is, later:
+        callers must not modify it afterwards (pass a copy if they will).
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="debug-artifacts", daemon=True)
+                self._thread.start()
+        self._queue.put((path, img))
+
+    def flush(self):
+        """Blocks until every queued image is on disk."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            path, img = self._queue.get()
+            try:
+                ok, buffer = cv2.imencode(os.path.splitext(path)[1] or ".png", img)
+                if not ok:
+                    raise ValueError("encoding failed")
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                tmp_path = f"{path}.part"
+                with open(tmp_path, "wb") as f:
+                    f.write(buffer.tobytes())
+                os.replace(tmp_path, path)
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Could not write debug image {path}: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+
+def get_artifact_writer():
+    """Process-wide ArtifactWriter at the PAPERBRAIN_DEBUG_ARTIFACTS level."""
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = ArtifactWriter()
+            # Pending images still land on disk when the process exits normally
+            atexit.register(_default_writer.flush)
+        return _default_writer
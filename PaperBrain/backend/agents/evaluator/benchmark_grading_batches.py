@@ -0,0 +1,74 @@
+"""
+Benchmark: one model request per question vs. batched multi-question requests.
+
+Starts fake_model_server.py in-process (fixed latency per request plus a small
+cost per graded item, optionally dropping some batch items) and grades the
+same synthetic open-ended answers through Evaluator.evaluate_many at several
+batch sizes. Reports wall time, requests sent, single-question
+fallbacks and whether the grades match the unbatched run.
+
+Usage: python benchmark_grading_batches.py [--questions 40] [--batch-sizes 1 5 10 20]
+           [--latency 0.8] [--item-latency 0.05] [--drop-rate 0.05]
+"""
+import argparse
+import os
+import time
+
+import fake_model_server
+
+# main.py reads its settings at import: fake model, no cache, unthrottled engine
+SERVER, URL = fake_model_server.start_in_background()
+os.environ["GRADING_MODEL_URL"] = URL
+os.environ["GRADING_CACHE"] = "0"
+os.environ.setdefault("GRADING_RATE_PER_SEC", "0")
+
+import main  # noqa: E402
+
+ANSWERS = ["light energy is converted into chemical energy", "energy from the sun is stored as glucose",
+           "plants breathe in oxygen", "chlorophyll absorbs light"]
+
+
+def make_jobs(questions):
+    reference = ANSWERS[0]
+    return [(ANSWERS[i % len(ANSWERS)] + f" (q{i})" * (i % len(ANSWERS) != 0), reference, 4)
+            for i in range(questions)]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--latency", type=float, default=0.8, help="fake model seconds per request")
+    parser.add_argument("--item-latency", type=float, default=0.05, help="extra seconds per batch item")
+    parser.add_argument("--drop-rate", type=float, default=0.05, help="fraction of batch items left out")
+    args = parser.parse_args()
+
+    SERVER.latency = args.latency
+    SERVER.jitter = 0.0
+    SERVER.item_latency = args.item_latency
+    SERVER.drop_rate = args.drop_rate
+    jobs = make_jobs(args.questions)
+
+    print("\n--- Batched grading benchmark ---")
+    print(f"{args.questions} questions, {args.latency}s/request + {args.item_latency}s/item, "
+          f"{main.GRADING_CONCURRENCY} concurrent requests, drop rate {args.drop_rate}")
+
+    baseline, reference = None, None
+    for batch_size in args.batch_sizes:
+        evaluator = main.Evaluator(batch_size=batch_size)
+
+        started = time.perf_counter()
+        grades = evaluator.evaluate_many(jobs)
+        elapsed = time.perf_counter() - started
+        evaluator.close()
+
+        baseline = baseline or elapsed
+        reference = reference or grades
+        requests = evaluator.grading_engine.stats["requests"]
+        print(f"batch size {batch_size:>3}: {elapsed:6.2f}s  speedup {baseline / elapsed:5.2f}x  "
+              f"requests {requests:3d}  fallbacks {evaluator.batch_stats['fallbacks']:3d}  "
+              f"same marks: {[g[0] for g in grades] == [g[0] for g in reference]}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,82 @@
+"""
+Benchmark: serial vs. concurrent grading against the local fake model server.
+
+Starts fake_model_server.py in-process with a simulated latency and rate
+limit, then grades the same synthetic answers once serially (the old
+behaviour) and once through GradingEngine, reporting wall time, retries and
+how many 429s the server handed out.
+
+Usage: python benchmark_grading_engine.py [--questions 40] [--latency 0.5]
+           [--server-rate 6] [--concurrency 8] [--client-rate 5]
+"""
+import argparse
+import os
+import time
+
+import fake_model_server
+
+# main.py reads its settings at import; use the fake model there too
+SERVER, URL = fake_model_server.start_in_background()
+os.environ["GRADING_MODEL_URL"] = URL
+
+import main  # noqa: E402
+from grading_engine import GradingEngine  # noqa: E402
+
+
+def make_jobs(questions):
+    jobs = []
+    for i in range(questions):
+        ref = "abc"[i % 3]
+        student = ref.upper() if i % 4 else "c"  # mostly correct, some wrong
+        jobs.append((student, ref, 1))
+    return jobs
+
+
+def run(engine, jobs):
+    started = time.perf_counter()
+    outcomes = engine.grade_all(jobs)
+    elapsed = time.perf_counter() - started
+    results = [main.parse_grading_response(text) if error is None else None for text, error in outcomes]
+    return elapsed, results
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model seconds per request")
+    parser.add_argument("--server-rate", type=float, default=6.0, help="fake quota, requests/s")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--client-rate", type=float, default=5.0, help="engine token bucket, requests/s")
+    args = parser.parse_args()
+
+    SERVER.latency = args.latency
+    SERVER.jitter = args.latency / 5
+    SERVER.quota = fake_model_server.TokenBucket(args.server_rate)
+    jobs = make_jobs(args.questions)
+    evaluator = main.Evaluator()
+
+    print("\n--- Grading engine benchmark ---")
+    print(f"{args.questions} questions, model latency {args.latency}s, server quota {args.server_rate} req/s")
+
+    configs = [
+        ("serial", dict(max_concurrency=1, rate_per_sec=0)),
+        ("concurrent, no limiter", dict(max_concurrency=args.concurrency, rate_per_sec=0, base_delay=0.2)),
+        ("concurrent + limiter", dict(max_concurrency=args.concurrency, rate_per_sec=args.client_rate,
+                                      base_delay=0.2)),
+    ]
+    baseline, reference = None, None
+    for name, options in configs:
+        SERVER.stats.update(requests=0, rate_limited=0, errors=0)
+        engine = GradingEngine(evaluator.request_grading, **options)
+        elapsed, results = run(engine, jobs)
+        baseline = baseline or elapsed
+        reference = reference or results
+        failed = results.count(None)
+        print(f"{name:<24}: {elapsed:6.2f}s  speedup {baseline / elapsed:5.2f}x  "
+              f"requests {engine.stats['requests']:3d}  retries {engine.stats['retries']:3d}  "
+              f"429s {SERVER.stats['rate_limited']:3d}  failed {failed}  "
+              f"same grades: {results == reference}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
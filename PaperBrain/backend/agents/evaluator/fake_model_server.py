@@ -0,0 +1,222 @@
+"""
+Local stand-in for the Gemini API, for exercising the evaluator offline.
+
+The server grades prompts built by main.py deterministically (full marks when
+the normalized student answer equals the reference, else 0) after a simulated
+latency, and answers 429 when requests exceed its rate limit (plus optional
+random 503s). Batch prompts ("### Item <id>" sections) get a JSON array back;
+--drop-rate leaves some items out to exercise the single-question fallback.
+FakeUploadClient stands in for the Gemini Files API (see upload_registry.py). Point the evaluator at it with GRADING_MODEL_URL:
+
+    python fake_model_server.py --port 8765 --latency 0.5 --rate 4
+    GRADING_MODEL_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from grading_engine import TokenBucket
+
+GRADE_PATTERN = re.compile(
+    r"Reference Answer:\n(?P<ref>.*?)\n\nStudent Answer:\n(?P<student>.*?)\n\nMaximum Marks: (?P<marks>[\d.]+)",
+    re.S)
+ITEM_PATTERN = re.compile(r"^### Item (\d+)\n", re.M)
+
+
+def normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+def grade_prompt(prompt):
+    match = GRADE_PATTERN.search(prompt)
+    if not match:
+        return {"awarded_marks": 0, "feedback": "Could not find an answer to grade."}
+    marks = float(match["marks"])
+    marks = int(marks) if marks.is_integer() else marks
+    if normalize(match["ref"]) == normalize(match["student"]):
+        return {"awarded_marks": marks, "feedback": "Correct."}
+    return {"awarded_marks": 0, "feedback": "Does not match the reference answer."}
+
+
+def split_batch(prompt):
+    """[(item id, item text), ...] of a batch prompt, or [] for a single-question prompt."""
+    parts = ITEM_PATTERN.split(prompt)
+    return [(int(parts[i]), parts[i + 1]) for i in range(1, len(parts) - 1, 2)]
+
+
+class FakeModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, jitter=0.1, rate=0.0, error_rate=0.0, seed=0,
+                 item_latency=0.05, drop_rate=0.0):
+        super().__init__(address, FakeModelHandler)
+        self.latency = latency
+        self.jitter = jitter
+        # Output tokens: every extra graded item adds to the response time
+        self.item_latency = item_latency
+        self.drop_rate = drop_rate
+        # rate <= 0 disables the simulated quota
+        self.quota = TokenBucket(rate) if rate > 0 else None
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "items": 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def admit(self):
+        """Returns the HTTP status to answer with before doing any 'work'."""
+        self._count("requests")
+        if self.quota is not None and not self.quota.try_acquire():
+            self._count("rate_limited")
+            return 429
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+        if failed:
+            self._count("errors")
+            return 503
+        return 200
+
+    def keep_item(self):
+        with self.lock:
+            return self.random.random() >= self.drop_rate
+
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        status = self.server.admit()
+        if status != 200:
+            self._reply(status, {"error": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"})
+            return
+        prompt = "\n".join(part for part in request.get("contents", []) if isinstance(part, str))
+        items = split_batch(prompt)
+        if items:
+            result = [dict(grade_prompt(text), id=item_id) for item_id, text in items if self.server.keep_item()]
+        else:
+            result = grade_prompt(prompt)
+        count = max(1, len(items))
+        for _ in range(count):
+            self.server._count("items")
+        latency = self.server.latency + self.server.item_latency * (count - 1)
+        time.sleep(max(0.0, latency + random.uniform(-self.server.jitter, self.server.jitter)))
+        # Wrap the JSON like the real model often does, so response parsing is exercised too
+        text = "```json\n" + json.dumps(result) + "\n```"
+        self._reply(200, {"text": text})
+
+
+# ---------------- Client ----------------
+class FakeModelError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+
+
+class FakeModelResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModelClient:
+    """Drop-in for genai.GenerativeModel.generate_content against FakeModelServer."""
+
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip("/") + "/generate"
+        self.timeout = timeout
+
+    def generate_content(self, contents):
+        # Uploaded file handles cannot be sent to the fake server; only text parts are
+        payload = {"contents": [part for part in contents if isinstance(part, str)]}
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return FakeModelResponse(json.load(response)["text"])
+        except urllib.error.HTTPError as e:
+            raise FakeModelError(e.code, e.read().decode("utf-8", "replace")) from None
+
+
+class FakeFile:
+    def __init__(self, name, uri, mime_type):
+        self.name = name
+        self.uri = uri
+        self.mime_type = mime_type
+
+
+class FakeUploadClient:
+    """
+    Offline stand-in for the Gemini Files API: uploads take `latency` seconds,
+    handles are remembered in memory and expire after `ttl` seconds.
+    """
+
+    def __init__(self, latency=0.3, ttl=48 * 3600):
+        self.latency = latency
+        self.ttl = ttl
+        self.uploads = 0
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def upload(self, path):
+        time.sleep(self.latency)
+        with self._lock:
+            self.uploads += 1
+            name = f"files/fake-{self.uploads}"
+            self._files[name] = FakeFile(name, f"fake://{name}", "application/octet-stream")
+        record = {"name": name, "uri": f"fake://{name}", "mime_type": "application/octet-stream",
+                  "expires_at": time.time() + self.ttl}
+        return self._files[name], record
+
+    def resolve(self, record):
+        # Handles survive across processes in the registry; re-create unknown ones
+        with self._lock:
+            return self._files.setdefault(record["name"],
+                                          FakeFile(record["name"], record["uri"], record["mime_type"]))
+
+
+def start_in_background(port=0, **options):
+    """Starts a FakeModelServer on a daemon thread; returns (server, url)."""
+    server = FakeModelServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--rate", type=float, default=0.0, help="requests/s before answering 429 (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--item-latency", type=float, default=0.05, help="extra seconds per additional batch item")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of batch items left out of responses")
+    args = parser.parse_args()
+
+    server = FakeModelServer(("127.0.0.1", args.port), latency=args.latency, jitter=args.jitter,
+                             rate=args.rate, error_rate=args.error_rate,
+                             item_latency=args.item_latency, drop_rate=args.drop_rate)
+    print(f"Fake model server listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStats: {server.stats}")
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Persistent cache of LLM grades. Objective sections repeat the same few
+# answers across a cohort, so (prompt, reference, student answer, marks,
+# context docs) -> (awarded_marks, feedback) is looked up before calling the
+# model. Entries expire after a TTL, and the least recently used ones are
+# evicted once the cache grows past max_entries. Eviction scans the table, so
+# it runs every EVICT_EVERY inserts and once when the cache is closed rather
+# than on every insert (expired rows are never returned by get in between).
+
+# Inserts between two eviction passes
+EVICT_EVERY = 1000
+
+DOC_EXTENSIONS = (".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".webp")
+
+
+def normalize_answer(answer, casefold=False):
+    """
+    Whitespace does not change a grade (see prompt.txt). Case only does not
+    for MCQ options; elsewhere it can ("NaCl" vs "nacl", "Pa" vs "pa").
+    """
+    answer = " ".join(str(answer).split())
+    return answer.casefold() if casefold else answer
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def docs_fingerprint(folder):
+    """Content hash over the related docs, so adding/changing a doc invalidates grades."""
+    digest = hashlib.sha256()
+    if os.path.isdir(folder):
+        for filename in sorted(os.listdir(folder)):
+            path = os.path.join(folder, filename)
+            if not os.path.isfile(path) or os.path.splitext(filename)[1].lower() not in DOC_EXTENSIONS:
+                continue
+            digest.update(filename.encode("utf-8"))
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def grading_key(prompt_version, ref_ans, student_ans, max_marks, docs_version, answer_type=None):
+    """Cache key of one grading job; answer_type is the question's rule_grader type."""
+    payload = json.dumps([prompt_version, str(ref_ans).strip(),
+                          normalize_answer(student_ans, casefold=answer_type == "mcq"),
+                          max_marks, docs_version])
+    return text_digest(payload)
+
+
+class GradingCache:
+    """SQLite-backed grade cache with TTL expiry and LRU eviction. Safe to share between threads."""
+
+    def __init__(self, path, ttl_seconds=30 * 24 * 3600, max_entries=100000, evict_every=EVICT_EVERY):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self.hits = 0
+        self.misses = 0
+        # Inserts since the last eviction pass
+        self._puts = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS grades ("
+            " key TEXT PRIMARY KEY, awarded_marks TEXT NOT NULL, feedback TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS grades_last_used ON grades (last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS grades_created_at ON grades (created_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Returns (awarded_marks, feedback) or None; counts the hit/miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT awarded_marks, feedback, created_at FROM grades WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM grades WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE grades SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0]), row[1]
+
+    def put(self, key, awarded_marks, feedback):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO grades (key, awarded_marks, feedback, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)", (key, json.dumps(awarded_marks), feedback, now, now))
+            self._puts += 1
+            if self._puts >= self.evict_every:
+                self._evict(now)
+            self._conn.commit()
+
+    def evict(self):
+        """Drops expired and over-capacity entries if anything was inserted since the last pass."""
+        with self._lock:
+            if self._puts:
+                self._evict(time.time())
+                self._conn.commit()
+
+    def _evict(self, now):
+        self._puts = 0
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM grades WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM grades").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM grades WHERE key IN (SELECT key FROM grades ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM grades").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self)}
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
@@ -1,37 +1,70 @@
 import os
+import sys
 import json
 import csv
+import threading
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from grading_engine import GradingEngine
+from grading_cache import GradingCache, docs_fingerprint, grading_key, text_digest
+import rule_grader
+from upload_registry import GeminiUploadClient, UploadRegistry
+from results_store import ResultsStore
+
 # ---------------- Environment Setup ----------------
 load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in .env file!")
-
-genai.configure(api_key=API_KEY)
 MODEL_NAME = "gemini-2.5-flash"
-model = genai.GenerativeModel(MODEL_NAME)
+# Offline runs: point GRADING_MODEL_URL at fake_model_server.py instead of Gemini
+MODEL_URL = os.getenv("GRADING_MODEL_URL")
+if MODEL_URL:
+    from fake_model_server import FakeModelClient, FakeUploadClient
+    model = FakeModelClient(MODEL_URL)
+    upload_client = FakeUploadClient()
+else:
+    API_KEY = os.getenv("GEMINI_API_KEY")
+    if not API_KEY:
+        raise ValueError("GEMINI_API_KEY not found in .env file!")
+
+    genai.configure(api_key=API_KEY)
+    model = genai.GenerativeModel(MODEL_NAME)
+    upload_client = GeminiUploadClient()
+
+# Grading engine: concurrent requests per run, rate limit (requests/s) and retries on 429/5xx
+GRADING_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY", "4"))
+GRADING_RATE_PER_SEC = float(os.getenv("GRADING_RATE_PER_SEC", "2"))
+GRADING_MAX_RETRIES = int(os.getenv("GRADING_MAX_RETRIES", "5"))
+# Questions packed into one model request (1 = one request per question)
+GRADING_BATCH_SIZE = int(os.getenv("GRADING_BATCH_SIZE", "1"))
+
+# Grade cache: reuse earlier grades of identical (reference, answer, marks) triples
+GRADING_CACHE_ENABLED = os.getenv("GRADING_CACHE", "1") != "0"
+GRADING_CACHE_TTL_DAYS = float(os.getenv("GRADING_CACHE_TTL_DAYS", "30"))
+GRADING_CACHE_MAX_ENTRIES = int(os.getenv("GRADING_CACHE_MAX_ENTRIES", "100000"))
+# Local rule tier (MCQ / numeric / exact short answers) before cache and LLM
+GRADING_RULES_ENABLED = os.getenv("GRADING_RULES", "1") != "0"
+# Parallel uploads of related docs that are not in the upload registry yet
+GRADING_UPLOAD_WORKERS = int(os.getenv("GRADING_UPLOAD_WORKERS", "4"))
+# Opt-in: rewrite evaluation_results.json / student_answers.json from the results
+# store after each run. That costs O(whole history) per run; the results API reads
+# the store directly, and `python main.py --export-json` exports on demand.
+RESULTS_EXPORT_JSON = os.getenv("RESULTS_EXPORT_JSON", "0") == "1"
 
 # ---------------- Paths ----------------
-INCOMING_FOLDER = "../text_recognition/Outputs"
-TEMP_DIR = "./temp"
-INPUTS_DIR = "./inputs"
-PROMPTS_DIR = "./prompts"
-RESULTS_DIR = "./results"
-
-STUDENT_FILE = os.path.join(INPUTS_DIR, "student_answers.json")
-REFERENCE_FILE = os.path.join(INPUTS_DIR, "reference_answers.json")
-PROMPT_FILE = os.path.join(PROMPTS_DIR, "prompt.txt")
-DOCS_FOLDER = os.path.join(INPUTS_DIR, "related_docs")
-CSV_FILE = os.path.join(RESULTS_DIR, "evaluation_results.csv")
-JSON_FILE = os.path.join(RESULTS_DIR, "evaluation_results.json")
-CURRENT_STUDENT_FILE = os.path.join(TEMP_DIR, "current_student.json")
+# Relative to this file, so the evaluator can be imported from any working directory
+EVALUATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+# Per-session data (inputs/temp/results) and OCR outputs. Each Evaluator gets
+# its own (the controller points them into the session workspace); these are
+# the defaults, which the controller sets for `python main.py` runs.
+# Prompts and caches stay next to this file.
+WORK_DIR = os.getenv("EVALUATOR_WORK_DIR") or EVALUATOR_DIR
+INCOMING_FOLDER = os.getenv("EVALUATOR_INCOMING_DIR") or os.path.join(EVALUATOR_DIR, "..", "text_recognition", "Outputs")
+PROMPTS_DIR = os.path.join(EVALUATOR_DIR, "prompts")
+CACHE_DIR = os.path.join(EVALUATOR_DIR, "cache")
 
-# Ensure directories exist
-for path in [INCOMING_FOLDER, TEMP_DIR, INPUTS_DIR, PROMPTS_DIR, DOCS_FOLDER, RESULTS_DIR]:
-    os.makedirs(path, exist_ok=True)
+PROMPT_FILE = os.path.join(PROMPTS_DIR, "prompt.txt")
+GRADING_CACHE_FILE = os.path.join(CACHE_DIR, "grading_cache.sqlite")
+UPLOAD_REGISTRY_FILE = os.path.join(CACHE_DIR, "upload_registry.json")
 
 # ---------------- Helper Functions ----------------
 def load_json(path):
@@ -45,45 +78,15 @@ def save_json(path, data):
         json.dump(data, f, indent=4, ensure_ascii=False)
 
 # ---------------- Initial Setup ----------------
-reference_answers = load_json(REFERENCE_FILE)
-
 with open(PROMPT_FILE, "r", encoding="utf-8") as f:
     BASE_PROMPT = f.read()
 
-# ---------------- Upload Related Docs ----------------
-def upload_related_docs(folder_path):
-    uploaded_files = []
-    if not os.path.exists(folder_path):
-        return uploaded_files
-
-    SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".webp"]
-    print("Starting document and image upload for context...")
-
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        if not os.path.isfile(file_path):
-            continue
-        ext = os.path.splitext(filename)[1].lower()
-        if ext not in SUPPORTED_EXTENSIONS:
-            print(f"Skipping unsupported file type: {filename}")
-            continue
-        print(f"Uploading file: {filename}")
-        try:
-            uploaded_file = genai.upload_file(path=file_path)
-            uploaded_files.append(uploaded_file)
-        except Exception as e:
-            print(f"Failed to upload {filename}: {e}")
-
-    print(f"Uploaded {len(uploaded_files)} context files.")
-    return uploaded_files
-
-related_docs = upload_related_docs(DOCS_FOLDER)
-if not related_docs:
-    print("No context documents found. Grading will rely only on prompt and answers.\n")
+# Cache keys change whenever the prompt, model or related docs change
+PROMPT_VERSION = text_digest(f"{MODEL_URL or MODEL_NAME}\n{BASE_PROMPT}")
 
 # ---------------- Gemini Evaluation ----------------
-def evaluate_with_gemini(student_ans, ref_ans, max_marks):
-    full_prompt = f"""{BASE_PROMPT}
+def build_grading_prompt(student_ans, ref_ans, max_marks):
+    return f"""{BASE_PROMPT}
 
 Reference Answer:
 {ref_ans}
@@ -96,144 +99,466 @@ Maximum Marks: {max_marks}
 Use any additional context from the uploaded related documents to ensure more accurate grading.
 """
 
-    contents = [full_prompt]
-    if related_docs:
-        contents.extend(related_docs)
+BATCH_INSTRUCTIONS = """This request contains several independent answers to grade, each under its own
+"### Item <id>" heading. Grade every item on its own, exactly as described above.
+Instead of a single JSON object, return strictly one JSON array with one object per item:
+[
+  {"id": <item id>, "awarded_marks": <number>, "feedback": "<short_feedback>"}
+]"""
 
-    try:
-        response = model.generate_content(contents=contents)
-        text = response.text.strip()
-
-        start, end = text.find("{"), text.rfind("}")
-        if start != -1 and end != -1:
-            json_str = text[start:end + 1]
-            result = json.loads(json_str)
-            return result.get("awarded_marks", 0), result.get("feedback", "")
-        else:
-            return 0, f"Invalid response format. Raw text: {text[:100]}..."
-    except Exception as e:
-        return 0, f"API Error: {str(e)}"
-
-# ---------------- Process One File ----------------
-def process_student_file(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        student_entry = json.load(f)
-
-    student_info = student_entry.get("student_info", {})
-    student_answers = student_entry.get("answers", {})
-    student_name = student_info.get("name", "")
-    roll_no = student_info.get("roll_no", "")
-
-    print(f"Evaluating student: {student_name} ({roll_no})")
-
-    total_awarded = 0
-    total_possible = 0
-    answers = {}
-
-    for qno, student_ans in student_answers.items():
-        ref_info = reference_answers.get(str(qno))
-        if not ref_info:
-            answers[qno] = {
-                "answer": student_ans,
-                "awarded_marks": 0,
-                "max_marks": 0,
-                "feedback": "No reference answer found"
-            }
-            continue
+def build_batch_prompt(jobs):
+    items = "\n".join(
+        f"""### Item {i}
 
-        ref_ans = ref_info["answer"]
-        max_marks = ref_info["marks"]
+Reference Answer:
+{ref_ans}
 
-        print(f"Processing Question {qno}...")
-        awarded, feedback = evaluate_with_gemini(student_ans, ref_ans, max_marks)
+Student Answer:
+{student_ans}
 
-        total_awarded += awarded
-        total_possible += max_marks
+Maximum Marks: {max_marks}
+""" for i, (student_ans, ref_ans, max_marks) in enumerate(jobs, 1))
+    return f"""{BASE_PROMPT}
 
-        answers[qno] = {
-            "answer": student_ans,
-            "awarded_marks": awarded,
-            "max_marks": max_marks,
-            "feedback": feedback
-        }
+{BATCH_INSTRUCTIONS}
 
-    updated_data = {
-        "student_info": student_info,
-        "total_awarded_marks": total_awarded,
-        "total_possible_marks": total_possible,
-        "answers": answers
-    }
+{items}
+Use any additional context from the uploaded related documents to ensure more accurate grading.
+"""
 
-    save_json(CURRENT_STUDENT_FILE, updated_data)
+def extract_grading_json(text):
+    """The {...} object in a model response, or None if there is no valid one."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1:
+        return None
+    try:
+        result = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return result if isinstance(result, dict) else None
+
+def parse_grading_response(text):
+    result = extract_grading_json(text)
+    if result is None:
+        return 0, f"Invalid response format. Raw text: {text[:100]}..."
+    return result.get("awarded_marks", 0), result.get("feedback", "")
+
+def parse_batch_response(text, jobs):
+    """
+    Per-item (awarded, feedback) from a batch response, in job order. Items that
+    are missing, duplicated or invalid (marks not a number in [0, max_marks])
+    come back as None so they can be re-graded one by one.
+    """
+    parsed = [None] * len(jobs)
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end == -1:
+        return parsed
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return parsed
+    if not isinstance(items, list):
+        return parsed
+
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id = item.get("id")
+        if not isinstance(item_id, int) or not 1 <= item_id <= len(jobs) or item_id in seen:
+            continue
+        seen.add(item_id)
+        awarded = item.get("awarded_marks")
+        max_marks = jobs[item_id - 1][2]
+        if isinstance(awarded, bool) or not isinstance(awarded, (int, float)) or not 0 <= awarded <= max_marks:
+            continue
+        parsed[item_id - 1] = (awarded, str(item.get("feedback", "")))
+    return parsed
+
+# ---------------- Evaluator ----------------
+class Evaluator:
+    """
+    Grades the OCR outputs in incoming_dir into the results under work_dir
+    (inputs/temp/results). Holds the per-run state: reference answers, related
+    docs, grading engine, grade cache and counters. The model client, prompt
+    and settings above are loaded once per process and shared.
+    """
+
+    def __init__(self, work_dir=None, incoming_dir=None, batch_size=GRADING_BATCH_SIZE):
+        self.work_dir = work_dir or WORK_DIR
+        self.incoming_folder = incoming_dir or INCOMING_FOLDER
+        self.temp_dir = os.path.join(self.work_dir, "temp")
+        self.inputs_dir = os.path.join(self.work_dir, "inputs")
+        self.results_dir = os.path.join(self.work_dir, "results")
+
+        self.student_file = os.path.join(self.inputs_dir, "student_answers.json")
+        self.reference_file = os.path.join(self.inputs_dir, "reference_answers.json")
+        self.docs_folder = os.path.join(self.inputs_dir, "related_docs")
+        self.csv_file = os.path.join(self.results_dir, "evaluation_results.csv")
+        self.json_file = os.path.join(self.results_dir, "evaluation_results.json")
+        self.results_db_file = os.path.join(self.results_dir, "results.sqlite")
+        self.current_student_file = os.path.join(self.temp_dir, "current_student.json")
+        self.run_summary_file = os.path.join(self.results_dir, "run_summary.json")
+
+        # Ensure directories exist
+        for path in [self.incoming_folder, self.temp_dir, self.inputs_dir, self.docs_folder, self.results_dir]:
+            os.makedirs(path, exist_ok=True)
+
+        self.reference_answers = load_json(self.reference_file)
+        self.upload_registry = UploadRegistry(UPLOAD_REGISTRY_FILE, upload_client, max_workers=GRADING_UPLOAD_WORKERS)
+        # Uploaded lazily on the first model request; runs graded entirely by the
+        # rule tier or the cache never touch the Files API.
+        self.related_docs = None
+        self.related_docs_lock = threading.Lock()
+
+        self.grading_engine = GradingEngine(self.send_prompt, max_concurrency=GRADING_CONCURRENCY,
+                                            rate_per_sec=GRADING_RATE_PER_SEC, max_retries=GRADING_MAX_RETRIES)
+        self.docs_version = docs_fingerprint(self.docs_folder)
+        self.grading_cache = None
+        self.cache_stats = {"enabled": False}
+        if GRADING_CACHE_ENABLED:
+            self.grading_cache = GradingCache(GRADING_CACHE_FILE, ttl_seconds=GRADING_CACHE_TTL_DAYS * 24 * 3600,
+                                              max_entries=GRADING_CACHE_MAX_ENTRIES)
+
+        # Questions packed into one model request (1 = one request per question)
+        self.batch_size = batch_size
+        # Questions decided by each tier in this run: rule_grader, grade cache, LLM call
+        self.tier_counts = {"rule": 0, "cache": 0, "llm": 0}
+        # Batched requests sent, questions they settled, and questions re-sent on their own
+        self.batch_stats = {"batch_size": batch_size, "batches": 0, "batched_items": 0, "fallbacks": 0}
+
+    def close(self):
+        """Closes the grade cache (its counters stay in the run summary)."""
+        if self.grading_cache is not None:
+            # Once per run; the entry count in the summary is after eviction
+            self.grading_cache.evict()
+            self.cache_stats = self.grading_cache.stats()
+            self.grading_cache.close()
+            self.grading_cache = None
+
+    # ---------------- Upload Related Docs ----------------
+    def upload_related_docs(self, folder_path):
+        """Handles for the docs in folder_path; unchanged docs are reused from earlier runs."""
+        if not os.path.exists(folder_path):
+            return []
+
+        SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".webp"]
+        print("Starting document and image upload for context...")
+
+        file_paths = []
+        for filename in sorted(os.listdir(folder_path)):
+            file_path = os.path.join(folder_path, filename)
+            if not os.path.isfile(file_path):
+                continue
+            ext = os.path.splitext(filename)[1].lower()
+            if ext not in SUPPORTED_EXTENSIONS:
+                print(f"Skipping unsupported file type: {filename}")
+                continue
+            file_paths.append(file_path)
+
+        uploaded_files = self.upload_registry.get_or_upload(file_paths)
+        stats = self.upload_registry.stats
+        print(f"Context files ready: {len(uploaded_files)} "
+              f"({stats['uploaded']} uploaded, {stats['reused']} reused).")
+        return uploaded_files
 
-    os.remove(file_path)
-    print(f"Removed processed file: {file_path}")
+    def get_related_docs(self):
+        with self.related_docs_lock:
+            if self.related_docs is None:
+                self.related_docs = self.upload_related_docs(self.docs_folder)
+                if not self.related_docs:
+                    print("No context documents found. Grading will rely only on prompt and answers.\n")
+        return self.related_docs
+
+    # ---------------- Gemini Evaluation ----------------
+    def send_prompt(self, prompt):
+        """One model call; returns the raw response text and raises on API errors."""
+        contents = [prompt]
+        docs = self.get_related_docs()
+        if docs:
+            contents.extend(docs)
 
-    return updated_data
+        response = model.generate_content(contents=contents)
+        return response.text.strip()
+
+    def request_grading(self, student_ans, ref_ans, max_marks):
+        return self.send_prompt(build_grading_prompt(student_ans, ref_ans, max_marks))
+
+    def cache_key(self, student_ans, ref_ans, max_marks, answer_type=None):
+        return grading_key(PROMPT_VERSION, ref_ans, student_ans, max_marks, self.docs_version, answer_type)
+
+    def grade_with_model(self, jobs):
+        """
+        Model grades for [(student_ans, ref_ans, max_marks), ...] as [((awarded, feedback), ok), ...],
+        where ok means the model returned a well-formed grade. With batch_size > 1
+        the jobs go out in batches first; items a batch did not settle fall back to
+        single-question requests.
+        """
+        results = [None] * len(jobs)
+        single = list(range(len(jobs)))
+        if self.batch_size > 1 and len(jobs) > 1:
+            chunks = [single[i:i + self.batch_size] for i in range(0, len(jobs), self.batch_size)]
+            batches = [chunk for chunk in chunks if len(chunk) > 1]
+            single = [chunk[0] for chunk in chunks if len(chunk) == 1]
+            outcomes = self.grading_engine.grade_all(
+                [(build_batch_prompt([jobs[j] for j in batch]),) for batch in batches])
+            for batch, (text, error) in zip(batches, outcomes):
+                self.batch_stats["batches"] += 1
+                batch_jobs = [jobs[j] for j in batch]
+                parsed = parse_batch_response(text, batch_jobs) if error is None else [None] * len(batch)
+                for j, grade in zip(batch, parsed):
+                    if grade is None:
+                        single.append(j)
+                        self.batch_stats["fallbacks"] += 1
+                    else:
+                        results[j] = (grade, True)
+                        self.batch_stats["batched_items"] += 1
+            single.sort()
+
+        outcomes = self.grading_engine.grade_all([(build_grading_prompt(*jobs[j]),) for j in single])
+        for j, (text, error) in zip(single, outcomes):
+            if error is not None:
+                results[j] = ((0, f"API Error: {str(error)}"), False)
+            else:
+                results[j] = (parse_grading_response(text), extract_grading_json(text) is not None)
+        return results
+
+    def evaluate_with_gemini(self, student_ans, ref_ans, max_marks):
+        return self.evaluate_many([(student_ans, ref_ans, max_marks)])[0]
+
+    def evaluate_many(self, jobs, answer_types=None):
+        """
+        Grades [(student_ans, ref_ans, max_marks), ...]; returns [(awarded, feedback), ...]
+        in the same order. answer_types holds each job's rule_grader type (MCQ
+        answers share cache entries across letter case). Cached grades are
+        returned directly, identical jobs are sent once, and the rest go to the
+        model concurrently (batched when batch_size > 1). Only well-formed model
+        answers are cached.
+        """
+        graded = [None] * len(jobs)
+        answer_types = answer_types or [None] * len(jobs)
+        to_grade = {}  # cache key -> (job, [indexes waiting on it])
+        for i, (job, answer_type) in enumerate(zip(jobs, answer_types)):
+            key = self.cache_key(*job, answer_type)
+            cached = self.grading_cache.get(key) if self.grading_cache is not None else None
+            if cached is not None:
+                graded[i] = cached
+                self.tier_counts["cache"] += 1
+            else:
+                self.tier_counts["llm"] += 1
+                to_grade.setdefault(key, (job, []))[1].append(i)
+
+        keys = list(to_grade)
+        for key, (result, ok) in zip(keys, self.grade_with_model([to_grade[key][0] for key in keys])):
+            if ok and self.grading_cache is not None:
+                self.grading_cache.put(key, *result)
+            for i in to_grade[key][1]:
+                graded[i] = result
+        return graded
+
+    def run_summary(self):
+        return {
+            "grading_tiers": dict(self.tier_counts),
+            "grading_requests": dict(self.grading_engine.stats),
+            "grading_batches": dict(self.batch_stats),
+            "context_uploads": dict(self.upload_registry.stats),
+            "grading_cache": self.grading_cache.stats() if self.grading_cache is not None else self.cache_stats,
+        }
 
-# ---------------- Main Processing ----------------
-def process_all_students():
-    files = sorted(
-        [os.path.join(INCOMING_FOLDER, f) for f in os.listdir(INCOMING_FOLDER) if f.endswith(".json")],
-        key=os.path.getctime
-    )
+    # ---------------- Process One File ----------------
+    def process_student_file(self, file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            student_entry = json.load(f)
+
+        student_info = student_entry.get("student_info", {})
+        student_answers = student_entry.get("answers", {})
+        student_name = student_info.get("name", "")
+        roll_no = student_info.get("roll_no", "")
+
+        print(f"Evaluating student: {student_name} ({roll_no})")
+
+        total_awarded = 0
+        total_possible = 0
+        answers = {}
+        pending = []  # (qno, grading job, answer type) for questions that go to the model
+
+        for qno, student_ans in student_answers.items():
+            ref_info = self.reference_answers.get(str(qno))
+            if not ref_info:
+                answers[qno] = {
+                    "answer": student_ans,
+                    "awarded_marks": 0,
+                    "max_marks": 0,
+                    "feedback": "No reference answer found"
+                }
+                continue
+
+            ref_ans = ref_info["answer"]
+            max_marks = ref_info["marks"]
+
+            total_possible += max_marks
+
+            decided = rule_grader.grade(student_ans, ref_info) if GRADING_RULES_ENABLED else None
+            if decided is not None:
+                self.tier_counts["rule"] += 1
+                awarded, feedback = decided
+                total_awarded += awarded
+            else:
+                # Placeholder keeps the question order; filled in once graded
+                awarded, feedback = 0, ""
+                pending.append((qno, (student_ans, ref_ans, max_marks), rule_grader.answer_type(ref_info)))
 
-    if not files:
-        print("No new student submissions found.")
-        return
+            answers[qno] = {
+                "answer": student_ans,
+                "awarded_marks": awarded,
+                "max_marks": max_marks,
+                "feedback": feedback
+            }
 
-    print(f"Found {len(files)} submissions to process.\n")
+        if pending:
+            print(f"Grading {len(pending)} question(s) with the model, "
+                  f"up to {self.grading_engine.max_concurrency} at a time...")
+        grades = self.evaluate_many([job for _, job, _ in pending], [answer_type for _, _, answer_type in pending])
+        for (qno, _, _), (awarded, feedback) in zip(pending, grades):
+            total_awarded += awarded
+            answers[qno]["awarded_marks"] = awarded
+            answers[qno]["feedback"] = feedback
+
+        updated_data = {
+            "student_info": student_info,
+            "total_awarded_marks": total_awarded,
+            "total_possible_marks": total_possible,
+            "answers": answers
+        }
 
-    # Safe load of current_student.json
-    if os.path.exists(CURRENT_STUDENT_FILE):
+        save_json(self.current_student_file, updated_data)
+
+        return updated_data
+
+    # ---------------- Commit One Student ----------------
+    def append_csv_rows(self, student_record):
+        csv_exists = os.path.exists(self.csv_file)
+        with open(self.csv_file, "a", newline='', encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if not csv_exists or os.path.getsize(self.csv_file) == 0:
+                writer.writerow(["Student Name", "Roll No", "Question No", "Student Answer",
+                                 "Reference Answer", "Max Marks", "Awarded Marks", "Feedback"])
+            for qno, details in student_record["answers"].items():
+                writer.writerow([
+                    student_record["student_info"].get("name", ""),
+                    student_record["student_info"].get("roll_no", ""),
+                    qno,
+                    details["answer"],
+                    self.reference_answers.get(qno, {}).get("answer", "N/A"),
+                    details["max_marks"],
+                    details["awarded_marks"],
+                    details["feedback"]
+                ])
+
+    def commit_student(self, results_store, file_path, student_record):
+        """
+        Records one graded student (results store + CSV) and only then removes its
+        input file, so a crash later in the batch keeps every committed student and
+        a re-run picks up exactly the ones that were not committed.
+        """
+        results_store.append_student(student_record)
+        self.append_csv_rows(student_record)
+
+        os.remove(file_path)
+        print(f"Removed processed file: {file_path}")
+
+    # ---------------- Main Processing ----------------
+    def open_results_store(self):
+        results_store = ResultsStore(self.results_db_file)
+        migrated = results_store.import_json(self.json_file)
+        if migrated:
+            print(f"Imported {migrated} existing result(s) from {self.json_file} into the results store.")
+        return results_store
+
+    def grade_and_commit(self, results_store, file_path):
+        """Grades one OCR output and records it; returns the student record, or None if grading failed."""
         try:
-            if os.path.getsize(CURRENT_STUDENT_FILE) > 0:
-                with open(CURRENT_STUDENT_FILE, "r", encoding="utf-8") as f:
-                    content = f.read().strip()
-                    current_data = json.loads(content) if content else {}
-            else:
-                current_data = {}
+            student_record = self.process_student_file(file_path)
         except Exception as e:
-            print(f"Warning: Failed to load current_student.json ({e}), starting fresh.")
-            current_data = {}
-    else:
-        current_data = {}
-
-    for file_path in files:
-        current_data = process_student_file(file_path)
-
-    # Save to cumulative result files
-    student_data = load_json(STUDENT_FILE)
-    master_results = load_json(JSON_FILE)
-
-    student_data.setdefault("students", []).append(current_data)
-    master_results.setdefault("students", []).append(current_data)
-    save_json(STUDENT_FILE, student_data)
-    save_json(JSON_FILE, master_results)
-
-    csv_exists = os.path.exists(CSV_FILE)
-    with open(CSV_FILE, "a", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if not csv_exists or os.path.getsize(CSV_FILE) == 0:
-            writer.writerow(["Student Name", "Roll No", "Question No", "Student Answer",
-                             "Reference Answer", "Max Marks", "Awarded Marks", "Feedback"])
-        for qno, details in current_data["answers"].items():
-            writer.writerow([
-                current_data["student_info"].get("name", ""),
-                current_data["student_info"].get("roll_no", ""),
-                qno,
-                details["answer"],
-                reference_answers.get(qno, {}).get("answer", "N/A"),
-                details["max_marks"],
-                details["awarded_marks"],
-                details["feedback"]
-            ])
-
-    print(f"\nEvaluation complete for {current_data['student_info'].get('name', 'Unknown Student')}")
-    print(f"Final Score: {current_data['total_awarded_marks']}/{current_data['total_possible_marks']}")
-    print(f"Current student record saved at: {CURRENT_STUDENT_FILE}")
-    print("Updated results saved in JSON and CSV.")
+            # Leave the file in place so the next run retries it
+            print(f"Error: Failed to evaluate {file_path}: {e}")
+            return None
+        self.commit_student(results_store, file_path, student_record)
+        print(f"Final Score: {student_record['total_awarded_marks']}/{student_record['total_possible_marks']}\n")
+        return student_record
+
+    def export_results_json(self, results_store):
+        results_store.export_json(self.json_file)
+        results_store.export_json(self.student_file)
+        print(f"Exported results to {self.json_file}")
+
+    def close_results_store(self, results_store, committed):
+        try:
+            if RESULTS_EXPORT_JSON and committed:
+                self.export_results_json(results_store)
+            results_store.close()
+        finally:
+            # Grading is over for this run
+            self.close()
+
+    def export_all_results(self):
+        """On-demand export of the whole results store to the JSON files."""
+        results_store = self.open_results_store()
+        try:
+            self.export_results_json(results_store)
+        finally:
+            results_store.close()
+            self.close()
+
+    def report_run(self, found, committed):
+        print(f"\nEvaluation complete: {committed}/{found} student(s) recorded")
+        print(f"Last student record saved at: {self.current_student_file}")
+        print(f"Updated results saved in {self.results_db_file} and CSV.")
+
+        summary = self.run_summary()
+        summary["students"] = {"found": found, "recorded": committed}
+        save_json(self.run_summary_file, summary)
+        stats = summary["grading_requests"]
+        print(f"Grading requests: {stats['requests']} (retries: {stats['retries']}, failures: {stats['failures']})")
+        tiers = summary["grading_tiers"]
+        print(f"Questions graded by rules: {tiers['rule']}, cache: {tiers['cache']}, LLM: {tiers['llm']}")
+        if self.batch_size > 1:
+            batches = summary["grading_batches"]
+            print(f"Batched requests: {batches['batches']} ({batches['batched_items']} question(s), "
+                  f"{batches['fallbacks']} re-sent individually)")
+        if GRADING_CACHE_ENABLED:
+            cache_stats = summary["grading_cache"]
+            print(f"Grading cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es), "
+                  f"{cache_stats['entries']} entries")
+        return summary
+
+    def process_all_students(self):
+        files = sorted(
+            [os.path.join(self.incoming_folder, f) for f in os.listdir(self.incoming_folder) if f.endswith(".json")],
+            key=os.path.getctime
+        )
+
+        if not files:
+            print("No new student submissions found.")
+            self.close()
+            return
+
+        print(f"Found {len(files)} submissions to process.\n")
+
+        results_store = self.open_results_store()
+        committed = 0
+        try:
+            for file_path in files:
+                if self.grade_and_commit(results_store, file_path) is not None:
+                    committed += 1
+        finally:
+            self.close_results_store(results_store, committed)
+
+        self.report_run(len(files), committed)
 
 # ---------------- Run Script ----------------
 if __name__ == "__main__":
-    process_all_students()
+    if "--export-json" in sys.argv[1:]:
+        Evaluator().export_all_results()
+    else:
+        Evaluator().process_all_students()
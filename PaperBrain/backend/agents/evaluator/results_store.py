@@ -0,0 +1,150 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Append-only store for graded students. Each run appends its students in one
+# transaction instead of re-reading and rewriting evaluation_results.json,
+# and readers (the results API) page through it with indexed queries.
+# evaluation_results.json is still produced, as an export of the store.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    roll_no TEXT,
+    name TEXT,
+    total_awarded NUMERIC,
+    total_possible NUMERIC,
+    record TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS students_roll_no ON students (roll_no);
+CREATE TABLE IF NOT EXISTS answers (
+    student_id INTEGER NOT NULL REFERENCES students (id),
+    roll_no TEXT,
+    question TEXT,
+    answer TEXT,
+    awarded_marks NUMERIC,
+    max_marks NUMERIC,
+    feedback TEXT
+);
+CREATE INDEX IF NOT EXISTS answers_roll_no ON answers (roll_no);
+CREATE INDEX IF NOT EXISTS answers_question ON answers (question);
+"""
+
+
+class ResultsStore:
+    """SQLite-backed results history. Safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # ---------------- Writes ----------------
+    def append_students(self, records):
+        """Appends graded student records (evaluation_results.json format) atomically."""
+        now = time.time()
+        with self._lock, self._conn:
+            for record in records:
+                info = record.get("student_info", {})
+                roll_no = info.get("roll_no", "")
+                cursor = self._conn.execute(
+                    "INSERT INTO students (roll_no, name, total_awarded, total_possible, record, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (roll_no, info.get("name", ""), record.get("total_awarded_marks", 0),
+                     record.get("total_possible_marks", 0), json.dumps(record, ensure_ascii=False), now))
+                self._conn.executemany(
+                    "INSERT INTO answers (student_id, roll_no, question, answer, awarded_marks, max_marks, feedback)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid, roll_no, str(qno), str(details.get("answer", "")),
+                      details.get("awarded_marks", 0), details.get("max_marks", 0), details.get("feedback", ""))
+                     for qno, details in record.get("answers", {}).items()])
+
+    def append_student(self, record):
+        self.append_students([record])
+
+    def import_json(self, json_path):
+        """One-off migration of an existing evaluation_results.json into an empty store."""
+        if self.count_students() or not os.path.isfile(json_path):
+            return 0
+        with open(json_path, "r", encoding="utf-8") as f:
+            students = json.load(f).get("students", [])
+        # Earlier versions could write an empty placeholder record
+        students = [record for record in students if record]
+        self.append_students(students)
+        return len(students)
+
+    # ---------------- Reads ----------------
+    def count_students(self, roll_no=None):
+        query, params = "SELECT COUNT(*) FROM students", ()
+        if roll_no is not None:
+            query, params = query + " WHERE roll_no = ?", (roll_no,)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def list_students(self, offset=0, limit=None, roll_no=None):
+        """Student records in insertion order; limit=None returns everything from offset."""
+        query, params = "SELECT record FROM students", []
+        if roll_no is not None:
+            query += " WHERE roll_no = ?"
+            params.append(roll_no)
+        query += " ORDER BY id LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        with self._lock:
+            return [json.loads(row[0]) for row in self._conn.execute(query, params)]
+
+    def query_answers(self, roll_no=None, question=None, offset=0, limit=None):
+        """Per-question rows filtered by roll_no and/or question (both indexed)."""
+        clauses, params = [], []
+        if roll_no is not None:
+            clauses.append("roll_no = ?")
+            params.append(roll_no)
+        if question is not None:
+            clauses.append("question = ?")
+            params.append(str(question))
+        query = "SELECT roll_no, question, answer, awarded_marks, max_marks, feedback FROM answers"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY rowid LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        columns = ("roll_no", "question", "answer", "awarded_marks", "max_marks", "feedback")
+        with self._lock:
+            return [dict(zip(columns, row)) for row in self._conn.execute(query, params)]
+
+    def score_summary(self):
+        """Average / highest / lowest total score over all students."""
+        with self._lock:
+            count, average, highest, lowest = self._conn.execute(
+                "SELECT COUNT(*), AVG(total_awarded), MAX(total_awarded), MIN(total_awarded) FROM students"
+            ).fetchone()
+        return {"total_students": count, "average_score": average or 0,
+                "highest_score": highest or 0, "lowest_score": lowest or 0}
+
+    # ---------------- Export ----------------
+    def export_json(self, json_path):
+        """
+        Writes the whole history as evaluation_results.json ({"students": [...]},
+        same layout as before) via a temp file + rename, streaming row by row.
+        """
+        tmp_path = f"{json_path}.tmp"
+        with self._lock:
+            rows = self._conn.execute("SELECT record FROM students ORDER BY id")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write('{\n    "students": [')
+                first = True
+                for (record,) in rows:
+                    body = json.dumps(json.loads(record), indent=4, ensure_ascii=False)
+                    f.write(("\n" if first else ",\n") + "\n".join("        " + line for line in body.split("\n")))
+                    first = False
+                f.write("]\n}" if first else "\n    ]\n}")
+        os.replace(tmp_path, json_path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
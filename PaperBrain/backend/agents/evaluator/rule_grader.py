@@ -0,0 +1,124 @@
+import math
+import re
+
+# Local grading tier that runs before the grade cache and the LLM. Objective
+# questions (MCQ options, numbers) are decided here in microseconds when the
+# answer parses as an option or a number; short text answers are accepted
+# here only when they equal (after whitespace/case normalization) the
+# reference or one of its alternatives, and anything else is left to the
+# model. Near-misses are not accepted locally: one letter often changes a
+# short answer's meaning ("methanol" vs "ethanol", "Henry VIII" vs "Henry VII"),
+# so accepted spellings belong in "alternatives".
+#
+# reference_answers.json entries may carry optional rule settings:
+#   {"answer": "a", "marks": 1,
+#    "alternatives": ["option a"],   # other accepted answers
+#    "type": "mcq" | "numeric" | "text" | "open",   # default: inferred
+#    "tolerance": 0.01}              # absolute tolerance for numeric answers
+
+# A single letter (optionally written as "(a)", "a)" or "a.") is an MCQ option
+OPTION_PATTERN = re.compile(r"^\(?([a-z])[).]?$")
+NUMBER_PATTERN = re.compile(r"^[-+]?(\d+(\.\d*)?|\.\d+)(e[-+]?\d+)?$")
+FRACTION_PATTERN = re.compile(r"^([-+]?\d+)\s*/\s*(\d+)$")
+
+# Text answers up to this many words are "short"; longer ones always go to the LLM
+SHORT_ANSWER_MAX_WORDS = 3
+DEFAULT_TOLERANCE = 1e-6
+
+
+def normalize_text(answer):
+    return " ".join(str(answer).split()).casefold()
+
+
+def parse_option(answer):
+    match = OPTION_PATTERN.match(normalize_text(answer))
+    return match.group(1) if match else None
+
+
+def parse_number(answer):
+    text = normalize_text(answer).replace(",", "").replace(" ", "")
+    if NUMBER_PATTERN.match(text):
+        return float(text)
+    match = FRACTION_PATTERN.match(text)
+    if match and int(match.group(2)) != 0:
+        return int(match.group(1)) / int(match.group(2))
+    return None
+
+
+def answer_type(ref_info):
+    """Explicit "type", else inferred from the reference answer."""
+    declared = ref_info.get("type")
+    if declared:
+        return declared
+    ref_ans = ref_info.get("answer", "")
+    if parse_option(ref_ans) is not None:
+        return "mcq"
+    if parse_number(ref_ans) is not None:
+        return "numeric"
+    if len(normalize_text(ref_ans).split()) <= SHORT_ANSWER_MAX_WORDS:
+        return "text"
+    return "open"
+
+
+def accepted_answers(ref_info):
+    return [ref_info.get("answer", "")] + list(ref_info.get("alternatives", []))
+
+
+def _full(max_marks, feedback):
+    return max_marks, feedback
+
+
+def _blank(student_ans):
+    return not normalize_text(student_ans)
+
+
+# MCQ and numeric rules only give 0 for a cleanly parsed wrong option/value
+# (or a blank answer). Answers they cannot parse ("a) Paris", "x = 5",
+# "45 degrees") are left to the LLM.
+def grade_mcq(student_ans, ref_info, max_marks):
+    if _blank(student_ans):
+        return 0, "No option selected."
+    chosen = parse_option(student_ans)
+    if chosen is None:
+        return None
+    accepted = {parse_option(ans) or normalize_text(ans) for ans in accepted_answers(ref_info)}
+    if chosen in accepted:
+        return _full(max_marks, "Correct option.")
+    return 0, f"Incorrect option; expected {ref_info.get('answer', '').strip()}."
+
+
+def grade_numeric(student_ans, ref_info, max_marks):
+    if _blank(student_ans):
+        return 0, "No answer given."
+    value = parse_number(student_ans)
+    if value is None:
+        return None
+    tolerance = float(ref_info.get("tolerance", DEFAULT_TOLERANCE))
+    for ans in accepted_answers(ref_info):
+        expected = parse_number(ans)
+        if expected is not None and math.isclose(value, expected, rel_tol=0.0, abs_tol=tolerance):
+            return _full(max_marks, "Correct value.")
+    return 0, f"Incorrect value; expected {ref_info.get('answer', '').strip()}."
+
+
+def grade_text(student_ans, ref_info, max_marks):
+    """Only decides exact matches; anything else may still deserve credit from the LLM."""
+    student = normalize_text(student_ans)
+    if student in {normalize_text(ans) for ans in accepted_answers(ref_info)}:
+        return _full(max_marks, "Matches the reference answer.")
+    return None
+
+
+RULES = {
+    "mcq": grade_mcq,
+    "numeric": grade_numeric,
+    "text": grade_text,
+}
+
+
+def grade(student_ans, ref_info):
+    """Returns (awarded_marks, feedback) when the answer can be decided locally, else None."""
+    rule = RULES.get(answer_type(ref_info))
+    if rule is None:
+        return None
+    return rule(student_ans, ref_info, ref_info["marks"])
@@ -0,0 +1,67 @@
+"""
+GradingCache: TTL expiry, LRU eviction batched every evict_every inserts and
+on close, and answer normalization in the cache key.
+
+Run from this folder: python -m pytest test_grading_cache.py
+"""
+import sqlite3
+
+import pytest
+
+from grading_cache import GradingCache, grading_key
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "grading_cache.sqlite")
+
+
+def put_many(cache, count, start=0):
+    for i in range(start, start + count):
+        cache.put(f"k{i}", 1, f"feedback {i}")
+
+
+def test_eviction_waits_for_evict_every_inserts(cache_path):
+    cache = GradingCache(cache_path, ttl_seconds=0, max_entries=5, evict_every=4)
+    put_many(cache, 7)
+    # Nothing over capacity at the 4th insert; 3 inserts since then are not evicted yet
+    assert len(cache) == 7
+    put_many(cache, 1, start=7)
+    assert len(cache) == 5
+    cache.close()
+
+
+def test_close_evicts_pending_inserts(cache_path):
+    cache = GradingCache(cache_path, ttl_seconds=0, max_entries=5, evict_every=1000)
+    put_many(cache, 8)
+    assert len(cache) == 8
+    cache.get("k0")  # recently used entries survive
+    cache.close()
+
+    with sqlite3.connect(cache_path) as conn:
+        keys = {key for (key,) in conn.execute("SELECT key FROM grades")}
+    assert keys == {"k0", "k4", "k5", "k6", "k7"}
+
+
+def test_expired_entries_are_misses_before_eviction(cache_path):
+    cache = GradingCache(cache_path, ttl_seconds=60, evict_every=1000)
+    cache.put("old", 2, "Correct.")
+    with cache._lock:
+        cache._conn.execute("UPDATE grades SET created_at = created_at - 120")
+    assert cache.get("old") is None
+    assert cache.stats()["misses"] == 1
+    cache.close()
+
+
+def test_created_at_is_indexed(cache_path):
+    GradingCache(cache_path).close()
+    with sqlite3.connect(cache_path) as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN DELETE FROM grades WHERE created_at < 0").fetchall()
+    assert any("grades_created_at" in row[-1] for row in plan)
+
+
+def test_only_mcq_keys_ignore_case():
+    key = lambda answer, answer_type: grading_key("v1", "b", answer, 1, "docs", answer_type)
+    assert key(" B ", "mcq") == key("b", "mcq")
+    assert key("NaCl", "text") != key("nacl", "text")
+    assert key("a  b", "open") == key("a b", "open")
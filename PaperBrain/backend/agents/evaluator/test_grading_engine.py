@@ -0,0 +1,133 @@
+"""
+GradingEngine against fake_model_server: retries on 429/5xx, failures on
+other errors, results in job order.
+
+Run from this folder: python -m pytest test_grading_engine.py
+"""
+import json
+
+import pytest
+
+import fake_model_server
+from fake_model_server import FakeModelClient, FakeModelError
+from grading_engine import GradingEngine
+
+
+def grading_prompt(student_ans, ref_ans, max_marks):
+    """Same layout as main.build_grading_prompt (what the fake server grades)."""
+    return f"Reference Answer:\n{ref_ans}\n\nStudent Answer:\n{student_ans}\n\nMaximum Marks: {max_marks}\n"
+
+
+def send(client):
+    return lambda prompt: client.generate_content([prompt]).text
+
+
+def grade_of(text):
+    """The JSON object inside a fenced model response."""
+    return json.loads(text[text.find("{"):text.rfind("}") + 1])
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**options):
+        options.setdefault("latency", 0.01)
+        options.setdefault("jitter", 0.0)
+        server, url = fake_model_server.start_in_background(**options)
+        servers.append(server)
+        return server, FakeModelClient(url, timeout=10)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def fast_engine(call, **options):
+    """Engine without client-side rate limiting and with short backoffs."""
+    options = dict(dict(max_concurrency=4, rate_per_sec=0, max_retries=20, base_delay=0.02, max_delay=0.2),
+                   **options)
+    return GradingEngine(call, **options)
+
+
+def test_rate_limited_requests_are_retried(fake_server):
+    server, client = fake_server(rate=5)
+    engine = fast_engine(send(client))
+    jobs = [(grading_prompt("a", "a", 1),) for _ in range(12)]
+
+    outcomes = engine.grade_all(jobs)
+
+    assert all(error is None for _, error in outcomes)
+    assert [grade_of(text)["awarded_marks"] for text, _ in outcomes] == [1] * len(jobs)
+    assert server.stats["rate_limited"] > 0
+    assert engine.stats["retries"] == server.stats["rate_limited"]
+    assert engine.stats["requests"] == server.stats["requests"]
+    assert engine.stats["failures"] == 0
+
+
+def test_server_errors_are_retried(fake_server):
+    server, client = fake_server(error_rate=0.4, seed=1)
+    engine = fast_engine(send(client))
+    jobs = [(grading_prompt("b", "b", 2),) for _ in range(10)]
+
+    outcomes = engine.grade_all(jobs)
+
+    assert all(error is None for _, error in outcomes)
+    assert server.stats["errors"] > 0
+    assert engine.stats["retries"] == server.stats["errors"]
+    assert engine.stats["failures"] == 0
+
+
+def test_retries_give_up_after_max_retries(fake_server):
+    server, client = fake_server(error_rate=1.0)
+    engine = fast_engine(send(client), max_retries=2)
+
+    [(text, error)] = engine.grade_all([(grading_prompt("a", "a", 1),)])
+
+    assert text is None
+    assert isinstance(error, FakeModelError) and error.status_code == 503
+    assert server.stats["requests"] == 3
+    assert engine.stats == {"requests": 3, "retries": 2, "failures": 1}
+
+
+def test_non_retryable_errors_fail_without_retrying(fake_server):
+    server, client = fake_server()
+
+    def call(prompt):
+        if "Student Answer:\nbad\n" in prompt:
+            raise FakeModelError(400, "INVALID_ARGUMENT")
+        return client.generate_content([prompt]).text
+
+    engine = fast_engine(call)
+    outcomes = engine.grade_all([(grading_prompt("a", "a", 1),), (grading_prompt("bad", "a", 1),),
+                                 (grading_prompt("c", "a", 1),)])
+
+    (first, first_error), (bad, bad_error), (last, last_error) = outcomes
+    assert first_error is None and last_error is None
+    assert bad is None and bad_error.status_code == 400
+    assert engine.stats == {"requests": 3, "retries": 0, "failures": 1}
+    assert server.stats["requests"] == 2
+
+
+def test_unreachable_server_is_not_retried():
+    # Nothing listens on port 9 (discard) locally: the connection error has no HTTP status
+    engine = fast_engine(send(FakeModelClient("http://127.0.0.1:9", timeout=2)))
+
+    [(text, error)] = engine.grade_all([(grading_prompt("a", "a", 1),)])
+
+    assert text is None and error is not None
+    assert engine.stats == {"requests": 1, "retries": 0, "failures": 1}
+
+
+def test_results_come_back_in_job_order(fake_server):
+    # Jittered latency and a quota: responses complete out of order and some are retried
+    server, client = fake_server(latency=0.02, jitter=0.02, rate=10, seed=3)
+    engine = fast_engine(send(client), max_concurrency=6)
+    jobs = [(grading_prompt(str(i % 3), "0", i + 1),) for i in range(18)]
+
+    outcomes = engine.grade_all(jobs)
+
+    expected = [i + 1 if i % 3 == 0 else 0 for i in range(len(jobs))]
+    assert [grade_of(text)["awarded_marks"] for text, _ in outcomes] == expected
+    assert all(error is None for _, error in outcomes)
@@ -0,0 +1,51 @@
+"""
+Local grading tier: only answers that are certainly right or wrong are decided
+here; everything else returns None and goes to the cache/LLM tiers.
+
+Run from this folder: python -m pytest test_rule_grader.py
+"""
+import pytest
+
+import rule_grader
+
+
+@pytest.mark.parametrize("student_ans, ref_ans", [
+    ("methanol", "ethanol"),
+    ("World War II", "World War I"),
+    ("sodium chlorite", "sodium chloride"),
+    ("Henry VIII", "Henry VII"),
+])
+def test_near_misses_are_left_to_the_model(student_ans, ref_ans):
+    assert rule_grader.answer_type({"answer": ref_ans}) == "text"
+    assert rule_grader.grade(student_ans, {"answer": ref_ans, "marks": 2}) is None
+
+
+@pytest.mark.parametrize("student_ans", ["Sodium  Chloride", "sodium chloride", "NaCl", "common salt"])
+def test_normalized_and_alternative_matches_get_full_marks(student_ans):
+    ref_info = {"answer": "sodium chloride", "marks": 2, "alternatives": ["NaCl", "Common Salt"]}
+    assert rule_grader.grade(student_ans, ref_info) == (2, "Matches the reference answer.")
+
+
+@pytest.mark.parametrize("student_ans, expected", [
+    ("(b)", (1, "Correct option.")),
+    ("c", (0, "Incorrect option; expected b.")),
+    ("", (0, "No option selected.")),
+    ("b) Paris", None),
+])
+def test_mcq(student_ans, expected):
+    assert rule_grader.grade(student_ans, {"answer": "b", "marks": 1}) == expected
+
+
+@pytest.mark.parametrize("student_ans, expected", [
+    ("1,000", (3, "Correct value.")),
+    ("2000/2", (3, "Correct value.")),
+    ("999", (0, "Incorrect value; expected 1000.")),
+    ("x = 1000", None),
+])
+def test_numeric(student_ans, expected):
+    assert rule_grader.grade(student_ans, {"answer": "1000", "marks": 3}) == expected
+
+
+def test_open_answers_are_left_to_the_model():
+    ref_info = {"answer": "Plants convert light energy into chemical energy", "marks": 5}
+    assert rule_grader.grade(ref_info["answer"], ref_info) is None
@@ -0,0 +1,112 @@
+"""
+UploadRegistry with fake_model_server.FakeUploadClient: reuse by content hash,
+re-upload on expiry or a vanished remote copy, failed uploads skipped.
+
+Run from this folder: python -m pytest test_upload_registry.py
+"""
+import os
+import time
+
+import pytest
+
+from fake_model_server import FakeUploadClient
+from upload_registry import EXPIRY_MARGIN_SECONDS, UploadRegistry
+
+
+class GoneUploadClient(FakeUploadClient):
+    """Remote copies have been deleted: every resolve fails."""
+
+    def resolve(self, record):
+        raise LookupError(f"{record['name']} not found")
+
+
+class FailingUploadClient(FakeUploadClient):
+    """Uploads of files named bad.* fail."""
+
+    def upload(self, path):
+        if os.path.basename(path).startswith("bad."):
+            raise OSError("upload rejected")
+        return super().upload(path)
+
+
+@pytest.fixture
+def docs(tmp_path):
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    for name, content in [("notes.txt", "photosynthesis"), ("syllabus.txt", "biology unit 3")]:
+        (folder / name).write_text(content, encoding="utf-8")
+    return folder
+
+
+def doc(folder, name):
+    return str(folder / name)
+
+
+def registry_for(tmp_path, client):
+    return UploadRegistry(str(tmp_path / "upload_registry.json"), client)
+
+
+def test_unchanged_files_are_reused(tmp_path, docs):
+    client = FakeUploadClient(latency=0)
+    paths = [doc(docs, "notes.txt"), doc(docs, "syllabus.txt")]
+    first = registry_for(tmp_path, client).get_or_upload(paths)
+
+    # A fresh registry reads the same file, as a later run would
+    registry = registry_for(tmp_path, client)
+    handles = registry.get_or_upload(paths)
+
+    assert [h.name for h in handles] == [h.name for h in first]
+    assert client.uploads == 2
+    assert registry.stats == {"reused": 2, "uploaded": 0, "failed": 0}
+
+
+def test_changed_file_is_uploaded_again(tmp_path, docs):
+    client = FakeUploadClient(latency=0)
+    registry_for(tmp_path, client).get_or_upload([doc(docs, "notes.txt")])
+    (docs / "notes.txt").write_text("cellular respiration", encoding="utf-8")
+
+    registry = registry_for(tmp_path, client)
+    registry.get_or_upload([doc(docs, "notes.txt")])
+
+    assert client.uploads == 2
+    assert registry.stats == {"reused": 0, "uploaded": 1, "failed": 0}
+
+
+def test_upload_close_to_expiry_is_uploaded_again(tmp_path, docs):
+    # Still alive remotely, but not for the margin a run needs
+    client = FakeUploadClient(latency=0, ttl=EXPIRY_MARGIN_SECONDS - 60)
+    registry_for(tmp_path, client).get_or_upload([doc(docs, "notes.txt")])
+
+    client.ttl = 48 * 3600
+    registry = registry_for(tmp_path, client)
+    [handle] = registry.get_or_upload([doc(docs, "notes.txt")])
+
+    assert handle.name == "files/fake-2"
+    assert registry.stats == {"reused": 0, "uploaded": 1, "failed": 0}
+    [record] = registry.records.values()
+    assert record["expires_at"] - time.time() > EXPIRY_MARGIN_SECONDS
+
+
+def test_vanished_upload_is_uploaded_again(tmp_path, docs):
+    registry_for(tmp_path, FakeUploadClient(latency=0)).get_or_upload([doc(docs, "notes.txt")])
+
+    client = GoneUploadClient(latency=0)
+    registry = registry_for(tmp_path, client)
+    handles = registry.get_or_upload([doc(docs, "notes.txt")])
+
+    assert len(handles) == 1
+    assert client.uploads == 1
+    assert registry.stats == {"reused": 0, "uploaded": 1, "failed": 0}
+
+
+def test_failed_upload_is_skipped(tmp_path, docs):
+    (docs / "bad.txt").write_text("unreadable scan", encoding="utf-8")
+    client = FailingUploadClient(latency=0)
+    registry = registry_for(tmp_path, client)
+
+    handles = registry.get_or_upload([doc(docs, "notes.txt"), doc(docs, "bad.txt"), doc(docs, "syllabus.txt")])
+
+    assert len(handles) == 2
+    assert registry.stats == {"reused": 0, "uploaded": 2, "failed": 1}
+    saved = registry_for(tmp_path, client).records.values()
+    assert sorted(record["filename"] for record in saved) == ["notes.txt", "syllabus.txt"]
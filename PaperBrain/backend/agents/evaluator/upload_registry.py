@@ -0,0 +1,123 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared with the other agents and the controller (agents/content_hash.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from content_hash import file_sha256
+
+# Content-addressed registry of uploaded context documents. Gemini keeps
+# uploaded files for 48 hours, so a document whose bytes have not changed is
+# reused from an earlier run instead of being uploaded again. The registry is
+# a small JSON file: sha256 -> {name, uri, mime_type, filename, expires_at}.
+
+# Gemini deletes uploaded files after 48h; assume slightly less if the API does not say
+DEFAULT_TTL_SECONDS = 47 * 3600
+# Do not reuse a handle that would expire in the middle of a run
+EXPIRY_MARGIN_SECONDS = 3600
+
+
+def expiry_timestamp(expiration_time):
+    if expiration_time is None:
+        return time.time() + DEFAULT_TTL_SECONDS
+    if hasattr(expiration_time, "timestamp"):
+        return expiration_time.timestamp()
+    return float(expiration_time)
+
+
+class GeminiUploadClient:
+    """Uploads through the Gemini Files API."""
+
+    def upload(self, path):
+        """Returns (file handle for generate_content, registry record)."""
+        import google.generativeai as genai
+        uploaded = genai.upload_file(path=path)
+        record = {"name": uploaded.name, "uri": uploaded.uri, "mime_type": uploaded.mime_type,
+                  "expires_at": expiry_timestamp(getattr(uploaded, "expiration_time", None))}
+        return uploaded, record
+
+    def resolve(self, record):
+        """File handle for a registered upload; raises if it no longer exists remotely."""
+        import google.generativeai as genai
+        return genai.get_file(record["name"])
+
+
+class UploadRegistry:
+    """Uploads documents at most once per content hash (until the remote copy expires)."""
+
+    def __init__(self, path, client, max_workers=4):
+        self.path = path
+        self.client = client
+        self.max_workers = max(1, max_workers)
+        self.stats = {"reused": 0, "uploaded": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self.records = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.records = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Failed to load upload registry ({e}), starting fresh.")
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def _log(self, message):
+        # Uploads run on several threads; keep their lines whole
+        with self._lock:
+            print(message)
+
+    def _usable(self, record):
+        return record is not None and record.get("expires_at", 0) - time.time() > EXPIRY_MARGIN_SECONDS
+
+    def _get_one(self, path):
+        filename = os.path.basename(path)
+        digest = file_sha256(path)
+        with self._lock:
+            record = self.records.get(digest)
+        if self._usable(record):
+            try:
+                handle = self.client.resolve(record)
+                with self._lock:
+                    self.stats["reused"] += 1
+                    print(f"Reusing uploaded file: {filename}")
+                return handle
+            except Exception as e:
+                self._log(f"Registered upload of {filename} is gone ({e}), uploading again.")
+
+        self._log(f"Uploading file: {filename}")
+        handle, record = self.client.upload(path)
+        record.update(filename=filename, uploaded_at=time.time())
+        with self._lock:
+            self.records[digest] = record
+            self.stats["uploaded"] += 1
+        return handle
+
+    def _get_one_safe(self, path):
+        try:
+            return self._get_one(path)
+        except Exception as e:
+            with self._lock:
+                self.stats["failed"] += 1
+                print(f"Failed to upload {os.path.basename(path)}: {e}")
+            return None
+
+    def get_or_upload(self, paths):
+        """File handles for paths (in order, failed uploads skipped); uploads run in parallel."""
+        if not paths:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as executor:
+            handles = list(executor.map(self._get_one_safe, paths))
+        # Drop records that have expired so the registry does not grow forever
+        with self._lock:
+            self.records = {digest: record for digest, record in self.records.items()
+                            if record.get("expires_at", 0) > time.time()}
+            self.save()
+        return [handle for handle in handles if handle is not None]
@@ -7,9 +7,10 @@ import sys
 
 try:
     # ================= CONFIG =================
-    CSV_FILE = "results/evaluation_results.csv"
-    JSON_FILE = "results/evaluation_results.json"
-    OUTPUT_FOLDER = "results/visualizations"
+    # EVALUATOR_WORK_DIR: per-session workspace (set by the controller); default is this folder
+    WORK_DIR = os.environ.get("EVALUATOR_WORK_DIR", "")
+    CSV_FILE = os.path.join(WORK_DIR, "results", "evaluation_results.csv")
+    OUTPUT_FOLDER = os.path.join(WORK_DIR, "results", "visualizations")
 
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
@@ -20,14 +21,6 @@ try:
     
     df = pd.read_csv(CSV_FILE)
 
-    # For some analyses, you may want JSON too
-    if not os.path.exists(JSON_FILE):
-        print(f"Warning: JSON file not found at {JSON_FILE}")
-        json_data = None
-    else:
-        with open(JSON_FILE, "r", encoding="utf-8") as f:
-            json_data = json.load(f)
-
     # ================= OVERALL STUDENT PERFORMANCE =================
     # Use all students from CSV - for each unique student, calculate their latest/aggregated score
     # If there are multiple submissions per student, we'll take the latest one (by row position)
@@ -99,7 +92,7 @@ try:
     plt.close()
 
     # ================= CURRENT STUDENT VISUALIZATIONS =================
-    CURRENT_STUDENT_FILE = "temp/current_student.json"
+    CURRENT_STUDENT_FILE = os.path.join(WORK_DIR, "temp", "current_student.json")
     if os.path.exists(CURRENT_STUDENT_FILE):
         with open(CURRENT_STUDENT_FILE, "r", encoding="utf-8") as f:
             current_student = json.load(f)
@@ -1,55 +1,296 @@
+import os
+import time
 import cv2
 import numpy as np
+from template_features import get_default_store, rank_templates, downscale
+from matchers import get_matcher
 
-def run_alignment_agent(template_path, scan_path):
+# Quality/speed presets for align_scan.
+#   accurate: ORB + homography at full resolution (the original path)
+#   balanced: estimate on a 1/2 pyramid level, refine at full resolution only
+#             when the coarse reprojection error exceeds refine_error pixels
+#   fast:     estimate on a 1/4 pyramid level only, never refine
+# Both pyramid presets fall back to full resolution if the coarse level fails.
+# check_plausible rejects folded/rescaled homographies (homography_is_plausible);
+# the pyramid presets need it because a coarse level has few, clustered
+# keypoints, while "accurate" keeps the original acceptance rules.
+ALIGNMENT_QUALITY = {
+    "accurate": {"scale": 1.0, "refine_error": None, "check_plausible": False},
+    "balanced": {"scale": 0.5, "refine_error": 2.0, "check_plausible": True},
+    "fast": {"scale": 0.25, "refine_error": None, "check_plausible": True},
+}
+
+def run_alignment_agent(template_path, scan_path, feature_store=None):
     """
     This is the core function for Agent 1: The Aligner.
     
     It takes a template and a scan, performs alignment, and returns
     the results required by the problem statement.
+
+    Template keypoints/descriptors come from a TemplateFeatureStore, so they
+    are detected once per template instead of once per (scan, template) pair.
     """
     print(f"[Agent 1] Loading images: {template_path}, {scan_path}")
     
-    # 1. LOAD IMAGES
-    img_template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+    # 1. LOAD IMAGES (template features are cached, only its size is needed)
+    store = feature_store or get_default_store()
+    template_features = store.get(template_path)
     img_scan = cv2.imread(scan_path, cv2.IMREAD_GRAYSCALE)
 
-    if img_template is None or img_scan is None:
+    if template_features is None or img_scan is None:
         print("[Agent 1] Error: Could not load images. Check paths.")
         return None, None, 0 # Return failure
 
     # 2. FEATURE DETECTION (ORB)
-    orb = cv2.ORB_create(nfeatures=5000)
-    kp_template, des_template = orb.detectAndCompute(img_template, None)
+    points_scan, des_scan = detect_scan_features(img_scan, store.nfeatures)
+
+    # 3-4. MATCHING + HOMOGRAPHY
+    H, alignment_score, _ = estimate_homography(template_features, points_scan, des_scan)
+    if H is None:
+        return None, None, alignment_score # Return failure
+    
+    # 5. WARPING (Apply Correction)
+    height, width = template_features.shape
+    img_aligned = cv2.warpPerspective(img_scan, H, (width, height))
+    print("[Agent 1] Success: Image aligned.")
+
+    # Return all deliverables
+    # H = transformation_parameters
+    # alignment_score = alignment_accuracy
+    return img_aligned, H, alignment_score
+
+
+def detect_scan_features(img_scan, nfeatures):
+    """
+    ORB features of a scan (computed once, reused for every template).
+    Returns (points, descriptors) with points as an (N, 2) float32 array.
+    """
+    orb = cv2.ORB_create(nfeatures=nfeatures)
     kp_scan, des_scan = orb.detectAndCompute(img_scan, None)
+    return keypoint_points(kp_scan), des_scan
+
+
+def keypoint_points(keypoints):
+    """(N, 2) float32 array of cv2.KeyPoint coordinates."""
+    return np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2)
+
 
-    # 3. FEATURE MATCHING (Brute-Force)
-    bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
-    matches = bf.match(des_template, des_scan)
-    matches = sorted(matches, key=lambda x: x.distance)
-    num_good_matches = int(len(matches) * 0.1)
-    good_matches = matches[:num_good_matches]
+def estimate_homography(template_features, points_scan, des_scan, matcher=None, check_plausible=False):
+    """
+    Matches scan features against cached template features.
+    points_scan is the (N, 2) array of scan keypoint coordinates (see
+    keypoint_points) and matcher a backend from matchers.get_matcher.
+    check_plausible also rejects homographies that fold or rescale the page.
+    Returns (H, alignment_score, reprojection_error); H is None when validation
+    fails. The error is the mean distance, in pixels of the matched level,
+    between RANSAC inliers projected by H and their template keypoints.
+    """
+    des_template = template_features.descriptors
+    if des_template is None or des_scan is None:
+        print("[Agent 1] VALIDATION FAILED: No features detected. Skipping.")
+        return None, 0, None
+
+    # 3. FEATURE MATCHING (Brute-Force by default, see matchers.py)
+    matcher = matcher or get_matcher()
+    template_idx, scan_idx = matcher.match(template_features, des_scan)
     
-    alignment_score = len(good_matches)
+    alignment_score = len(template_idx)
     print(f"[Agent 1] Alignment confidence score: {alignment_score}")
 
     # --- Minimal Validation ---
     if alignment_score < 10:
         print(f"[Agent 1] VALIDATION FAILED: Score {alignment_score} is too low. Skipping.")
-        return None, None, alignment_score # Return failure
+        return None, alignment_score, None
 
     # 4. FIND HOMOGRAPHY (Calculate Distortion)
-    points_template = np.float32([kp_template[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2)
-    points_scan = np.float32([kp_scan[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2)
+    points_template = template_features.points[template_idx].reshape(-1, 1, 2)
+    points_scan = points_scan[scan_idx].reshape(-1, 1, 2)
 
     H, mask = cv2.findHomography(points_scan, points_template, cv2.RANSAC, 5.0)
-    
-    # 5. WARPING (Apply Correction)
-    height, width = img_template.shape
-    img_aligned = cv2.warpPerspective(img_scan, H, (width, height))
-    print("[Agent 1] Success: Image aligned.")
+    if H is None:
+        print("[Agent 1] VALIDATION FAILED: Homography could not be estimated. Skipping.")
+        return None, alignment_score, None
 
-    # Return all deliverables
-    # H = transformation_parameters
-    # alignment_score = alignment_accuracy
-    return img_aligned, H, alignment_score
+    if check_plausible and not homography_is_plausible(H, template_features.shape):
+        print("[Agent 1] VALIDATION FAILED: Homography folds or rescales the page. Skipping.")
+        return None, alignment_score, None
+
+    inliers = mask.ravel().astype(bool)
+    projected = cv2.perspectiveTransform(points_scan[inliers], H)
+    reprojection_error = float(np.linalg.norm(projected - points_template[inliers], axis=2).mean())
+    return H, alignment_score, reprojection_error
+
+
+def homography_is_plausible(H, shape, max_area_ratio=4.0):
+    """
+    Rejects degenerate fits (e.g. from clustered inliers) that would map the
+    template page onto a folded or wildly rescaled quadrilateral of the scan.
+    """
+    height, width = shape
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]]).reshape(-1, 1, 2)
+    try:
+        projected = cv2.perspectiveTransform(corners, np.linalg.inv(H))
+    except np.linalg.LinAlgError:
+        return False
+    if not cv2.isContourConvex(projected):
+        return False
+    area_ratio = cv2.contourArea(projected) / float(width * height)
+    return 1.0 / max_area_ratio < area_ratio < max_area_ratio
+
+
+def upscale_homography(H, scale):
+    """
+    Lifts a homography estimated between two images downscaled by `scale`
+    (see template_features.downscale) to their full-resolution pixel grid.
+    """
+    offset = (scale - 1.0) / 2.0  # cv2.resize maps pixel centres, not corners
+    S = np.array([[scale, 0, offset], [0, scale, offset], [0, 0, 1]], dtype=np.float64)
+    return np.linalg.inv(S) @ H @ S
+
+
+def align_scan(scan_path, template_paths, output_path, feature_store=None, top_k=None, quality="accurate",
+               matcher="bf", keep_image=False):
+    """
+    Aligns one scan against every template and keeps the best match.
+
+    With top_k set and more templates than that, templates are first ranked
+    by a cheap thumbnail similarity and only the top_k candidates go through
+    full ORB matching + homography.
+
+    quality selects an ALIGNMENT_QUALITY preset. In the pyramid presets every
+    candidate is matched on the downscaled level; only the winning template
+    is refined at full resolution, and only when needed. The image is warped
+    once at the end. The result reports the reprojection error (full-res
+    pixels) and timings so the presets can be compared against "accurate".
+
+    matcher names a backend from matchers.MATCHERS: "bf" (brute force, the
+    original behaviour) or "lsh" (FLANN LSH index per template + ratio test).
+
+    Scan features are detected once and matched against each template's cached
+    features. The winning warp is written straight to output_path, so the
+    returned dict only carries the homography and score -- this is what
+    process-pool workers send back to the controller. In-process callers can
+    pass keep_image=True to also get the warped array as "aligned_image"
+    (grayscale, template size), so the next stage need not re-read it; pop it
+    before storing the result, it is not JSON-serializable.
+    """
+    run_started = time.perf_counter()
+    store = feature_store or get_default_store()
+    scan_file = os.path.basename(scan_path)
+    img_scan = cv2.imread(scan_path, cv2.IMREAD_GRAYSCALE)
+    if img_scan is None:
+        print(f"[Agent 1] Error: Could not load scan {scan_path}")
+        return {"status": "failed", "scan_file": scan_file, "alignment_score": 0,
+                "message": "Could not load scan image."}
+
+    candidates = []
+    for template_path in template_paths:
+        template_features = store.get(template_path)
+        if template_features is None:
+            print(f"[Agent 1] Error: Could not load template {template_path}")
+            continue
+        candidates.append((template_path, template_features))
+
+    if top_k and len(candidates) > top_k:
+        ranking = rank_templates(img_scan, [features for _, features in candidates])
+        candidates = [candidates[i] for i, _ in ranking[:top_k]]
+        print(f"[Agent 1] Pre-ranked templates, checking top {top_k}: "
+              f"{', '.join(os.path.basename(path) for path, _ in candidates)}")
+
+    settings = ALIGNMENT_QUALITY[quality]
+    scale = settings["scale"]
+    check_plausible = settings["check_plausible"]
+    matcher_name = matcher
+    matcher = get_matcher(matcher_name)
+    timings = {}
+
+    # Coarse (or, for "accurate", full-resolution) match against every candidate
+    started = time.perf_counter()
+    img_level = downscale(img_scan, scale) if scale != 1.0 else img_scan
+    points_scan, des_scan = detect_scan_features(img_level, store.nfeatures_for(scale))
+    timings["detect_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    best_H, best_score, best_error, best_path = best_template_match(candidates, points_scan, des_scan, store, matcher,
+                                                                    scale, check_plausible)
+    timings["match_s"] = time.perf_counter() - started
+
+    level = "full"
+    if scale != 1.0:
+        level = "coarse"
+        if best_H is not None:
+            best_H = upscale_homography(best_H, scale)
+            best_error = best_error / scale
+        refine_error = settings["refine_error"]
+        needs_refine = best_H is None or (refine_error is not None and best_error > refine_error)
+        if needs_refine:
+            started = time.perf_counter()
+            points_full, des_full = detect_scan_features(img_scan, store.nfeatures)
+            if best_H is None:
+                # Nothing usable on the coarse level: fall back to the full-resolution path
+                print("[Agent 1] Coarse alignment failed, retrying at full resolution")
+                best_H, best_score, best_error, best_path = best_template_match(candidates, points_full, des_full, store,
+                                                                                matcher, check_plausible=check_plausible)
+                level = "full"
+            else:
+                print(f"[Agent 1] Coarse error {best_error:.2f}px > {refine_error}px, refining at full resolution")
+                H, score, error = estimate_homography(store.get(best_path), points_full, des_full, matcher,
+                                                      check_plausible)
+                if H is not None and error < best_error:
+                    best_H, best_score, best_error, level = H, score, error, "refined"
+            timings["refine_s"] = time.perf_counter() - started
+
+    if best_H is None:
+        return {"status": "failed", "scan_file": scan_file, "alignment_score": 0,
+                "message": "All alignments failed for this scan."}
+    best_template_file = os.path.basename(best_path)
+
+    started = time.perf_counter()
+    height, width = store.get(best_path).shape
+    img_aligned = cv2.warpPerspective(img_scan, best_H, (width, height))
+    timings["warp_s"] = time.perf_counter() - started
+    cv2.imwrite(output_path, img_aligned)
+    timings["total_s"] = time.perf_counter() - run_started
+    timings = {name: round(value, 4) for name, value in timings.items()}
+    result = {
+        "status": "completed",
+        "scan_file": scan_file,
+        "alignment_score": float(best_score),
+        "template_used": best_template_file,
+        "homography": best_H.tolist(),
+        "templates_checked": len(candidates),
+        "alignment_quality": quality,
+        "alignment_level": level,
+        "matcher": matcher_name,
+        "reprojection_error": round(best_error, 3),
+        "timings": timings,
+        "output_image": output_path,
+    }
+    if keep_image:
+        result["aligned_image"] = img_aligned
+    return result
+
+
+def best_template_match(candidates, points_scan, des_scan, store, matcher, scale=1.0, check_plausible=False):
+    """
+    Matches scan features against each (template_path, features) candidate on
+    the given pyramid level. Returns (H, score, reprojection_error, template_path)
+    of the highest-scoring valid alignment; H is None if none succeeded.
+    """
+    best_H, best_score, best_error, best_path = None, 0, None, None
+    for template_path, template_features in candidates:
+        try:
+            if scale != 1.0:
+                template_features = store.get(template_path, scale)
+            H, score, error = estimate_homography(template_features, points_scan, des_scan, matcher,
+                                                  check_plausible)
+            if H is not None and score > best_score:
+                best_H, best_score, best_error, best_path = H, score, error, template_path
+        except Exception as e:
+            print(f"[Agent 1] Alignment failed for {os.path.basename(template_path)}: {e}")
+    return best_H, best_score, best_error, best_path
+
+
+def init_alignment_worker():
+    """ProcessPoolExecutor initializer: one OpenCV thread per worker process."""
+    cv2.setNumThreads(1)
@@ -0,0 +1,99 @@
+"""
+Benchmark: alignment quality presets (accurate / balanced / fast).
+
+Generates high-resolution synthetic templates and scans with a known
+perspective distortion, aligns them with every ALIGNMENT_QUALITY preset and
+reports per-scan time, the reprojection error reported by align_scan, and the
+true corner error against the ground-truth homography.
+
+Usage: python benchmark_alignment_quality.py [--scans 4] [--height 4200] [--width 3000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from alignment_agent import ALIGNMENT_QUALITY, align_scan
+from benchmark_template_selection import make_template
+from template_features import TemplateFeatureStore
+
+
+def make_distorted_scan(template, seed):
+    """Returns (scan, H_true) where H_true maps scan pixels back onto the template."""
+    rng = np.random.default_rng(seed)
+    height, width = template.shape
+    filled = template.copy()
+    for i in range(10):
+        cv2.putText(filled, "abc"[i % 3], (200 + 40 * i, 300 + 350 * i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 3.0, 0, 6)
+    src = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    dst = src + rng.uniform(-0.02, 0.02, src.shape).astype(np.float32) * np.float32([width, height])
+    M = cv2.getPerspectiveTransform(src, dst)
+    scan = cv2.warpPerspective(filled, M, (width, height), borderValue=255)
+    return scan, np.linalg.inv(M)
+
+
+def corner_error(H, H_true, shape):
+    """Mean distance between page corners mapped by H and by the ground truth."""
+    height, width = shape
+    corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]]).reshape(-1, 1, 2)
+    estimated = cv2.perspectiveTransform(corners, np.asarray(H, dtype=np.float64))
+    expected = cv2.perspectiveTransform(corners, H_true)
+    return float(np.linalg.norm(estimated - expected, axis=2).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, default=4)
+    parser.add_argument("--height", type=int, default=4200)
+    parser.add_argument("--width", type=int, default=3000)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="paperbrain_bench_")
+    try:
+        template = make_template(0, args.height, args.width)
+        template_path = os.path.join(work_dir, "template_1.png")
+        cv2.imwrite(template_path, template)
+
+        scans = []
+        for j in range(args.scans):
+            scan, H_true = make_distorted_scan(template, 2000 + j)
+            scan_path = os.path.join(work_dir, f"scan_{j + 1}.png")
+            cv2.imwrite(scan_path, scan)
+            scans.append((scan_path, H_true))
+
+        store = TemplateFeatureStore(cache_dir=os.path.join(work_dir, "features"))
+        for settings in ALIGNMENT_QUALITY.values():
+            store.get(template_path, settings["scale"])
+
+        print("\n--- Alignment quality benchmark ---")
+        print(f"Page size: {args.width}x{args.height}, scans: {args.scans}")
+        for quality in ALIGNMENT_QUALITY:
+            started = time.perf_counter()
+            reported, true_errors, levels = [], [], []
+            for scan_path, H_true in scans:
+                output_path = os.path.join(work_dir, f"aligned_{quality}.png")
+                result = align_scan(scan_path, [template_path], output_path, store, quality=quality)
+                if result["status"] != "completed":
+                    continue
+                reported.append(result["reprojection_error"])
+                true_errors.append(corner_error(result["homography"], H_true, template.shape))
+                levels.append(result["alignment_level"])
+            elapsed = time.perf_counter() - started
+            if not reported:
+                print(f"{quality:<9}: all alignments failed")
+                continue
+            print(f"{quality:<9}: {elapsed / args.scans:.3f}s/scan, aligned {len(reported)}/{args.scans}, "
+                  f"reprojection error {np.mean(reported):.2f}px, "
+                  f"corner error vs ground truth {np.mean(true_errors):.2f}px, "
+                  f"levels {sorted(set(levels))}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: brute-force vs. FLANN LSH descriptor matching.
+
+Aligns synthetic distorted scans against one template with each matcher
+backend and reports matching time, score, and how far the LSH homography is
+from the brute-force one (mean page-corner distance), as a parity check.
+
+Usage: python benchmark_matchers.py [--scans 4] [--height 4200] [--width 3000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+
+from alignment_agent import align_scan
+from benchmark_alignment_quality import corner_error, make_distorted_scan
+from benchmark_template_selection import make_template
+from matchers import MATCHERS
+from template_features import TemplateFeatureStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, default=4)
+    parser.add_argument("--height", type=int, default=4200)
+    parser.add_argument("--width", type=int, default=3000)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="paperbrain_bench_")
+    try:
+        template = make_template(0, args.height, args.width)
+        template_path = os.path.join(work_dir, "template_1.png")
+        cv2.imwrite(template_path, template)
+        store = TemplateFeatureStore(cache_dir=os.path.join(work_dir, "features"))
+        store.get(template_path)
+
+        results = {name: [] for name in MATCHERS}
+        truths = []
+        for j in range(args.scans):
+            scan, H_true = make_distorted_scan(template, 3000 + j)
+            scan_path = os.path.join(work_dir, f"scan_{j + 1}.png")
+            cv2.imwrite(scan_path, scan)
+            truths.append(H_true)
+            for name in MATCHERS:
+                output_path = os.path.join(work_dir, f"aligned_{name}.png")
+                results[name].append(align_scan(scan_path, [template_path], output_path, store, matcher=name))
+
+        print("\n--- Matcher benchmark ---")
+        print(f"Page size: {args.width}x{args.height}, scans: {args.scans}")
+        for name, runs in results.items():
+            done = [r for r in runs if r["status"] == "completed"]
+            if not done:
+                print(f"{name:<4}: all alignments failed")
+                continue
+            # The first scan also pays for building the LSH index, so report the median
+            match_s = np.median([r["timings"]["match_s"] for r in done])
+            errors = [corner_error(r["homography"], H, template.shape)
+                      for r, H in zip(runs, truths) if r["status"] == "completed"]
+            print(f"{name:<4}: median match {match_s:.3f}s/scan, aligned {len(done)}/{args.scans}, "
+                  f"mean score {np.mean([r['alignment_score'] for r in done]):.0f}, "
+                  f"corner error vs ground truth {np.mean(errors):.2f}px")
+
+        parity = [corner_error(lsh["homography"], np.asarray(bf["homography"]), template.shape)
+                  for bf, lsh in zip(results["bf"], results["lsh"])
+                  if bf["status"] == lsh["status"] == "completed"]
+        if parity:
+            print(f"LSH vs brute force homography: mean corner distance {np.mean(parity):.2f}px")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: full alignment against every template vs. thumbnail pre-ranking.
+
+Generates synthetic question-paper templates and distorted, filled-in scans
+in a temporary folder, then aligns each scan with align_scan(top_k=None)
+and align_scan(top_k=K) and reports wall time and template agreement.
+
+Usage: python benchmark_template_selection.py [--templates 12] [--scans 6] [--top-k 2]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from alignment_agent import align_scan
+from template_features import TemplateFeatureStore
+
+
+def make_template(seed, height=2000, width=1400):
+    """A blank page with random printed text lines and answer boxes."""
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width), 255, np.uint8)
+    for _ in range(80):
+        x, y = int(rng.integers(20, width - 300)), int(rng.integers(40, height - 40))
+        text = "".join(chr(int(c)) for c in rng.integers(65, 91, 10))
+        cv2.putText(img, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 0, 2)
+    for _ in range(20):
+        x, y = int(rng.integers(20, width - 400)), int(rng.integers(20, height - 80))
+        cv2.rectangle(img, (x, y), (x + 350, y + 50), 0, 2)
+    return img
+
+
+def make_scan(template, seed):
+    """Fills in a few answers and applies a random perspective distortion."""
+    rng = np.random.default_rng(seed)
+    height, width = template.shape
+    filled = template.copy()
+    for i in range(10):
+        cv2.putText(filled, "abc"[i % 3], (150 + 25 * i, 150 + 170 * i),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, 0, 3)
+    src = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    dst = src + rng.uniform(-40, 40, src.shape).astype(np.float32)
+    M = cv2.getPerspectiveTransform(src, dst)
+    return cv2.warpPerspective(filled, M, (width, height), borderValue=255)
+
+
+def run_mode(scan_jobs, template_paths, store, top_k):
+    start = time.perf_counter()
+    results = [align_scan(scan_path, template_paths, output_path, store, top_k)
+               for scan_path, output_path in scan_jobs]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--templates", type=int, default=12)
+    parser.add_argument("--scans", type=int, default=6)
+    parser.add_argument("--top-k", type=int, default=2)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="paperbrain_bench_")
+    try:
+        template_paths = []
+        templates = []
+        for i in range(args.templates):
+            template = make_template(i)
+            path = os.path.join(work_dir, f"template_{i + 1}.png")
+            cv2.imwrite(path, template)
+            template_paths.append(path)
+            templates.append(template)
+
+        scan_jobs, expected = [], []
+        for j in range(args.scans):
+            index = j % args.templates
+            scan_path = os.path.join(work_dir, f"scan_{j + 1}.png")
+            cv2.imwrite(scan_path, make_scan(templates[index], 1000 + j))
+            scan_jobs.append((scan_path, os.path.join(work_dir, f"aligned_scan_{j + 1}.png")))
+            expected.append(os.path.basename(template_paths[index]))
+
+        # Template features are cached up front so both modes measure per-scan cost only
+        store = TemplateFeatureStore(cache_dir=os.path.join(work_dir, "features"))
+        for path in template_paths:
+            store.get(path)
+
+        full_time, full_results = run_mode(scan_jobs, template_paths, store, None)
+        ranked_time, ranked_results = run_mode(scan_jobs, template_paths, store, args.top_k)
+
+        full_correct = sum(r.get("template_used") == e for r, e in zip(full_results, expected))
+        ranked_correct = sum(r.get("template_used") == e for r, e in zip(ranked_results, expected))
+
+        print("\n--- Template selection benchmark ---")
+        print(f"Templates: {args.templates}, scans: {args.scans}, top-k: {args.top_k}")
+        print(f"Full alignment : {full_time:.2f}s ({full_time / args.scans:.3f}s/scan), "
+              f"correct template {full_correct}/{args.scans}")
+        print(f"Pre-ranked     : {ranked_time:.2f}s ({ranked_time / args.scans:.3f}s/scan), "
+              f"correct template {ranked_correct}/{args.scans}")
+        print(f"Speedup        : {full_time / ranked_time:.2f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+
+# Matcher backends for Agent 1. Each backend takes cached TemplateFeatures and
+# the scan's ORB descriptors and returns the selected correspondences as numpy
+# index arrays (template_idx, scan_idx), best match first.
+
+# Brute force keeps this fraction of its cross-checked matches (original behaviour)
+BF_KEEP_FRACTION = 0.1
+
+
+class BruteForceMatcher:
+    """Exhaustive Hamming matching with cross-check, kept for parity testing."""
+
+    name = "bf"
+
+    def __init__(self, keep_fraction=BF_KEEP_FRACTION):
+        self.keep_fraction = keep_fraction
+        self._bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+
+    def match(self, template_features, des_scan):
+        matches = self._bf.match(template_features.descriptors, des_scan)
+        count = len(matches)
+        template_idx = np.fromiter((m.queryIdx for m in matches), dtype=np.int64, count=count)
+        scan_idx = np.fromiter((m.trainIdx for m in matches), dtype=np.int64, count=count)
+        distances = np.fromiter((m.distance for m in matches), dtype=np.float32, count=count)
+        # Stable sort keeps ties in the same order as the original sorted(matches)
+        best = np.argsort(distances, kind="stable")[:int(count * self.keep_fraction)]
+        return template_idx[best], scan_idx[best]
+
+
+class LshMatcher:
+    """
+    FLANN LSH index over each template's descriptors, built once per template
+    and pyramid level and reused for every scan, followed by Lowe's ratio test.
+    """
+
+    name = "lsh"
+
+    def __init__(self, ratio=0.75, table_number=6, key_size=12, multi_probe_level=1, checks=50):
+        self.ratio = ratio
+        self.index_params = dict(algorithm=6,  # FLANN_INDEX_LSH
+                                 table_number=table_number, key_size=key_size,
+                                 multi_probe_level=multi_probe_level)
+        self.search_params = dict(checks=checks)
+        self._indexes = {}  # (template digest, level shape) -> trained FlannBasedMatcher
+
+    def _index_for(self, template_features):
+        key = (template_features.digest, template_features.shape)
+        index = self._indexes.get(key)
+        if index is None:
+            index = cv2.FlannBasedMatcher(self.index_params, self.search_params)
+            index.add([template_features.descriptors])
+            index.train()
+            self._indexes[key] = index
+        return index
+
+    def match(self, template_features, des_scan):
+        knn = self._index_for(template_features).knnMatch(des_scan, k=2)
+        # LSH may return fewer than two neighbours for some queries; those cannot be ratio-tested
+        pairs = np.array([(m[0].trainIdx, m[0].queryIdx, m[0].distance, m[1].distance)
+                          for m in knn if len(m) == 2], dtype=np.float32).reshape(-1, 4)
+        keep = pairs[:, 2] < self.ratio * pairs[:, 3]
+        selected = pairs[keep]
+        order = np.argsort(selected[:, 2], kind="stable")
+        return selected[order, 0].astype(np.int64), selected[order, 1].astype(np.int64)
+
+
+MATCHERS = {
+    BruteForceMatcher.name: BruteForceMatcher,
+    LshMatcher.name: LshMatcher,
+}
+
+_instances = {}
+
+
+def get_matcher(name="bf"):
+    """Process-wide matcher instance, so per-template indexes survive across scans."""
+    if name not in MATCHERS:
+        raise ValueError(f"Unknown matcher '{name}'. Choose one of: {', '.join(MATCHERS)}")
+    if name not in _instances:
+        _instances[name] = MATCHERS[name]()
+    return _instances[name]
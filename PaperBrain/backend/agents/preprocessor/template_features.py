@@ -0,0 +1,215 @@
+import os
+import sys
+import uuid
+import cv2
+import numpy as np
+
+# Shared with the other agents and the controller (agents/content_hash.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from content_hash import file_sha256
+
+# Template features are computed once per template *content* and reused for
+# every scan aligned against it. Entries live in memory for the lifetime of the
+# process and on disk as compressed .npz files so later runs skip detection too.
+FEATURE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template_features")
+ORB_FEATURES = 5000
+
+# Column layout of the keypoint array stored on disk (one row per cv2.KeyPoint)
+KEYPOINT_FIELDS = ("x", "y", "size", "angle", "response", "octave", "class_id")
+
+# Global descriptor used to pre-rank templates before full ORB alignment
+THUMBNAIL_SIZE = (48, 64)  # (width, height)
+
+
+def keypoints_to_array(keypoints):
+    """Pack cv2.KeyPoint objects into an (N, 7) float32 array."""
+    if not keypoints:
+        return np.zeros((0, len(KEYPOINT_FIELDS)), dtype=np.float32)
+    return np.array(
+        [(kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave, kp.class_id) for kp in keypoints],
+        dtype=np.float32,
+    )
+
+
+def make_thumbnail(img_gray):
+    """
+    Tiny zero-mean, unit-norm thumbnail of a page. The dot product of two
+    thumbnails is their normalized cross-correlation, a cheap global
+    similarity that is robust to the small shifts/skews of a scanned sheet.
+    """
+    small = cv2.resize(img_gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur(small, (3, 3), 0).astype(np.float32).ravel()
+    small -= small.mean()
+    norm = np.linalg.norm(small)
+    return small / norm if norm > 0 else small
+
+
+def downscale(img, scale):
+    """One pyramid level: the image resized by `scale` with area averaging."""
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def array_to_keypoints(array):
+    """Rebuild cv2.KeyPoint objects from an array made by keypoints_to_array."""
+    return [
+        cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(response), int(octave), int(class_id))
+        for x, y, size, angle, response, octave, class_id in array
+    ]
+
+
+class TemplateFeatures:
+    """ORB features of one template image, kept as plain numpy arrays."""
+
+    def __init__(self, digest, keypoints, descriptors, shape, thumbnail):
+        self.digest = digest
+        self.keypoints = keypoints        # (N, 7) float32, see KEYPOINT_FIELDS
+        self.descriptors = descriptors    # (N, 32) uint8 or None when nothing was detected
+        self.shape = tuple(int(v) for v in shape)  # (height, width) of the template
+        self.thumbnail = thumbnail        # flattened make_thumbnail() output
+
+    @property
+    def points(self):
+        """(N, 2) float32 array of keypoint coordinates."""
+        return self.keypoints[:, :2]
+
+    def cv_keypoints(self):
+        return array_to_keypoints(self.keypoints)
+
+
+class TemplateFeatureStore:
+    """
+    Computes ORB keypoints/descriptors once per template and reuses them.
+
+    Entries are keyed by the SHA-256 of the template file, so a template that is
+    replaced on disk (even under the same name) gets fresh features, and the
+    stale .npz written for the old content is removed.
+    """
+
+    def __init__(self, cache_dir=FEATURE_CACHE_DIR, nfeatures=ORB_FEATURES):
+        self.cache_dir = cache_dir
+        self.nfeatures = nfeatures
+        self._features = {}   # (digest, scale) -> TemplateFeatures
+        self._digests = {}    # template path -> (mtime_ns, size, digest)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _digest_for(self, template_path):
+        stat = os.stat(template_path)
+        cached = self._digests.get(template_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2], None
+        digest = file_sha256(template_path)
+        previous = cached[2] if cached and cached[2] != digest else None
+        self._digests[template_path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest, previous
+
+    def nfeatures_for(self, scale=1.0):
+        """ORB budget of a pyramid level; smaller levels need fewer features."""
+        return self.nfeatures if scale == 1.0 else max(500, int(self.nfeatures * scale))
+
+    def _cache_path(self, digest, scale=1.0):
+        suffix = "" if scale == 1.0 else f"_s{scale:g}"
+        return os.path.join(self.cache_dir, f"{digest}_orb{self.nfeatures_for(scale)}{suffix}.npz")
+
+    def _load(self, digest, scale=1.0):
+        path = self._cache_path(digest, scale)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if "thumbnail" not in data.files:
+                    return None  # written by an older version, recompute
+                descriptors = data["descriptors"]
+                return TemplateFeatures(
+                    digest,
+                    data["keypoints"],
+                    descriptors if descriptors.size else None,
+                    data["shape"],
+                    data["thumbnail"],
+                )
+        except Exception as e:
+            print(f"[Agent 1] Ignoring unreadable feature cache {path}: {e}")
+            return None
+
+    def _save(self, features, scale=1.0):
+        path = self._cache_path(features.digest, scale)
+        descriptors = features.descriptors
+        if descriptors is None:
+            descriptors = np.zeros((0, 32), dtype=np.uint8)
+        # Unique per writer: alignment worker processes may compute the same entry at once
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+        try:
+            np.savez_compressed(tmp_path, keypoints=features.keypoints, descriptors=descriptors,
+                                shape=np.array(features.shape, dtype=np.int32), thumbnail=features.thumbnail)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _invalidate(self, digest):
+        for key in [key for key in self._features if key[0] == digest]:
+            del self._features[key]
+        for filename in os.listdir(self.cache_dir):
+            if filename.startswith(f"{digest}_"):
+                os.remove(os.path.join(self.cache_dir, filename))
+
+    def compute(self, img_template, digest, scale=1.0):
+        orb = cv2.ORB_create(nfeatures=self.nfeatures_for(scale))
+        kp_template, des_template = orb.detectAndCompute(img_template, None)
+        return TemplateFeatures(digest, keypoints_to_array(kp_template), des_template,
+                                img_template.shape[:2], make_thumbnail(img_template))
+
+    def get(self, template_path, scale=1.0):
+        """
+        Return TemplateFeatures for template_path, or None if it cannot be read.
+        scale < 1 returns the features of a downscaled pyramid level; keypoint
+        coordinates and shape are then in that level's pixel units.
+        """
+        try:
+            digest, stale_digest = self._digest_for(template_path)
+        except OSError as e:
+            # Missing or unreadable template: the caller skips it
+            print(f"[Agent 1] Could not read template {template_path}: {e}")
+            return None
+        if stale_digest:
+            print(f"[Agent 1] Template changed, invalidating cached features: {template_path}")
+            self._invalidate(stale_digest)
+
+        features = self._features.get((digest, scale))
+        if features is not None:
+            return features
+
+        features = self._load(digest, scale)
+        if features is None:
+            img_template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+            if img_template is None:
+                return None
+            if scale != 1.0:
+                img_template = downscale(img_template, scale)
+            print(f"[Agent 1] Computing template features: {template_path} (scale {scale:g})")
+            features = self.compute(img_template, digest, scale)
+            self._save(features, scale)
+
+        self._features[(digest, scale)] = features
+        return features
+
+
+def rank_templates(img_scan, template_features):
+    """
+    Orders templates by thumbnail similarity to the scan, best first.
+    Returns a list of (index into template_features, similarity).
+    """
+    scan_thumbnail = make_thumbnail(img_scan)
+    similarities = np.array([float(np.dot(scan_thumbnail, f.thumbnail)) for f in template_features])
+    order = np.argsort(-similarities, kind="stable")
+    return [(int(i), float(similarities[i])) for i in order]
+
+
+_default_store = None
+
+
+def get_default_store():
+    """Process-wide store shared by every run_alignment_agent call."""
+    global _default_store
+    if _default_store is None:
+        _default_store = TemplateFeatureStore()
+    return _default_store
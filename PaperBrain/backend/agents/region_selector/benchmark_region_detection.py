@@ -0,0 +1,121 @@
+"""
+Benchmark: findContours region detection vs. connected components.
+
+Generates synthetic blank templates and filled-in copies (written answers,
+circled answers with text inside the circle, ink specks) and runs
+detect_regions with each engine / downscale factor. Reports per-sheet time
+and a parity check: both engines must return identical ROIs (same boxes,
+same order) at every downscale, and downscaled runs report how many ROIs
+still match a box of the original full-size contours run (IoU >= 0.8).
+
+Usage: python benchmark_region_detection.py [--sheets 6] [--questions 30] [--height 3300] [--width 2550] [--repeats 3]
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from region_selector import REGION_ENGINES, detect_regions, prepare_template
+
+
+def make_pair(seed, height=3300, width=2550, questions=30):
+    """Returns (blank template, filled sheet) as BGR images."""
+    rng = np.random.default_rng(seed)
+    blank = np.full((height, width), 255, np.uint8)
+    for i in range(questions):
+        y = 120 + i * (height - 200) // questions
+        cv2.putText(blank, f"Q{i + 1}. " + "".join(chr(int(c)) for c in rng.integers(65, 91, 12)),
+                    (80, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2)
+    # Mild scanner noise, present on both images
+    noise = rng.normal(0, 3, blank.shape)
+    blank = np.clip(blank + noise, 0, 255).astype(np.uint8)
+
+    filled = blank.copy()
+    for i in range(questions):
+        y = 120 + i * (height - 200) // questions
+        x = int(rng.integers(width // 2, width - 500))
+        kind = i % 4
+        if kind == 3:
+            # Circled answer: a ring around the text (nested regions after merging)
+            cv2.ellipse(filled, (x + 150, y - 10), (230, 45), 0, 0, 360, 0, 3)
+            cv2.putText(filled, "abc"[i % 3], (x + 140, y), cv2.FONT_HERSHEY_SIMPLEX, 1.4, 0, 3)
+        else:
+            words = int(rng.integers(1, 4))
+            for w in range(words):
+                cv2.putText(filled, "".join("abcdefg"[int(c)] for c in rng.integers(0, 7, 4)),
+                            (x + w * 140, y), cv2.FONT_HERSHEY_SIMPLEX, 1.3, 20, 3)
+    # Ink specks (filtered out by area)
+    for _ in range(40):
+        cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+        cv2.circle(filled, (cx, cy), 2, 0, -1)
+    return cv2.cvtColor(blank, cv2.COLOR_GRAY2BGR), cv2.cvtColor(filled, cv2.COLOR_GRAY2BGR)
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def matched(boxes, reference, threshold=0.8):
+    return sum(1 for box in boxes if any(iou(box, ref) >= threshold for ref in reference))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sheets", type=int, default=6)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--height", type=int, default=3300)
+    parser.add_argument("--width", type=int, default=2550)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    modes = [(engine, downscale) for downscale in (1, 2, 4) for engine in REGION_ENGINES]
+    timings = {mode: [] for mode in modes}
+    outputs = {mode: [] for mode in modes}
+
+    for seed in range(args.sheets):
+        blank, filled = make_pair(seed, args.height, args.width, args.questions)
+        gray_blank = prepare_template(blank)
+        for mode in modes:
+            engine, downscale = mode
+            best = None
+            for _ in range(args.repeats):
+                started = time.perf_counter()
+                boxes = detect_regions(gray_blank, filled, engine, downscale)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[mode].append(best)
+            outputs[mode].append(boxes)
+
+    reference = outputs[("contours", 1)]
+    baseline = np.median(timings[("contours", 1)])
+    print("\n--- Region detection benchmark ---")
+    print(f"Page size: {args.width}x{args.height}, sheets: {args.sheets}, "
+          f"ROIs per sheet: {np.mean([len(r) for r in reference]):.1f}")
+    for mode in modes:
+        engine, downscale = mode
+        median = np.median(timings[mode])
+        if downscale == 1:
+            same = sum(boxes == ref for boxes, ref in zip(outputs[mode], reference))
+            parity = f"identical ROIs on {same}/{args.sheets} sheet(s)"
+        else:
+            found = sum(matched(boxes, ref) for boxes, ref in zip(outputs[mode], reference))
+            total = sum(len(boxes) for boxes in outputs[mode])
+            parity = f"{found}/{total} ROI(s) match a reference box (IoU >= 0.8), reference has {sum(map(len, reference))}"
+        print(f"{engine:<10} downscale {downscale}: {median * 1000:7.1f} ms/sheet "
+              f"({baseline / median:4.2f}x)  {parity}")
+
+    # Both engines must agree exactly on the same mask
+    exact = all(outputs[("components", downscale)] == outputs[("contours", downscale)] for downscale in (1, 2, 4))
+    print(f"\nParity (components vs. contours, every downscale): {'OK' if exact else 'MISMATCH'}")
+    if not exact:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
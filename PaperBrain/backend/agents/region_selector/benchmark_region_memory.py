@@ -0,0 +1,109 @@
+"""
+Benchmark: peak memory of region selection per sheet.
+
+Compares the way a sheet reaches detect_regions:
+  legacy:   re-read from disk as BGR (3 channels), copied for the debug drawing
+  disk:     re-read from disk in its stored (grayscale) layout (load_aligned_image)
+  memory:   the aligned array handed over by the preprocessor (align_scan keep_image)
+  memory, no debug: same, with debug drawing disabled (no copy of the sheet)
+
+Peaks come from tracemalloc, which sees every numpy array (including the ones
+OpenCV returns) but not OpenCV's internal scratch buffers; the array handed
+over in memory already exists, so it is not counted for "memory". Debug
+drawing is measured up to the annotated canvas (matplotlib is left out).
+
+Usage: python benchmark_region_memory.py [--sheets 4] [--height 3300] [--width 2550]
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from benchmark_region_detection import make_pair
+from region_selector import detect_regions, load_aligned_image, match_template_size, prepare_template
+
+
+def draw_boxes(img, boxes):
+    """The canvas save_debug_image draws on (a copy, or a BGR conversion of a gray sheet)."""
+    canvas = img.copy() if img.ndim == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    for x, y, w, h in boxes:
+        cv2.rectangle(canvas, (x, y), (x + w, y + h), (0, 255, 0), 2)
+    return canvas
+
+
+def run_legacy(gray_blank, image_path, aligned):
+    img = cv2.imread(image_path)
+    resized = match_template_size(img, gray_blank.shape)
+    boxes = detect_regions(gray_blank, resized)
+    draw_boxes(resized, boxes)
+    return boxes
+
+
+def run_disk(gray_blank, image_path, aligned):
+    img = match_template_size(load_aligned_image(image_path), gray_blank.shape)
+    boxes = detect_regions(gray_blank, img)
+    draw_boxes(img, boxes)
+    return boxes
+
+
+def run_memory(gray_blank, image_path, aligned):
+    img = match_template_size(aligned, gray_blank.shape)
+    boxes = detect_regions(gray_blank, img)
+    draw_boxes(img, boxes)
+    return boxes
+
+
+def run_memory_no_debug(gray_blank, image_path, aligned):
+    return detect_regions(gray_blank, match_template_size(aligned, gray_blank.shape))
+
+
+MODES = [
+    ("legacy", run_legacy),
+    ("disk", run_disk),
+    ("memory", run_memory),
+    ("memory, no debug", run_memory_no_debug),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sheets", type=int, default=4)
+    parser.add_argument("--height", type=int, default=3300)
+    parser.add_argument("--width", type=int, default=2550)
+    args = parser.parse_args()
+
+    peaks = {name: [] for name, _ in MODES}
+    outputs = {name: [] for name, _ in MODES}
+    with tempfile.TemporaryDirectory() as tmp:
+        for seed in range(args.sheets):
+            blank, filled = make_pair(seed, args.height, args.width)
+            gray_blank = prepare_template(blank)
+            # The preprocessor warps grayscale scans and writes them as such
+            aligned = cv2.cvtColor(filled, cv2.COLOR_BGR2GRAY)
+            image_path = os.path.join(tmp, f"aligned_scan_{seed}.png")
+            cv2.imwrite(image_path, aligned)
+            for name, run in MODES:
+                tracemalloc.start()
+                outputs[name].append(run(gray_blank, image_path, aligned))
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                peaks[name].append(peak)
+
+    baseline = np.median(peaks["legacy"])
+    print("\n--- Region selection peak memory ---")
+    print(f"Page size: {args.width}x{args.height}, sheets: {args.sheets}")
+    for name, _ in MODES:
+        median = np.median(peaks[name])
+        print(f"{name:<18} {median / 2 ** 20:7.1f} MiB/sheet  ({(1 - median / baseline) * 100:5.1f}% less than legacy)")
+
+    same = all(outputs[name] == outputs["legacy"] for name, _ in MODES)
+    print(f"\nParity (identical ROIs in every mode): {'OK' if same else 'MISMATCH'}")
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Region detection parity: the components and contours engines return identical
+ROIs on the same mask at every REGION_DOWNSCALE, and downscaled boxes are
+scaled back onto the full-size page.
+
+Run from this folder: python -m pytest test_region_selector.py
+"""
+import pytest
+
+from benchmark_region_detection import make_pair, matched
+from region_selector import detect_regions, prepare_template
+
+SEEDS = (0, 1, 2, 3)
+DOWNSCALES = (1, 2, 4)
+# Share of downscaled ROIs matching a full-size box (IoU >= 0.8). Downscale 4
+# merges some nearby words, but a box scaling error would match next to none.
+MIN_MATCHED = {2: 0.95, 4: 0.6}
+
+
+@pytest.fixture(scope="module")
+def sheets():
+    """seed -> (template gray image, filled sheet, full-size contours ROIs)"""
+    pairs = {}
+    for seed in SEEDS:
+        blank, filled = make_pair(seed)
+        gray_blank = prepare_template(blank)
+        pairs[seed] = gray_blank, filled, detect_regions(gray_blank, filled, "contours", 1)
+    return pairs
+
+
+@pytest.mark.parametrize("downscale", DOWNSCALES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_engines_return_identical_rois(sheets, seed, downscale):
+    gray_blank, filled, _ = sheets[seed]
+    contours = detect_regions(gray_blank, filled, "contours", downscale)
+    components = detect_regions(gray_blank, filled, "components", downscale)
+    assert contours
+    assert components == contours
+
+
+@pytest.mark.parametrize("downscale", [d for d in DOWNSCALES if d > 1])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_downscaled_rois_are_full_size_boxes(sheets, seed, downscale):
+    gray_blank, filled, reference = sheets[seed]
+    boxes = detect_regions(gray_blank, filled, "contours", downscale)
+    height, width = gray_blank.shape[:2]
+    assert all(x >= 0 and y >= 0 and x + w <= width and y + h <= height for x, y, w, h in boxes)
+    assert matched(boxes, reference) >= MIN_MATCHED[downscale] * len(boxes)
+
+
+def test_unknown_engine_is_rejected(sheets):
+    gray_blank, filled, _ = sheets[SEEDS[0]]
+    with pytest.raises(ValueError):
+        detect_regions(gray_blank, filled, "hough")
@@ -0,0 +1,67 @@
+"""
+Benchmark: per-ROI readtext loop vs. batched recognition for one sheet.
+
+Renders a synthetic 50-question MCQ sheet (one answer letter per ROI), runs
+both recognition modes from ocr_server.py on it and reports per-sheet latency
+and how often the two modes agree with the rendered answers.
+
+Usage: python benchmark_ocr_batching.py [--questions 50] [--repeats 3]
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+import ocr_server
+
+
+def make_sheet(questions, seed=0):
+    """Returns (color sheet, rois, expected answers)."""
+    rng = np.random.default_rng(seed)
+    row_height = 60
+    sheet = np.full((questions * row_height + 100, 900, 3), 255, np.uint8)
+    rois, answers = [], []
+    for i in range(questions):
+        answer = "abc"[int(rng.integers(0, 3))]
+        y = 50 + i * row_height
+        cv2.putText(sheet, f"Q{i + 1}.", (40, y + 35), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+        x = 200 + int(rng.integers(0, 40))
+        cv2.putText(sheet, answer, (x, y + 38), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (30, 30, 30), 3)
+        rois.append([x - 5, y + 5, 45, 45])
+        answers.append(answer)
+    return sheet, rois, answers
+
+
+def time_mode(recognize, sheet, rois, repeats):
+    timings, output = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        output = recognize(sheet, rois)
+        timings.append(time.perf_counter() - started)
+    return min(timings), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    os.makedirs("debug_crops", exist_ok=True)
+    sheet, rois, answers = make_sheet(args.questions)
+
+    print("\n--- OCR batching benchmark ---")
+    print(f"Questions per sheet: {args.questions}, best of {args.repeats} run(s)")
+    baseline = None
+    for mode, recognize in ocr_server.RECOGNIZERS.items():
+        elapsed, output = time_mode(recognize, sheet, rois, args.repeats)
+        correct = sum(got == expected for got, expected in zip(output, answers))
+        baseline = baseline or elapsed
+        print(f"{mode:<8}: {elapsed:.2f}s/sheet ({elapsed / args.questions * 1000:.1f}ms/ROI), "
+              f"correct {correct}/{args.questions}, speedup {baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import base64
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# Shared with the region selector (agents/debug_artifacts.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from debug_artifacts import get_artifact_writer
+
+# The OCR core (EasyOCR reader + ROI recognition), used by the MCP server
+# (ocr_server.py, one process per worker) and by the resident in-process
+# service (ocr_service.py).
+
+# When several servers run side by side (run_agent2_test.py --workers N), the
+# client splits the cores between them so torch does not oversubscribe.
+OCR_TORCH_THREADS = int(os.environ.get("OCR_TORCH_THREADS", "0"))
+
+# "per_roi": readtext (detection + recognition) on every padded crop.
+# "batched": skip detection and recognize all padded ROI boxes of a sheet in
+#            one reader.recognize call with precomputed boxes.
+OCR_MODES = ("per_roi", "batched")
+OCR_MODE = os.environ.get("OCR_MODE", "per_roi")
+OCR_BATCH_SIZE = int(os.environ.get("OCR_BATCH_SIZE", "16"))
+OCR_ALLOWLIST = 'abc023456789' # *** REMOVED REDUNDANT UPPERCASE ***
+
+# Where ROI crops go (the controller points it into the session workspace).
+# Crops are only written at PAPERBRAIN_DEBUG_ARTIFACTS=sampled/all, in the background.
+DEBUG_CROPS_DIR = os.environ.get("OCR_DEBUG_DIR", "debug_crops")
+
+
+def create_reader(torch_threads=OCR_TORCH_THREADS):
+    """
+    Loads EasyOCR (torch + model weights; seconds to tens of seconds).
+    Raises RuntimeError if easyocr is not installed.
+    """
+    try:
+        import easyocr
+    except ImportError as e:
+        raise RuntimeError("easyocr not installed. Run: pip install easyocr") from e
+
+    if torch_threads and torch_threads > 0:
+        import torch
+        torch.set_num_threads(torch_threads)
+        print(f"Torch threads: {torch_threads}", file=sys.stderr)
+
+    print("Initializing EasyOCR reader...", file=sys.stderr)
+    # Suppress stdout from easyocr
+    original_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+    finally:
+        sys.stdout = original_stdout # Restore stdout
+    print("EasyOCR ready!", file=sys.stderr)
+    return reader
+
+
+def load_color_image(arguments: dict):
+    """
+    Loads the sheet image for a tool call. Local callers pass "image_path"
+    (read straight from disk); remote clients may still send "image_base64".
+    """
+    image_path = arguments.get("image_path")
+    if image_path:
+        # Load as a 3-channel COLOR image, which easyocr prefers
+        color_img = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if color_img is None: raise ValueError(f"Could not read image at {image_path}")
+        return color_img
+
+    image_base64 = arguments.get("image_base64")
+    if not image_base64:
+        raise ValueError("Either 'image_path' or 'image_base64' is required")
+    nparr = np.frombuffer(base64.b64decode(image_base64), np.uint8)
+    color_img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if color_img is None: raise ValueError("Could not decode image")
+    return color_img
+
+
+def padded_roi_box(box, img_w, img_h, padding):
+    """ROI (x, y, w, h) grown by padding and clipped, as (x_start, x_end, y_start, y_end)."""
+    x, y, w, h = box
+    return (max(0, x - padding), min(img_w, x + w + padding),
+            max(0, y - padding), min(img_h, y + h + padding))
+
+
+class OcrEngine:
+    """
+    Recognizes the text in the ROIs of a sheet with one loaded EasyOCR reader.
+    Not thread-safe: one engine serves one caller at a time.
+    """
+
+    def __init__(self, reader, debug_dir=DEBUG_CROPS_DIR, artifacts=None, batch_size=OCR_BATCH_SIZE):
+        self.reader = reader
+        self.debug_dir = debug_dir
+        self.artifacts = artifacts or get_artifact_writer()
+        self.batch_size = batch_size
+
+    def _save_crops(self, crops, debug_dir):
+        """Queues the ROI crops of a sheet as debug_dir/roi_N.png, if this sheet gets debug images."""
+        if not self.artifacts.wants():
+            return
+        debug_dir = debug_dir or self.debug_dir
+        for i, crop in enumerate(crops):
+            self.artifacts.write(os.path.join(debug_dir, f"roi_{i+1}.png"), crop)
+
+    # *** CHANGED PADDING FROM 10 to 5 ***
+    # This should help fix the "ca" error by not grabbing the box line.
+    def recognize_per_roi(self, color_img, rois: list, padding: int = 20, debug_dir=None) -> list:
+        """
+        Crops and recognizes text from ROIs using EasyOCR.
+        """
+        try:
+            (img_h, img_w) = color_img.shape[:2]
+            crops = []
+            for box in rois:
+                x_start, x_end, y_start, y_end = padded_roi_box(box, img_w, img_h, padding)
+                # Crop the padded region from the COLOR image
+                crops.append(color_img[y_start:y_end, x_start:x_end])
+
+            # --- Save debug images ---
+            self._save_crops(crops, debug_dir)
+
+            recognized_answers = []
+            for i, padded_crop in enumerate(crops):
+                # --- Call EasyOCR ---
+                # We give it the raw color crop
+                result = self.reader.readtext(
+                    padded_crop,
+                    detail=0,
+                    allowlist=OCR_ALLOWLIST
+                )
+
+                if result:
+                    # result is like ['b'], so we take the first item
+                    answer = result[0].lower().strip()
+                    recognized_answers.append(answer)
+                    print(f"  ROI {i+1}: Found '{answer}'", file=sys.stderr)
+                else:
+                    # No text found
+                    recognized_answers.append("") # Append empty string
+                    print(f"  ROI {i+1}: Found no text", file=sys.stderr)
+
+            return recognized_answers
+
+        except Exception as e:
+            print(f"EasyOCR processing failed: {e}", file=sys.stderr)
+            raise ValueError(f"EasyOCR processing failed: {str(e)}")
+
+    def recognize_batched(self, color_img, rois: list, padding: int = 20, debug_dir=None) -> list:
+        """
+        Batched variant of recognize_per_roi. The ROIs are already known, so
+        CRAFT text detection is skipped entirely: every padded ROI is handed to
+        reader.recognize as a precomputed box, and EasyOCR crops, resizes/pads
+        and runs the recognizer over them in batches of batch_size. Each padded
+        ROI is read as a single text line.
+        """
+        try:
+            (img_h, img_w) = color_img.shape[:2]
+            boxes = [padded_roi_box(box, img_w, img_h, padding) for box in rois]
+
+            # --- Save debug images ---
+            self._save_crops([color_img[y_start:y_end, x_start:x_end] for x_start, x_end, y_start, y_end in boxes],
+                             debug_dir)
+
+            gray_img = cv2.cvtColor(color_img, cv2.COLOR_BGR2GRAY)
+            results = self.reader.recognize(
+                gray_img,
+                horizontal_list=[list(box) for box in boxes],
+                free_list=[],
+                detail=1,
+                batch_size=self.batch_size,
+                allowlist=OCR_ALLOWLIST
+            )
+
+            # EasyOCR may reorder boxes (it sorts them top to bottom when batching),
+            # so map results back to ROIs by their top-left corner.
+            texts_by_corner = {}
+            for corners, text, _confidence in results:
+                key = (int(corners[0][0]), int(corners[0][1]))
+                texts_by_corner.setdefault(key, []).append(text)
+
+            recognized_answers = []
+            for i, (x_start, _, y_start, _) in enumerate(boxes):
+                texts = texts_by_corner.get((x_start, y_start))
+                answer = texts.pop(0).lower().strip() if texts else ""
+                recognized_answers.append(answer)
+                print(f"  ROI {i+1}: Found '{answer}'" if answer else f"  ROI {i+1}: Found no text", file=sys.stderr)
+
+            return recognized_answers
+
+        except Exception as e:
+            print(f"EasyOCR batched processing failed: {e}", file=sys.stderr)
+            raise ValueError(f"EasyOCR processing failed: {str(e)}")
+
+    def recognize(self, color_img, rois: list, mode=None, debug_dir=None) -> list:
+        """Answers of every ROI, in ROI order, with the given OCR_MODES mode (default OCR_MODE)."""
+        mode = mode or OCR_MODE
+        if mode == "batched":
+            return self.recognize_batched(color_img, rois, debug_dir=debug_dir)
+        if mode == "per_roi":
+            return self.recognize_per_roi(color_img, rois, debug_dir=debug_dir)
+        raise ValueError(f"Unknown OCR mode: {mode!r} (expected one of {', '.join(OCR_MODES)})")
+
+    def read_text_in_rois(self, arguments: dict, debug_dir=None) -> dict:
+        """
+        The read_text_in_rois tool: arguments hold "rois", "image_path" or
+        "image_base64" and an optional "mode". Returns {"Q1": "c", "Q2": "6", ...}.
+        """
+        rois = arguments["rois"]
+        print(f"--- Tool 'read_text_in_rois' (EasyOCR Model) called with {len(rois)} ROIs ---", file=sys.stderr)
+        color_img = load_color_image(arguments)
+        recognized_list = self.recognize(color_img, rois, arguments.get("mode"), debug_dir)
+
+        # Convert the list of answers into the desired dictionary format
+        # Format as "Q1", "Q2", etc.
+        return {f"Q{i+1}": answer for i, answer in enumerate(recognized_list)}
+
+
+# --- Agent 1 data files -> Agent 2 evaluation files ---
+def job_arguments(job_file_path):
+    """read_text_in_rois arguments for one Agent 1 data file, or None if it has no image or ROIs."""
+    with open(job_file_path, 'r') as f:
+        data = json.load(f)
+
+    rois_to_test = data.get("rois")
+
+    # Prefer the aligned image on disk; base64 is only for remote clients
+    tool_arguments = {"rois": rois_to_test}
+    if data.get("image_path"):
+        tool_arguments["image_path"] = data["image_path"]
+    elif data.get("image_base64"):
+        tool_arguments["image_base64"] = data["image_base64"]
+
+    if len(tool_arguments) < 2 or not rois_to_test:
+        print(f"Skipping job, data file is missing 'image_path'/'image_base64' or 'rois'.")
+        return None
+    return tool_arguments
+
+
+def save_evaluation(job_file_path, answers_dict, output_folder):
+    """Writes <sheet>_evaluation.json (placeholder student info + answers); returns its path."""
+    # Placeholder student info
+    student_info = {
+        "name": "STUDENT_NAME_HERE",
+        "roll_no": "ROLL_NO_HERE"
+    }
+
+    final_output = {
+        "student_info": student_info,
+        "answers": answers_dict
+    }
+
+    base_name = os.path.basename(job_file_path)
+    file_name_only = os.path.splitext(base_name)[0].replace('_data', '')
+    output_filename = os.path.join(output_folder, f"{file_name_only}_evaluation.json")
+
+    with open(output_filename, 'w') as f:
+        json.dump(final_output, f, indent=4)
+
+    print(f"Success! Saved final evaluation to {output_filename}")
+    return output_filename
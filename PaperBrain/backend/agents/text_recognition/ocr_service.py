@@ -0,0 +1,218 @@
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from ocr_engine import OCR_TORCH_THREADS, OcrEngine, create_reader, job_arguments, save_evaluation
+
+# Resident OCR service: the Flask server loads EasyOCR once (at startup, or on
+# the first request) and keeps it, instead of every run starting
+# run_agent2_test.py -> ocr_server.py and paying torch + model loading again.
+#
+# The service holds one engine per worker (OCR_WORKERS, like the per-run
+# server pool), each owned by its own service thread, so an engine is never
+# used from two threads at once while up to `workers` sheets are recognized
+# concurrently. Every engine is a full EasyOCR reader in memory. Requests go
+# through one in-process queue; callers get a Future. health() reports the
+# loading state and counters for /api/health.
+#
+# Status: "idle" (not started) -> "loading" -> "warming_up" -> "ready",
+# or "failed" (no engine loaded: requests fail with the load error) / "stopped".
+
+# Engines (and service threads) kept loaded
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "1"))
+# Seconds a caller waits for one sheet (loading time included)
+OCR_SERVICE_TIMEOUT = float(os.environ.get("PAPERBRAIN_OCR_TIMEOUT", "120"))
+
+
+class OcrService:
+    """`workers` resident OcrEngines serving read_text_in_rois requests from one queue."""
+
+    def __init__(self, workers=OCR_WORKERS, torch_threads=None, reader_factory=create_reader):
+        self.workers = max(1, workers)
+        if torch_threads is None:
+            # Like run_agent2_test.run_batch_ocr: keep N engines x torch threads within the cores
+            torch_threads = OCR_TORCH_THREADS or (max(1, (os.cpu_count() or 1) // self.workers)
+                                                  if self.workers > 1 else 0)
+        self.torch_threads = torch_threads
+        self.reader_factory = reader_factory
+        self.engines = []
+        self.status = "idle"
+        self.error = None
+        self.load_s = None
+        self.warmup_s = None
+        self.requests = 0
+        self.failures = 0
+        self.busy = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._pending_loads = self.workers
+        self._threads = []
+        self._stopping = False
+
+    # ---------------- Lifecycle ----------------
+    def start(self, warm_up=False):
+        """
+        Starts the service threads, which load their engines right away (and
+        with warm_up, run one recognition so the first real sheet is not
+        slower). Returns immediately; safe to call more than once.
+        """
+        with self._lock:
+            if not self._threads:
+                self.status = "loading"
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._run, args=(warm_up,), name=f"ocr-service-{i}",
+                                              daemon=True)
+                    self._threads.append(thread)
+                    thread.start()
+        return self
+
+    def wait_ready(self, timeout=None):
+        """True once the engines are loaded (at least one), False if loading failed or timed out."""
+        return self._loaded.wait(timeout) and bool(self.engines)
+
+    def stop(self, timeout=None):
+        """
+        Stops the service threads after the requests already queued. Returns
+        True once every thread has exited; the status only becomes "stopped"
+        then (a thread still busy after timeout keeps the service running).
+        """
+        with self._lock:
+            self._stopping = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if any(thread.is_alive() for thread in threads):
+            return False
+        self.status = "stopped"
+        return True
+
+    def _load(self, warm_up):
+        """Loads this thread's engine; returns it, or None if loading failed."""
+        engine = None
+        started = time.perf_counter()
+        try:
+            engine = OcrEngine(self.reader_factory(self.torch_threads))
+            load_s = round(time.perf_counter() - started, 3)
+            print(f"✅ OCR service: EasyOCR loaded in {load_s}s", file=sys.stderr)
+            warmup_s = None
+            if warm_up:
+                with self._lock:
+                    if self.status == "loading":
+                        self.status = "warming_up"
+                started = time.perf_counter()
+                # One small blank crop through the models (no debug images)
+                blank = np.full((64, 160, 3), 255, np.uint8)
+                engine.reader.readtext(blank, detail=0)
+                warmup_s = round(time.perf_counter() - started, 3)
+            with self._lock:
+                self.engines.append(engine)
+                self.load_s = max(self.load_s or 0, load_s)
+                if warmup_s is not None:
+                    self.warmup_s = max(self.warmup_s or 0, warmup_s)
+        except Exception as e:
+            engine = None
+            with self._lock:
+                self.error = str(e)
+            print(f"❌ OCR service failed to load: {e}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._pending_loads -= 1
+                if self._pending_loads == 0:
+                    self.status = "ready" if self.engines else "failed"
+                    self._loaded.set()
+        return engine
+
+    def _run(self, warm_up):
+        engine = self._load(warm_up)
+        if engine is None:
+            # The other threads serve the queue; if none loaded, this one
+            # stays to fail requests with the load error
+            self._loaded.wait()
+            if self.engines:
+                return
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            future, arguments, debug_dir = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self.busy += 1
+            try:
+                if engine is None:
+                    raise RuntimeError(f"OCR engine failed to load: {self.error}")
+                future.set_result(engine.read_text_in_rois(arguments, debug_dir))
+                with self._lock:
+                    self.requests += 1
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+
+    # ---------------- Requests ----------------
+    def submit(self, arguments, debug_dir=None):
+        """Queues one read_text_in_rois call (see OcrEngine); the Future resolves to {"Q1": ..., ...}."""
+        if self._stopping:
+            raise RuntimeError("OCR service is stopped")
+        self.start()
+        future = Future()
+        self._queue.put((future, arguments, debug_dir))
+        return future
+
+    def read_text_in_rois(self, arguments, debug_dir=None, timeout=OCR_SERVICE_TIMEOUT):
+        return self.submit(arguments, debug_dir).result(timeout)
+
+    def process_job(self, job_file_path, output_folder, debug_dir=None, timeout=OCR_SERVICE_TIMEOUT):
+        """
+        Same as run_agent2_test.process_job, in-process: recognizes one Agent 1
+        data file and writes its *_evaluation.json to output_folder. Returns the
+        saved path, or None if the data file has nothing to recognize. Calls
+        from several threads are recognized concurrently, up to `workers`.
+        """
+        print(f"\n--- [ocr service] Processing job: {job_file_path} ---")
+        tool_arguments = job_arguments(job_file_path)
+        if tool_arguments is None:
+            return None
+        answers_dict = self.read_text_in_rois(tool_arguments, debug_dir, timeout)
+        return save_evaluation(job_file_path, answers_dict, output_folder)
+
+    def health(self):
+        with self._lock:
+            return {
+                "status": self.status,
+                "error": self.error,
+                "workers": self.workers,
+                "engines": len(self.engines),
+                "load_s": self.load_s,
+                "warmup_s": self.warmup_s,
+                "requests": self.requests,
+                "failures": self.failures,
+                "queued": self._queue.qsize(),
+                "busy": self.busy,
+            }
+
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+
+def get_ocr_service():
+    """Process-wide OcrService (created, not started: see OcrService.start)."""
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            _default_service = OcrService()
+        return _default_service
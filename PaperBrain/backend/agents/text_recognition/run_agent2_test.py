@@ -1,12 +1,15 @@
 import asyncio
-import base64
 import json
 import os
 import sys
 import glob   # <-- NEW
+import argparse
+from contextlib import AsyncExitStack
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+from ocr_engine import job_arguments, save_evaluation
+
 # Fix Windows console encoding to handle Unicode properly
 if sys.platform == 'win32':
     try:
@@ -16,99 +19,135 @@ if sys.platform == 'win32':
         pass
 
 # --- 1. CONFIGURE FOLDER PATHS ---
-AGENT1_OUTPUT_FOLDER = "../region_selector/agent1_output"
-FINAL_EVALUATIONS_FOLDER = "./Outputs"
+# Relative to this file, so the client can also be imported (controller streaming mode)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT1_OUTPUT_FOLDER = os.path.join(SCRIPT_DIR, "..", "region_selector", "agent1_output")
+FINAL_EVALUATIONS_FOLDER = os.path.join(SCRIPT_DIR, "Outputs")
 
 # Create final output folder if it doesn't exist
 os.makedirs(FINAL_EVALUATIONS_FOLDER, exist_ok=True)
 # ---------------------------------
 
-# Define the server to launch (Agent 2)
-agent_2_server = StdioServerParameters(
-    command="python",
-    args=["ocr_server.py"] 
-)
+# Worker pool: N persistent OCR servers (each loads EasyOCR once)
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "1"))
+# Settings forwarded to every server process
+FORWARDED_ENV = ("OCR_MODE", "OCR_BATCH_SIZE", "OCR_DEBUG_DIR", "PAPERBRAIN_DEBUG_ARTIFACTS", "PAPERBRAIN_DEBUG_SAMPLE_EVERY")
+
+
+def agent_2_server(torch_threads=None, debug_dir=None):
+    """Parameters to launch one OCR server (Agent 2)."""
+    env = {name: os.environ[name] for name in FORWARDED_ENV if name in os.environ}
+    if debug_dir:
+        # Where the server saves its ROI crops (per-session workspace)
+        env["OCR_DEBUG_DIR"] = debug_dir
+    if torch_threads:
+        # Keep N workers x torch threads within the available cores
+        env["OCR_TORCH_THREADS"] = str(torch_threads)
+        env["OMP_NUM_THREADS"] = str(torch_threads)
+    return StdioServerParameters(
+        command="python",
+        args=[os.path.join(SCRIPT_DIR, "ocr_server.py")],
+        env=env or None,
+        cwd=SCRIPT_DIR
+    )
+
+
+async def process_job(session, job_file_path, worker_id=0, output_folder=None):
+    """Calls the OCR tool for one Agent 1 data file; returns the saved output path (None if nothing was saved)."""
+    print(f"\n--- [worker {worker_id}] Processing job: {job_file_path} ---")
+
+    # --- 4a. Load data from Agent 1's file ---
+    tool_arguments = job_arguments(job_file_path)
+    if tool_arguments is None:
+        return None
+
+    # --- 4b. Call the tool ---
+    print(f"Calling tool 'read_text_in_rois' with {len(tool_arguments['rois'])} ROIs...")
+    result = await session.call_tool("read_text_in_rois", tool_arguments)
+
+    # --- 4c. Process the result ---
+    final_json_text = None
+    for item in result.content:
+        if item.type == 'text' and item.text.startswith('{'):
+            final_json_text = item.text
+
+    if final_json_text:
+        # --- 4d. Save the final JSON ---
+        return save_evaluation(job_file_path, json.loads(final_json_text), output_folder or FINAL_EVALUATIONS_FOLDER)
+
+    print(f"Error: No JSON output found from server for this job.")
+    return None
+
+
+async def ocr_worker(worker_id, session, queue, output_folder=None):
+    """Pulls jobs until the queue is empty; one job in flight per server."""
+    while True:
+        try:
+            job_file_path = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        try:
+            await process_job(session, job_file_path, worker_id, output_folder)
+        except Exception as e:
+            print(f"Error: [worker {worker_id}] job {job_file_path} failed: {e}")
 
-async def run_batch_ocr():
+
+async def open_session(stack, server_params):
+    """Spawns one server and attaches a ClientSession (not yet initialized)."""
+    read, write = await stack.enter_async_context(stdio_client(server_params))
+    return await stack.enter_async_context(ClientSession(read, write))
+
+
+async def run_batch_ocr(workers=OCR_WORKERS, torch_threads=None, json_files=None, output_folder=None):
     """
-    Finds all data files from Agent 1, launches Agent 2,
-    and calls the tool for each file.
+    Finds all data files from Agent 1 (or takes the given ones), launches a
+    pool of Agent 2 servers, and spreads the tool calls over them. Outputs go
+    to output_folder (default: Outputs next to this file).
     """
-    
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+
     # --- 2. FIND ALL JOBS FROM AGENT 1 ---
-    json_files = glob.glob(os.path.join(AGENT1_OUTPUT_FOLDER, "*.json"))
+    if not json_files:
+        json_files = sorted(glob.glob(os.path.join(AGENT1_OUTPUT_FOLDER, "*.json")))
     if not json_files:
         print(f"Error: No data files found in '{AGENT1_OUTPUT_FOLDER}'.")
         print("Please run the Agent 1 (ipynb) script first.")
         return
-        
+
     print(f"Found {len(json_files)} answer sheets to evaluate.")
-    
-    # --- 3. LAUNCH AGENT 2 (ONCE) ---
-    print(f"\n--- Client: Launching server 'python3 ocr_server.py' ---")
-    
-    async with stdio_client(agent_2_server) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            print("--- Client: Server initialized. Starting batch... ---")
-            
-            # --- 4. LOOP THROUGH EACH JOB ---
-            for job_file_path in json_files:
-                print(f"\n--- Processing job: {job_file_path} ---")
-                
-                # --- 4a. Load data from Agent 1's file ---
-                with open(job_file_path, 'r') as f:
-                    data = json.load(f)
-                
-                image_base64_to_test = data.get("image_base64")
-                rois_to_test = data.get("rois")
-                
-                if not image_base64_to_test or not rois_to_test:
-                    print(f"Skipping job, data file is missing 'image_base64' or 'rois'.")
-                    continue
-                
-                # --- 4b. Call the tool ---
-                print(f"Calling tool 'read_text_in_rois' with {len(rois_to_test)} ROIs...")
-                result = await session.call_tool(
-                    "read_text_in_rois",
-                    {
-                        "image_base64": image_base64_to_test,
-                        "rois": rois_to_test
-                    }
-                )
-                
-                # --- 4c. Process the result ---
-                final_json_text = None
-                for item in result.content:
-                    if item.type == 'text' and item.text.startswith('{'):
-                        final_json_text = item.text
-                
-                if final_json_text:
-                    answers_dict = json.loads(final_json_text)
-
-                    # Placeholder student info
-                    student_info = {
-                        "name": "STUDENT_NAME_HERE",
-                        "roll_no": "ROLL_NO_HERE"
-                    }
-                    
-                    final_output = {
-                        "student_info": student_info,
-                        "answers": answers_dict
-                    }
-
-                    # --- 4d. Save the final JSON ---
-                    base_name = os.path.basename(job_file_path)
-                    file_name_only = os.path.splitext(base_name)[0].replace('_data', '')
-                    output_filename = f"{FINAL_EVALUATIONS_FOLDER}/{file_name_only}_evaluation.json"
-                    
-                    with open(output_filename, 'w') as f:
-                        json.dump(final_output, f, indent=4)
-                    
-                    print(f"Success! Saved final evaluation to {output_filename}")
-                    
-                else:
-                    print(f"Error: No JSON output found from server for this job.")
+
+    workers = max(1, min(workers, len(json_files)))
+    if torch_threads is None and workers > 1:
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    # --- 3. LAUNCH AGENT 2 POOL (ONCE) ---
+    print(f"\n--- Client: Launching {workers} x 'python3 ocr_server.py' "
+          f"(torch threads per worker: {torch_threads or 'default'}) ---")
+
+    async with AsyncExitStack() as stack:
+        # Spawning is cheap; the servers load EasyOCR in parallel while we
+        # wait for all of them to answer initialize.
+        sessions = [await open_session(stack, agent_2_server(torch_threads)) for _ in range(workers)]
+        await asyncio.gather(*(session.initialize() for session in sessions))
+        print("--- Client: Servers initialized. Starting batch... ---")
+
+        # --- 4. DISPATCH JOBS (bounded: one in-flight call per server) ---
+        queue = asyncio.Queue()
+        for job_file_path in json_files:
+            queue.put_nowait(job_file_path)
+        await asyncio.gather(*(ocr_worker(i, session, queue, output_folder) for i, session in enumerate(sessions)))
+
 
 if __name__ == "__main__":
-    asyncio.run(run_batch_ocr())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run Agent 2 OCR over Agent 1 data files.")
+    parser.add_argument("--workers", type=int, default=OCR_WORKERS,
+                        help="number of persistent OCR server processes (default: $OCR_WORKERS or 1)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="torch threads per server (default: cores / workers when workers > 1)")
+    parser.add_argument("--output-dir", default=None,
+                        help="folder for the *_evaluation.json outputs (default: Outputs next to this script)")
+    parser.add_argument("files", nargs="*",
+                        help="Agent 1 data files to process (default: every file in agent1_output)")
+    args = parser.parse_args()
+    asyncio.run(run_batch_ocr(args.workers, args.torch_threads, args.files, args.output_dir))
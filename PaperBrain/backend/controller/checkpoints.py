@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# Same content hash as the agents' caches (agents/content_hash.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agents"))
+from content_hash import file_sha256
+
+# Per-sheet, per-stage checkpoints so a re-run of the pipeline only redoes
+# what failed or changed. Each stage of a sheet is recorded with a key that
+# hashes its inputs and the key of the stage before it, so changing an input
+# (scan, template, settings, reference answers) invalidates that stage and
+# everything after it.
+#
+# Manifest layout:
+#   {"version": 1,
+#    "sheets": {"scan_x": {"align": {"key", "outputs", "details", "completed_at"}, ...}}}
+
+STAGES = ("align", "regions", "ocr", "grade")
+MANIFEST_VERSION = 1
+# mark_done only updates memory; the manifest is rewritten once this many marks
+# are pending or this many seconds have passed since the last write, and on
+# flush() (the controller flushes at the end of every stage). A crash loses at
+# most the marks since the last write, and those sheets are simply redone.
+FLUSH_EVERY = 50
+FLUSH_INTERVAL_S = 5.0
+
+
+def stage_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parts (hashes, settings, upstream keys)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def sheet_id(filename: str) -> str:
+    """
+    Common id of one answer sheet across stages:
+    scan_x.jpg, aligned_scan_x.jpg, aligned_scan_x_data.json and
+    aligned_scan_x_result.png and aligned_scan_x_evaluation.json all map to "scan_x".
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+    if name.startswith("aligned_"):
+        name = name[len("aligned_"):]
+    for suffix in ("_data", "_evaluation", "_resized", "_result"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+class CheckpointManifest:
+    """JSON manifest of completed (sheet, stage) pairs, written atomically in batches (see FLUSH_EVERY)."""
+
+    def __init__(self, path: str, flush_every: int = FLUSH_EVERY, flush_interval: float = FLUSH_INTERVAL_S) -> None:
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        self.sheets: Dict[str, Dict[str, Any]] = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.sheets = data.get("sheets", {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable checkpoint manifest ({e})")
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "sheets": self.sheets}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._pending = 0
+        self._saved_at = time.monotonic()
+
+    def flush(self) -> None:
+        """Writes the marks not yet on disk."""
+        with self._lock:
+            if self._pending:
+                self._save()
+
+    def record(self, sheet: str, stage: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.sheets.get(sheet, {}).get(stage)
+
+    def key(self, sheet: str, stage: str) -> Optional[str]:
+        record = self.record(sheet, stage)
+        return record["key"] if record else None
+
+    def is_done(self, sheet: str, stage: str, key: str, require_outputs: bool = True) -> bool:
+        """True if the stage completed with this key (and, by default, its outputs still exist)."""
+        record = self.record(sheet, stage)
+        if not record or record["key"] != key:
+            return False
+        return not require_outputs or all(os.path.exists(path) for path in record.get("outputs", []))
+
+    def mark_done(self, sheet: str, stage: str, key: str, outputs: Iterable[str] = (),
+                  details: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self.sheets.setdefault(sheet, {})[stage] = {
+                "key": key,
+                "outputs": [os.path.abspath(path) for path in outputs],
+                "details": details,
+                "completed_at": time.time(),
+            }
+            self._pending += 1
+            if (self._pending >= self.flush_every
+                    or time.monotonic() - self._saved_at >= self.flush_interval):
+                self._save()
+
+    def prune(self, keep: Iterable[str]) -> None:
+        """Drops every sheet not in keep."""
+        keep = set(keep)
+        with self._lock:
+            self.sheets = {sheet: stages for sheet, stages in self.sheets.items() if sheet in keep}
+            self._save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.sheets = {}
+            self._pending = 0
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,217 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+# Background pipeline jobs for the API. A job runs PipelineController on an
+# executor thread and records progress events (stage started / sheet done /
+# stage finished) that clients read by polling a snapshot or by following the
+# event list (Server-Sent Events in server.py).
+#
+# Jobs of one session share that session's workspace (or, without a session,
+# the agents' own folders), so they run one at a time: each session has a
+# queue and its next job is handed to the executor only when the previous one
+# finishes. Waiting jobs never occupy an executor thread, so jobs of other
+# sessions run side by side up to max_workers.
+
+# Job status: queued -> running -> completed | failed
+FINISHED_STATUSES = ("completed", "failed")
+# Finished jobs kept in memory for late pollers
+MAX_FINISHED_JOBS = 50
+
+
+class Job:
+    def __init__(self, job_id: str, description: str, session: Optional[str] = None) -> None:
+        self.id = job_id
+        self.description = description
+        self.session = session
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stage: Optional[str] = None
+        # stage -> {"status", "done", "total"}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+    def snapshot(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "description": self.description,
+            "session": self.session,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": {name: dict(info) for name, info in self.stages.items()},
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "events": len(self.events),
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """Runs pipeline jobs in the background and tracks their progress. Thread-safe."""
+
+    def __init__(self, max_workers: int = 1) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="pipeline-job")
+        self._jobs: Dict[str, Job] = {}
+        self._changed = threading.Condition()
+        # Sessions (None = shared agent folders) with a running job or held by idle_session
+        self._busy_sessions: Set[Optional[str]] = set()
+        # session -> jobs waiting for it, in submission order
+        self._session_queues: Dict[Optional[str], Deque[Tuple[Job, Callable[..., Any]]]] = {}
+
+    def submit(self, run: Callable[[Callable[..., None]], Any], description: str = "pipeline",
+               session: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queues run(progress) and returns the job snapshot right away. run gets a
+        progress(stage, status, sheet=None, done=None, total=None, message=None)
+        callback and its return value becomes the job result. Jobs with the
+        same session never run at the same time.
+        """
+        job = Job(uuid.uuid4().hex, description, session)
+        with self._changed:
+            self._jobs[job.id] = job
+            self._prune()
+            if session in self._busy_sessions:
+                self._session_queues.setdefault(session, deque()).append((job, run))
+            else:
+                self._busy_sessions.add(session)
+                self._executor.submit(self._run, job, run)
+            return job.snapshot()
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return job.snapshot(include_result) if job else None
+
+    def list_jobs(self, session: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._changed:
+            return [job.snapshot(include_result=False) for job in self._jobs.values()
+                    if session is None or job.session == session]
+
+    def active_sessions(self) -> List[str]:
+        """Sessions with a queued or running job or held by idle_session (their workspaces are in use)."""
+        with self._changed:
+            return sorted(session for session in self._busy_sessions if session)
+
+    @contextmanager
+    def idle_session(self, session: Optional[str]) -> Iterator[bool]:
+        """
+        Yields True while holding the session if none of its jobs is queued or
+        running, so its workspace can be used or cleaned up without touching
+        files a job is using; jobs submitted meanwhile are queued until the
+        block exits. Yields False (holding nothing) if the session is busy.
+        """
+        with self._changed:
+            acquired = session not in self._busy_sessions
+            if acquired:
+                self._busy_sessions.add(session)
+        if not acquired:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._release_session(session)
+
+    def follow(self, job_id: str, after: int = 0, timeout: float = 15.0) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Yields the job's events from index `after` on, as they happen, until the
+        job has finished. Yields None when nothing happened for `timeout` seconds
+        (lets the SSE stream send a keep-alive).
+        """
+        index = after
+        while True:
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                if index >= len(job.events) and job.status not in FINISHED_STATUSES:
+                    self._changed.wait(timeout)
+                new_events = job.events[index:]
+                finished = job.status in FINISHED_STATUSES
+            if not new_events and finished:
+                return
+            if not new_events:
+                yield None
+            for event in new_events:
+                yield event
+            index += len(new_events)
+
+    # ---------------- Internals ----------------
+    def _release_session(self, session: Optional[str]) -> None:
+        """Starts the session's next queued job, or marks the session idle."""
+        with self._changed:
+            waiting = self._session_queues.get(session)
+            if waiting:
+                self._executor.submit(self._run, *waiting.popleft())
+                if not waiting:
+                    del self._session_queues[session]
+            else:
+                self._busy_sessions.discard(session)
+
+    def _run(self, job: Job, run: Callable[[Callable[..., None]], Any]) -> None:
+        try:
+            self._run_job(job, run)
+        finally:
+            self._release_session(job.session)
+
+    def _run_job(self, job: Job, run: Callable[[Callable[..., None]], Any]) -> None:
+        with self._changed:
+            job.status = "running"
+            job.started_at = time.time()
+        self._event(job, {"type": "job", "status": "running"})
+        try:
+            result = run(lambda *args, **kwargs: self._progress(job, *args, **kwargs))
+            with self._changed:
+                job.result = result
+                job.status = "completed"
+        except Exception as e:
+            traceback.print_exc()
+            with self._changed:
+                job.error = str(e)
+                job.status = "failed"
+        with self._changed:
+            job.finished_at = time.time()
+        self._event(job, {"type": "job", "status": job.status, "error": job.error})
+
+    def _progress(self, job: Job, stage: str, status: str, sheet: Optional[str] = None,
+                  done: Optional[int] = None, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        with self._changed:
+            info = job.stages.setdefault(stage, {"status": "running", "done": 0, "total": None})
+            job.stage = stage
+            if sheet is None:
+                info["status"] = status
+            if done is not None:
+                info["done"] = done
+            if total is not None:
+                info["total"] = total
+            event = {"type": "sheet" if sheet else "stage", "stage": stage, "status": status,
+                     "done": info["done"], "total": info["total"]}
+        if sheet:
+            event["sheet"] = sheet
+        if message:
+            event["message"] = message
+        self._event(job, event)
+
+    def _event(self, job: Job, event: Dict[str, Any]) -> None:
+        with self._changed:
+            event.update(seq=len(job.events), time=time.time())
+            job.events.append(event)
+            self._changed.notify_all()
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATUSES]
+        for job in sorted(finished, key=lambda j: j.created_at)[:-MAX_FINISHED_JOBS]:
+            del self._jobs[job.id]
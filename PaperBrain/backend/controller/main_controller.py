@@ -5,42 +5,119 @@ import subprocess
 import sys
 import cv2
 import base64
-from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
 
+try:
+    from controller.checkpoints import CheckpointManifest, file_sha256, sheet_id, stage_key
+    from controller.streaming import StreamingPipeline
+except ImportError:  # run directly from the controller folder
+    from checkpoints import CheckpointManifest, file_sha256, sheet_id, stage_key
+    from streaming import StreamingPipeline
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 AGENTS_ROOT = os.path.join(PROJECT_ROOT, "agents")
+# Per-sheet, per-stage checkpoints of the last runs (see checkpoints.py)
+CHECKPOINT_MANIFEST = os.path.join(PROJECT_ROOT, "run_state", "checkpoints.json")
+# Agent subprocess timeouts: a fixed allowance (interpreter, model loading) plus
+# seconds per sheet, so large batches are not cut off. 0 per sheet: no timeout.
+OCR_SHEET_TIMEOUT = float(os.environ.get("PAPERBRAIN_OCR_SHEET_TIMEOUT", "30"))
+GRADE_SHEET_TIMEOUT = float(os.environ.get("PAPERBRAIN_GRADE_SHEET_TIMEOUT", "30"))
+VISUALIZATION_SHEET_TIMEOUT = 1.0
+
+
+def subprocess_timeout(base: float, per_sheet: float, sheets: int) -> Optional[float]:
+    """Timeout in seconds for an agent run over `sheets` sheets (None: wait as long as it takes)."""
+    if per_sheet <= 0:
+        return None
+    return base + per_sheet * sheets
 
 
 class PipelineController:
     """Coordinates the agents in the required order without modifying agent code."""
 
-    def __init__(self) -> None:
+    def __init__(self, alignment_workers: Optional[int] = None, alignment_top_k: Optional[int] = None,
+                 alignment_quality: Optional[str] = None, alignment_matcher: Optional[str] = None,
+                 ocr_workers: Optional[int] = None, progress: Optional[Callable[..., None]] = None,
+                 streaming: Optional[bool] = None, stream_queue_size: Optional[int] = None,
+                 workspace_root: Optional[str] = None, ocr_service: Optional[Any] = None) -> None:
+        # Number of processes used to align scans (1 = in-process, sequential)
+        if alignment_workers is None:
+            alignment_workers = int(os.environ.get("PAPERBRAIN_ALIGN_WORKERS", "1"))
+        self.alignment_workers = max(1, alignment_workers)
+        # Templates that go through full alignment after thumbnail pre-ranking (0 = all)
+        if alignment_top_k is None:
+            alignment_top_k = int(os.environ.get("PAPERBRAIN_ALIGN_TOP_K", "0"))
+        self.alignment_top_k = max(0, alignment_top_k)
+        # Speed/accuracy preset from alignment_agent.ALIGNMENT_QUALITY
+        self.alignment_quality = alignment_quality or os.environ.get("PAPERBRAIN_ALIGN_QUALITY", "accurate")
+        # Descriptor matcher backend from alignment matchers.MATCHERS ("bf" or "lsh")
+        self.alignment_matcher = alignment_matcher or os.environ.get("PAPERBRAIN_ALIGN_MATCHER", "bf")
+        # Persistent OCR server processes that share the sheets (each loads EasyOCR once)
+        if ocr_workers is None:
+            ocr_workers = int(os.environ.get("OCR_WORKERS", "1"))
+        self.ocr_workers = max(1, ocr_workers)
+        # Resident OCR service (agents/text_recognition/ocr_service.py) with EasyOCR already
+        # loaded in this process; None starts run_agent2_test.py / ocr_server.py per run
+        self.ocr_service = ocr_service
+        # Streaming mode: sheets flow through bounded queues between concurrent stages (streaming.py)
+        if streaming is None:
+            streaming = os.environ.get("PAPERBRAIN_STREAMING", "0") == "1"
+        self.streaming = streaming
+        # Sheets that may wait between two streaming stages
+        if stream_queue_size is None:
+            stream_queue_size = int(os.environ.get("PAPERBRAIN_STREAM_QUEUE_SIZE", "2"))
+        self.stream_queue_size = max(1, stream_queue_size)
+        # Optional progress(stage, status, sheet=None, done=None, total=None, message=None)
+        # callback, e.g. JobManager progress for the job API
+        self.progress = progress
+
+        # Agent code (always shared)
         self.preprocessor_dir = os.path.join(AGENTS_ROOT, "preprocessor")
         self.region_selector_dir = os.path.join(AGENTS_ROOT, "region_selector")
         self.text_recognition_dir = os.path.join(AGENTS_ROOT, "text_recognition")
         self.evaluator_dir = os.path.join(AGENTS_ROOT, "evaluator")
 
+        # Agent data: a per-session workspace (see workspaces.py) with the same
+        # layout as the agents folder, or the agents' own folders when None
+        self.workspace_root = os.path.abspath(workspace_root) if workspace_root else None
+        data_root = self.workspace_root or AGENTS_ROOT
+
         # Input/Output conventions based on actual agent structure
-        self.evaluator_inputs_dir = os.path.join(self.evaluator_dir, "inputs")
+        self.evaluator_work_dir = os.path.join(data_root, "evaluator")
+        self.evaluator_inputs_dir = os.path.join(self.evaluator_work_dir, "inputs")
         self.evaluator_related_docs_dir = os.path.join(self.evaluator_inputs_dir, "related_docs")
-        self.evaluator_temp_student = os.path.join(self.evaluator_dir, "temp", "current_student.json")
+        self.evaluator_temp_student = os.path.join(self.evaluator_work_dir, "temp", "current_student.json")
+        self.evaluator_results_dir = os.path.join(self.evaluator_work_dir, "results")
+        self.visualizations_dir = os.path.join(self.evaluator_results_dir, "visualizations")
+        self.reference_answers_file = os.path.join(self.evaluator_inputs_dir, "reference_answers.json")
 
         # Preprocessor paths
-        self.preprocessor_inputs_dir = os.path.join(self.preprocessor_dir, "answer_scripts")
-        self.preprocessor_templates_dir = os.path.join(self.preprocessor_dir, "question_paper_templates")
-        self.preprocessor_outputs_dir = os.path.join(self.preprocessor_dir, "aligned_outputs")
+        self.preprocessor_inputs_dir = os.path.join(data_root, "preprocessor", "answer_scripts")
+        self.preprocessor_templates_dir = os.path.join(data_root, "preprocessor", "question_paper_templates")
+        self.preprocessor_outputs_dir = os.path.join(data_root, "preprocessor", "aligned_outputs")
+
+        # Region selector paths
+        self.region_results_dir = os.path.join(data_root, "region_selector", "evaluation_results")
+        self.agent1_output_dir = os.path.join(data_root, "region_selector", "agent1_output")
 
         # Text recognition paths
-        self.text_recognition_outputs_dir = os.path.join(self.text_recognition_dir, "Outputs")
+        self.text_recognition_outputs_dir = os.path.join(data_root, "text_recognition", "Outputs")
+        self.debug_crops_dir = os.path.join(data_root, "text_recognition", "debug_crops")
         
         # Student info mapping file (maps answer sheet filenames to student info)
-        self.student_info_file = os.path.join(self.text_recognition_dir, "Outputs", "student_info_mapping.json")
+        self.student_info_file = os.path.join(self.text_recognition_outputs_dir, "student_info_mapping.json")
+
+        # Completed (sheet, stage) pairs; a re-run only redoes what failed or changed
+        manifest = (os.path.join(self.workspace_root, "run_state", "checkpoints.json")
+                    if self.workspace_root else CHECKPOINT_MANIFEST)
+        self.checkpoints = CheckpointManifest(manifest)
 
         # Ensure expected directories exist
         os.makedirs(self.evaluator_related_docs_dir, exist_ok=True)
-        os.makedirs(os.path.join(self.evaluator_dir, "temp"), exist_ok=True)
+        os.makedirs(os.path.dirname(self.evaluator_temp_student), exist_ok=True)
         os.makedirs(self.preprocessor_inputs_dir, exist_ok=True)
+        os.makedirs(self.preprocessor_templates_dir, exist_ok=True)
         os.makedirs(self.preprocessor_outputs_dir, exist_ok=True)
         os.makedirs(self.text_recognition_outputs_dir, exist_ok=True)
 
@@ -84,7 +161,7 @@ class PipelineController:
     # -------------------------------------------------------------------------
     def run_preprocessor(self) -> Dict[str, Any]:
         print("\n🔄 Step 1: Running Preprocessor (Alignment)...")
-        template_files = [f for f in os.listdir(self.preprocessor_templates_dir) if f.startswith("template_")]
+        template_files = sorted([f for f in os.listdir(self.preprocessor_templates_dir) if f.startswith("template_")])
         scan_files = sorted([f for f in os.listdir(self.preprocessor_inputs_dir) if f.startswith("scan_")])
 
         if not template_files or not scan_files:
@@ -95,47 +172,81 @@ class PipelineController:
 
         summaries = []
         try:
-            sys.path.append(self.preprocessor_dir)
-            from alignment_agent import run_alignment_agent
-
-            # Process each answer sheet
-            for scan_file in scan_files:
-                scan_path = os.path.join(self.preprocessor_inputs_dir, scan_file)
-                print(f"\n  Processing: {scan_file}")
-                best_result, best_score, best_template = None, 0, None
-
-                # Try each template with this scan
-                for template_file in template_files:
-                    template_path = os.path.join(self.preprocessor_templates_dir, template_file)
+            if self.preprocessor_dir not in sys.path:
+                sys.path.append(self.preprocessor_dir)
+            from alignment_agent import ALIGNMENT_QUALITY, align_scan, init_alignment_worker
+            from template_features import get_default_store
+
+            template_paths = [os.path.join(self.preprocessor_templates_dir, f) for f in template_files]
+            all_jobs = [
+                (os.path.join(self.preprocessor_inputs_dir, scan_file),
+                 os.path.join(self.preprocessor_outputs_dir, f"aligned_{scan_file}"))
+                for scan_file in scan_files
+            ]
+
+            # Sheets aligned by an earlier run with the same scan, templates and settings are reused
+            align_keys = {scan_path: self._align_key(scan_path, template_paths) for scan_path, _ in all_jobs}
+            reused = {}
+            for scan_path, _ in all_jobs:
+                if self.checkpoints.is_done(sheet_id(scan_path), "align", align_keys[scan_path]):
+                    reused[scan_path] = self.checkpoints.record(sheet_id(scan_path), "align")["details"]
+                    print(f"  ↺ Reusing alignment: {os.path.basename(scan_path)}")
+            jobs = [(scan_path, output_path) for scan_path, output_path in all_jobs if scan_path not in reused]
+            self._report("align", "running", total=len(all_jobs), done=len(reused))
+
+            # Warm the template feature cache once so workers only load .npz files:
+            # full resolution (used to rank candidates) and the preset's pyramid level
+            store = get_default_store()
+            if jobs:
+                scale = ALIGNMENT_QUALITY[self.alignment_quality]["scale"]
+                for template_path in template_paths:
+                    store.get(template_path)
+                    if scale != 1.0:
+                        store.get(template_path, scale)
+
+            workers = min(self.alignment_workers, len(jobs))
+            if workers > 1:
+                print(f"  Aligning in parallel with {workers} worker process(es)")
+                # Workers write the aligned image themselves and return only the
+                # homography + score; results are collected in submission order.
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_alignment_worker) as pool:
+                    futures = [pool.submit(align_scan, scan_path, template_paths, output_path,
+                                           top_k=self.alignment_top_k, quality=self.alignment_quality,
+                                           matcher=self.alignment_matcher)
+                               for scan_path, output_path in jobs]
                     try:
-                        print(f"    Trying alignment with {template_file}...")
-                        img_aligned, H, score = run_alignment_agent(template_path, scan_path)
-                        if img_aligned is not None and score > best_score:
-                            best_score, best_result, best_template = score, img_aligned, template_file
-                            print(f"    ✓ Score: {score}")
-                    except Exception as e:
-                        print(f"    ✗ Alignment failed for {template_file}: {e}")
-
-                if best_result is not None:
-                    output_filename = f"aligned_{os.path.basename(scan_path)}"
-                    output_path = os.path.join(self.preprocessor_outputs_dir, output_filename)
-                    cv2.imwrite(output_path, best_result)
-                    print(f"  ✓ Aligned: {output_filename} (template: {best_template}, score: {best_score})")
-                    summaries.append({
-                        "status": "completed",
-                        "scan_file": scan_file,
-                        "alignment_score": float(best_score),
-                        "template_used": best_template,
-                        "output_image": output_path,
-                    })
+                        results = []
+                        for (scan_path, _), future in zip(jobs, futures):
+                            results.append(future.result())
+                            self._report("align", results[-1]["status"], sheet=sheet_id(scan_path),
+                                         done=len(reused) + len(results))
+                    except BaseException:
+                        pool.shutdown(wait=True, cancel_futures=True)
+                        raise
+            else:
+                results = []
+                for scan_path, output_path in jobs:
+                    print(f"\n  Processing: {os.path.basename(scan_path)}")
+                    results.append(align_scan(scan_path, template_paths, output_path, store,
+                                              top_k=self.alignment_top_k, quality=self.alignment_quality,
+                                              matcher=self.alignment_matcher))
+                    self._report("align", results[-1]["status"], sheet=sheet_id(scan_path),
+                                 done=len(reused) + len(results))
+
+            for (scan_path, output_path), result in zip(jobs, results):
+                if result["status"] == "completed":
+                    print(f"  ✓ Aligned: {os.path.basename(result['output_image'])} "
+                          f"(template: {result['template_used']}, score: {result['alignment_score']}, "
+                          f"error: {result['reprojection_error']}px, {result['timings']['total_s']}s)")
+                    self.checkpoints.mark_done(sheet_id(scan_path), "align", align_keys[scan_path],
+                                               outputs=[output_path], details=result)
                 else:
-                    print(f"  ✗ Alignment failed for {scan_file}")
-                    summaries.append({
-                        "status": "failed",
-                        "scan_file": scan_file,
-                        "alignment_score": 0,
-                        "message": "All alignments failed for this scan."
-                    })
+                    print(f"  ✗ Alignment failed for {result['scan_file']}")
+            self.checkpoints.flush()
+
+            # Summaries in scan order, reused and new alike
+            new_results = {scan_path: result for (scan_path, _), result in zip(jobs, results)}
+            summaries = [reused.get(scan_path) or new_results[scan_path] for scan_path, _ in all_jobs]
 
             if any(s["status"] == "completed" for s in summaries):
                 print(f"\n✅ Preprocessor completed. Processed {len([s for s in summaries if s['status'] == 'completed'])}/{len(scan_files)} answer sheet(s)")
@@ -158,56 +269,76 @@ class PipelineController:
     # -------------------------------------------------------------------------
     def run_region_selector(self) -> Dict[str, Any]:
         """
-        Automatically runs the real region_selector.py (OpenCV-based) after alignment.
+        Runs region selection in-process after alignment (no subprocess, no chdir),
+        using the importable API in region_selector.py.
         """
         print("\n🔍 Step 2: Running Region Selector...")
-        region_script_path = os.path.join(self.region_selector_dir, "region_selector.py")
+        try:
+            if self.region_selector_dir not in sys.path:
+                sys.path.append(self.region_selector_dir)
+            import region_selector
 
-        if not os.path.exists(region_script_path):
-            print(f"❌ region_selector.py not found at {region_script_path}")
-            return {"status": "error", "message": f"region_selector.py not found at {region_script_path}"}
+            template_paths = region_selector.find_template_paths(self.preprocessor_templates_dir)
+            if not template_paths:
+                print(f"❌ No template images found in {self.preprocessor_templates_dir}")
+                return {"status": "error", "message": "No template images found for region selection."}
+
+            image_paths = region_selector.find_filled_image_paths(self.preprocessor_outputs_dir)
+            if not image_paths:
+                print(f"❌ No aligned images found in {self.preprocessor_outputs_dir}")
+                return {"status": "error", "message": "No aligned images found for region selection."}
+
+            # Each sheet is compared with the template it was aligned against;
+            # templates are prepared once per content hash and reused across runs
+            cache = region_selector.get_template_cache()
+            sheet_templates = {path: self._aligned_template(region_selector, path, template_paths)
+                               for path in image_paths}
+            region_keys = {path: self._regions_key(path, cache.digest(sheet_templates[path]))
+                           for path in image_paths}
+            reused = {}
+            for image_path in image_paths:
+                if self.checkpoints.is_done(sheet_id(image_path), "regions", region_keys[image_path]):
+                    reused[image_path] = self.checkpoints.record(sheet_id(image_path), "regions")["details"]
+                    print(f"  ↺ Reusing regions: {os.path.basename(image_path)}")
+            pending = [path for path in image_paths if path not in reused]
+            self._report("regions", "running", total=len(image_paths), done=len(reused))
+
+            new_details = {}
+            if pending:
+                pending_details = region_selector.process_images(
+                    template_paths[0],
+                    pending,
+                    results_folder=self.region_results_dir,
+                    output_folder=self.agent1_output_dir,
+                    templates=sheet_templates,
+                    cache=cache,
+                )
+                for image_path, detail in zip(pending, pending_details):
+                    new_details[image_path] = detail
+                    self._report("regions", detail["status"], sheet=sheet_id(image_path),
+                                 done=len(reused) + len(new_details))
+                    if detail["status"] == "completed":
+                        self.checkpoints.mark_done(sheet_id(image_path), "regions", region_keys[image_path],
+                                                   outputs=[detail["output_json"]], details=detail)
+                self.checkpoints.flush()
+            details = [reused.get(path) or new_details[path] for path in image_paths]
+
+            completed = [d for d in details if d["status"] == "completed"]
+            if not completed:
+                print("❌ Region Selector could not process any aligned image")
+                return {"status": "error", "message": "Region selection failed for all images.", "details": details}
+
+            print(f"✅ Region Selector completed ({len(completed)}/{len(details)} image(s))")
+            return {
+                "status": "completed",
+                "message": "Region selection done successfully.",
+                "details": details,
+            }
 
-        try:
-            # Change to region selector directory before running
-            original_cwd = os.getcwd()
-            os.chdir(self.region_selector_dir)
-            
-            result = subprocess.run(
-                [self._python_executable(), "region_selector.py"],
-                capture_output=True,
-                text=True,
-                check=False,  # Don't raise exception, we'll check returncode
-                timeout=120  # 2 minute timeout
-            )
-            
-            os.chdir(original_cwd)  # Restore directory
-            
-            if result.returncode == 0:
-                print("✅ Region Selector completed successfully")
-                print(f"Output: {result.stdout[:200]}")  # Print first 200 chars
-                return {
-                    "status": "completed",
-                    "stdout": result.stdout,
-                    "stderr": result.stderr,
-                    "message": "Region selection done successfully."
-                }
-            else:
-                print(f"❌ Region Selector failed with return code {result.returncode}")
-                print(f"Error: {result.stderr}")
-                return {
-                    "status": "error", 
-                    "message": f"Region selector failed with code {result.returncode}",
-                    "stdout": result.stdout,
-                    "stderr": result.stderr
-                }
-                
-        except subprocess.TimeoutExpired:
-            os.chdir(original_cwd)
-            print("❌ Region Selector timed out")
-            return {"status": "error", "message": "Region selector timed out after 120 seconds"}
         except Exception as e:
-            os.chdir(original_cwd)
             print(f"❌ Region Selector exception: {e}")
+            import traceback
+            traceback.print_exc()
             return {"status": "error", "message": str(e)}
 
     # -------------------------------------------------------------------------
@@ -217,7 +348,7 @@ class PipelineController:
         print("\n📝 Step 3: Running Text Recognition...")
         try:
             # Check if agent1_output files exist (from region selector)
-            agent1_output_dir = os.path.join(self.region_selector_dir, "agent1_output")
+            agent1_output_dir = self.agent1_output_dir
             if not os.path.isdir(agent1_output_dir):
                 print("❌ agent1_output directory not found")
                 return {"status": "error", "message": "Region selector output not found."}
@@ -228,27 +359,44 @@ class PipelineController:
                 return {"status": "error", "message": "No region selector output files found."}
 
             print(f"  Found {len(json_files)} region selector output file(s)")
+
+            # Sheets whose OCR output (or grade) from an earlier run is still valid are skipped
+            ocr_keys = {}
+            pending = []
+            for json_file in sorted(json_files):
+                sheet = sheet_id(json_file)
+                ocr_keys[json_file] = key = self._ocr_key(os.path.join(agent1_output_dir, json_file))
+                if (self.checkpoints.is_done(sheet, "ocr", key)
+                        or self.checkpoints.is_done(sheet, "grade", self._grade_key(key), require_outputs=False)):
+                    print(f"  ↺ Reusing OCR: {json_file}")
+                else:
+                    pending.append(json_file)
+            self._report("ocr", "running", total=len(json_files), done=len(json_files) - len(pending))
             
-            # Run the actual OCR script
-            original_cwd = os.getcwd()
-            os.chdir(self.text_recognition_dir)
-            
+            # Run the actual OCR script (cwd= instead of chdir: jobs of other sessions may run concurrently)
             try:
-                result = subprocess.run(
-                    [self._python_executable(), "run_agent2_test.py"],
-                    capture_output=True,
-                    text=True,
-                    timeout=120
-                )
-                
-                os.chdir(original_cwd)
+                result = None
+                if pending and self.uses_ocr_service():
+                    self._run_ocr_service([os.path.join(agent1_output_dir, json_file) for json_file in pending])
+                elif pending:
+                    result = subprocess.run(
+                        [self._python_executable(), "run_agent2_test.py", "--workers", str(self.ocr_workers),
+                         "--output-dir", self.text_recognition_outputs_dir]
+                        + [os.path.join(agent1_output_dir, json_file) for json_file in pending],
+                        capture_output=True,
+                        text=True,
+                        # The servers share the sheets, so each worker adds throughput
+                        timeout=subprocess_timeout(120, OCR_SHEET_TIMEOUT / self.ocr_workers, len(pending)),
+                        cwd=self.text_recognition_dir,
+                        env=self.agent_env()
+                    )
                 
                 # Even if script exits with error, check if output files were created
                 # (Sometimes Unicode errors in print statements cause exit code 1 but file is still saved)
-                outputs_dir = os.path.join(self.text_recognition_dir, "Outputs")
+                outputs_dir = self.text_recognition_outputs_dir
                 output_files = [f for f in os.listdir(outputs_dir) if f.endswith("_evaluation.json") and os.path.getsize(os.path.join(outputs_dir, f)) > 0] if os.path.isdir(outputs_dir) else []
                 
-                if result.returncode != 0:
+                if result is not None and result.returncode != 0:
                     if not output_files:
                         # Only fail if no output files were created
                         print(f"❌ OCR script failed with code {result.returncode}")
@@ -261,102 +409,46 @@ class PipelineController:
                 print("  OCR processing completed")
                 
                 # Find the generated output file(s) in Outputs folder
-                outputs_dir = os.path.join(self.text_recognition_dir, "Outputs")
-                
                 # Wait a moment for files to be written
                 import time
                 time.sleep(0.5)
                 
                 output_files = [f for f in os.listdir(outputs_dir) if f.endswith("_evaluation.json") and os.path.getsize(os.path.join(outputs_dir, f)) > 0]
                 
+                if not output_files and not pending:
+                    print("✅ Text Recognition skipped: all answer sheets were already recognized and graded")
+                    return {
+                        "status": "completed",
+                        "message": "All answer sheets were already recognized and graded.",
+                        "processed_count": 0,
+                        "output_files": [],
+                        "reused": len(json_files),
+                    }
+
                 if not output_files:
                     print("❌ No OCR output files generated or all files are empty")
                     return {"status": "error", "message": "No OCR output files generated."}
+
+                recognized = len(json_files) - len(pending)
+                for json_file in pending:
+                    output_path = os.path.join(outputs_dir, self._ocr_output_name(json_file))
+                    if os.path.isfile(output_path) and os.path.getsize(output_path) > 0:
+                        self.checkpoints.mark_done(sheet_id(json_file), "ocr", ocr_keys[json_file],
+                                                   outputs=[output_path])
+                        recognized += 1
+                        self._report("ocr", "completed", sheet=sheet_id(json_file), done=recognized)
+                    else:
+                        self._report("ocr", "failed", sheet=sheet_id(json_file), done=recognized)
+                self.checkpoints.flush()
                 
                 print(f"  Found {len(output_files)} OCR output file(s) to process")
                 
-                # Load student info mapping
-                student_info_map = {}
-                if os.path.isfile(self.student_info_file):
-                    try:
-                        with open(self.student_info_file, "r", encoding="utf-8") as f:
-                            student_info_map = json.load(f)
-                    except:
-                        pass
-                
                 # Process all OCR output files and update student_info in each
+                student_info_map = self._load_student_info_map()
                 processed_count = 0
                 for output_file in output_files:
-                    output_path = os.path.join(outputs_dir, output_file)
-                    
-                    try:
-                        # Read the generated OCR output
-                        with open(output_path, "r", encoding="utf-8") as f:
-                            content = f.read().strip()
-                            if not content:
-                                continue
-                            ocr_output = json.loads(content)
-                    except json.JSONDecodeError as e:
-                        print(f"  ⚠️  Skipping {output_file}: Invalid JSON ({e})")
-                        continue
-                    except Exception as e:
-                        print(f"  ⚠️  Skipping {output_file}: {e}")
-                        continue
-                    
-                    # Extract answers and student_info
-                    recognized_answers = ocr_output.get("answers", {})
-                    student_info = ocr_output.get("student_info", {})
-
-                    # Validate that we have answers
-                    if not recognized_answers or len(recognized_answers) == 0:
-                        print(f"  ⚠️  Skipping {output_file}: No answers found")
-                        continue
-
-                    # Try to get student info from mapping file using the filename
-                    # The filename format is: aligned_scan_<original_filename>_evaluation.json
-                    # We need to match it with scan_<original_filename>
-                    file_key = output_file.replace("_evaluation.json", "").replace("aligned_", "scan_")
-                    
-                    # Try to find matching student info from mapping
-                    mapped_info = None
-                    if file_key in student_info_map:
-                        mapped_info = student_info_map[file_key]
-                    elif file_key.replace("scan_", "") in student_info_map:
-                        mapped_info = student_info_map[file_key.replace("scan_", "")]
-                    else:
-                        # Try matching by base filename
-                        base_name = os.path.splitext(output_file)[0].replace("aligned_", "").replace("_evaluation", "")
-                        for key, info in student_info_map.items():
-                            if base_name in key or key in base_name:
-                                mapped_info = info
-                                break
-                    
-                    if mapped_info:
-                        student_info = {
-                            "name": mapped_info.get("name", "Unknown Student"),
-                            "roll_no": mapped_info.get("roll_no", "UNKNOWN")
-                        }
-                    elif not student_info.get("name") or student_info.get("name") == "STUDENT_NAME_HERE":
-                        # Try to extract from filename
-                        base_name = os.path.splitext(output_file)[0].replace("aligned_", "").replace("_evaluation", "").replace("scan_", "")
-                        student_info["name"] = base_name.replace("_", " ").title()
-                        student_info["roll_no"] = base_name.upper()
-
-                    # Ensure student_info has both fields
-                    if "name" not in student_info:
-                        student_info["name"] = "Unknown Student"
-                    if "roll_no" not in student_info:
-                        student_info["roll_no"] = "UNKNOWN"
-                    
-                    # Update the OCR output file with correct student_info
-                    ocr_output["student_info"] = student_info
-                    
-                    # Save updated output
-                    with open(output_path, "w", encoding="utf-8") as f:
-                        json.dump(ocr_output, f, indent=2, ensure_ascii=False)
-                    
-                    processed_count += 1
-                    print(f"  ✓ Updated {output_file} with student info: {student_info['name']} ({student_info['roll_no']})")
+                    if self._apply_student_info(os.path.join(outputs_dir, output_file), student_info_map):
+                        processed_count += 1
                 
                 if processed_count == 0:
                     return {"status": "error", "message": "No valid OCR outputs to process."}
@@ -368,15 +460,14 @@ class PipelineController:
                     "status": "completed",
                     "message": f"OCR done successfully. Processed {processed_count} answer sheet(s).",
                     "processed_count": processed_count,
-                    "output_files": output_files
+                    "output_files": output_files,
+                    "reused": len(json_files) - len(pending),
                 }
                 
             except subprocess.TimeoutExpired:
-                os.chdir(original_cwd)
                 print("❌ OCR script timed out")
                 return {"status": "error", "message": "OCR script timed out."}
             except Exception as e:
-                os.chdir(original_cwd)
                 print(f"❌ Text Recognition error: {e}")
                 import traceback
                 traceback.print_exc()
@@ -388,14 +479,190 @@ class PipelineController:
             traceback.print_exc()
             return {"status": "error", "message": str(e)}
 
+    def uses_ocr_service(self) -> bool:
+        """
+        True if OCR goes to the resident service. A service with fewer engines
+        than ocr_workers would recognize fewer sheets at once than asked for,
+        so those runs start the per-run server pool instead.
+        """
+        if self.ocr_service is None:
+            return False
+        if self.ocr_service.workers < self.ocr_workers:
+            print(f"  ⚠️  OCR service has {self.ocr_service.workers} engine(s) for {self.ocr_workers} "
+                  f"OCR worker(s); using the per-run OCR servers")
+            return False
+        return True
+
+    def _run_ocr_service(self, data_json_paths: List[str]) -> None:
+        """
+        Recognizes the sheets with the resident OCR service (no subprocess, models
+        already loaded), keeping every engine of the service busy.
+        """
+        service = self.ocr_service
+        print(f"  Using the resident OCR service ({service.status}, {service.workers} engine(s))")
+
+        def recognize(data_json_path: str) -> None:
+            try:
+                service.process_job(data_json_path, self.text_recognition_outputs_dir,
+                                    debug_dir=self.debug_crops_dir)
+            except Exception as e:
+                print(f"  ⚠️  OCR failed for {os.path.basename(data_json_path)}: {e}")
+
+        with ThreadPoolExecutor(max_workers=service.workers) as pool:
+            list(pool.map(recognize, data_json_paths))
+
+    # -------------------------------------------------------------------------
+    # STUDENT INFO (applied to each OCR output before grading)
+    # -------------------------------------------------------------------------
+    def _load_student_info_map(self) -> Dict[str, Any]:
+        student_info_map = {}
+        if os.path.isfile(self.student_info_file):
+            try:
+                with open(self.student_info_file, "r", encoding="utf-8") as f:
+                    student_info_map = json.load(f)
+            except:
+                pass
+        return student_info_map
+
+    def _apply_student_info(self, output_path: str, student_info_map: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Writes the mapped (or filename-derived) student_info into one OCR output; None if it is unusable."""
+        output_file = os.path.basename(output_path)
+        
+        try:
+            # Read the generated OCR output
+            with open(output_path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+                if not content:
+                    return None
+                ocr_output = json.loads(content)
+        except json.JSONDecodeError as e:
+            print(f"  ⚠️  Skipping {output_file}: Invalid JSON ({e})")
+            return None
+        except Exception as e:
+            print(f"  ⚠️  Skipping {output_file}: {e}")
+            return None
+        
+        # Extract answers and student_info
+        recognized_answers = ocr_output.get("answers", {})
+        student_info = ocr_output.get("student_info", {})
+
+        # Validate that we have answers
+        if not recognized_answers or len(recognized_answers) == 0:
+            print(f"  ⚠️  Skipping {output_file}: No answers found")
+            return None
+
+        # Try to get student info from mapping file using the filename
+        # The filename format is: aligned_scan_<original_filename>_evaluation.json
+        # We need to match it with scan_<original_filename>
+        file_key = output_file.replace("_evaluation.json", "").replace("aligned_", "scan_")
+        
+        # Try to find matching student info from mapping
+        mapped_info = None
+        if file_key in student_info_map:
+            mapped_info = student_info_map[file_key]
+        elif file_key.replace("scan_", "") in student_info_map:
+            mapped_info = student_info_map[file_key.replace("scan_", "")]
+        else:
+            # Try matching by base filename
+            base_name = os.path.splitext(output_file)[0].replace("aligned_", "").replace("_evaluation", "")
+            for key, info in student_info_map.items():
+                if base_name in key or key in base_name:
+                    mapped_info = info
+                    break
+        
+        if mapped_info:
+            student_info = {
+                "name": mapped_info.get("name", "Unknown Student"),
+                "roll_no": mapped_info.get("roll_no", "UNKNOWN")
+            }
+        elif not student_info.get("name") or student_info.get("name") == "STUDENT_NAME_HERE":
+            # Try to extract from filename
+            base_name = os.path.splitext(output_file)[0].replace("aligned_", "").replace("_evaluation", "").replace("scan_", "")
+            student_info["name"] = base_name.replace("_", " ").title()
+            student_info["roll_no"] = base_name.upper()
+
+        # Ensure student_info has both fields
+        if "name" not in student_info:
+            student_info["name"] = "Unknown Student"
+        if "roll_no" not in student_info:
+            student_info["roll_no"] = "UNKNOWN"
+        
+        # Update the OCR output file with correct student_info
+        ocr_output["student_info"] = student_info
+        
+        # Save updated output
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(ocr_output, f, indent=2, ensure_ascii=False)
+        
+        print(f"  ✓ Updated {output_file} with student info: {student_info['name']} ({student_info['roll_no']})")
+        return student_info
+
     # -------------------------------------------------------------------------
     # EVALUATOR
     # -------------------------------------------------------------------------
     def run_evaluator(self) -> Dict[str, Any]:
         print("\n📊 Step 4: Running Evaluator...")
         
-        # Check if reference answers exist before running evaluator
-        reference_path = os.path.join(self.evaluator_dir, "inputs", "reference_answers.json")
+        missing = self._check_reference_answers()
+        if missing:
+            return missing
+
+        # main.py removes each OCR output once the student is recorded; those sheets are graded
+        grade_keys = {}
+        for output_file in os.listdir(self.text_recognition_outputs_dir):
+            output_path = os.path.join(self.text_recognition_outputs_dir, output_file)
+            if output_file.endswith("_evaluation.json"):
+                ocr_key = self.checkpoints.key(sheet_id(output_file), "ocr") or file_sha256(output_path)
+                grade_keys[output_path] = self._grade_key(ocr_key)
+
+        self._report("grade", "running", total=len(grade_keys), done=0)
+
+        try:
+            result = subprocess.run(
+                [self._python_executable(), "main.py"],
+                capture_output=True,
+                text=True,
+                timeout=subprocess_timeout(60, GRADE_SHEET_TIMEOUT, len(grade_keys)),
+                cwd=self.evaluator_dir,
+                env=self.agent_env()
+            )
+
+            ran_script = result.returncode == 0
+
+            graded = 0
+            for output_path, grade_key in grade_keys.items():
+                if not os.path.exists(output_path):
+                    self.checkpoints.mark_done(sheet_id(output_path), "grade", grade_key)
+                    graded += 1
+                    self._report("grade", "completed", sheet=sheet_id(output_path), done=graded)
+                else:
+                    self._report("grade", "failed", sheet=sheet_id(output_path), done=graded)
+            self.checkpoints.flush()
+
+            if ran_script:
+                print("✅ Evaluator completed")
+                self._run_visualizations()
+            else:
+                print(f"❌ Evaluator failed with code {result.returncode}")
+                print(f"Error: {result.stderr}")
+
+            outputs = self._evaluator_outputs(ran_script)
+            return {
+                "script_ran": ran_script,
+                "stdout": result.stdout,
+                "stderr": result.stderr,
+                **outputs,
+            }
+        except subprocess.TimeoutExpired:
+            print("❌ Evaluator timed out")
+            return {"status": "error", "message": "Evaluator timed out."}
+        except Exception as e:
+            print(f"❌ Evaluator error: {e}")
+            return {"status": "error", "message": str(e)}
+
+    def _check_reference_answers(self) -> Optional[Dict[str, Any]]:
+        """Error response if some recognized question has no reference answer yet, else None."""
+        reference_path = self.reference_answers_file
         student_answers_path = os.path.join(self.text_recognition_outputs_dir, "student_answers.json")
         
         # Check if we have student answers to know what questions to expect
@@ -424,74 +691,64 @@ class PipelineController:
                 "missing_questions": questions_need_answers,
                 "requires_reference_answers": True
             }
-        
-        try:
-            original_cwd = os.getcwd()
-            os.chdir(self.evaluator_dir)
-
-            result = subprocess.run(
-                [self._python_executable(), "main.py"],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-
-            os.chdir(original_cwd)
-            ran_script = result.returncode == 0
+        return None
 
-            if ran_script:
-                print("✅ Evaluator completed")
-                
-                # Run visualizations after evaluator completes successfully
-                print("\n📈 Generating Visualizations...")
-                try:
-                    viz_script = os.path.join(self.evaluator_dir, "visualizations.py")
-                    if os.path.exists(viz_script):
-                        viz_result = subprocess.run(
-                            [self._python_executable(), viz_script],
-                            capture_output=True,
-                            text=True,
-                            timeout=60,
-                            cwd=self.evaluator_dir
-                        )
-                        if viz_result.returncode == 0:
-                            print("✅ Visualizations generated successfully")
-                        else:
-                            print(f"⚠️ Visualizations failed (non-fatal): {viz_result.stderr}")
-                    else:
-                        print(f"⚠️ visualizations.py not found at {viz_script}")
-                except Exception as viz_error:
-                    print(f"⚠️ Visualization error (non-fatal): {viz_error}")
+    def _run_visualizations(self) -> None:
+        """Run visualizations after evaluator completes successfully (failures are non-fatal)."""
+        print("\n📈 Generating Visualizations...")
+        try:
+            viz_script = os.path.join(self.evaluator_dir, "visualizations.py")
+            if os.path.exists(viz_script):
+                # The charts cover every student in the results, not only this run's
+                store = self.open_results_store()
+                students = 0
+                if store is not None:
+                    try:
+                        students = store.count_students()
+                    finally:
+                        store.close()
+                viz_result = subprocess.run(
+                    [self._python_executable(), viz_script],
+                    capture_output=True,
+                    text=True,
+                    timeout=subprocess_timeout(60, VISUALIZATION_SHEET_TIMEOUT, students),
+                    cwd=self.evaluator_dir,
+                    env=self.agent_env()
+                )
+                if viz_result.returncode == 0:
+                    print("✅ Visualizations generated successfully")
+                else:
+                    print(f"⚠️ Visualizations failed (non-fatal): {viz_result.stderr}")
             else:
-                print(f"❌ Evaluator failed with code {result.returncode}")
-                print(f"Error: {result.stderr}")
+                print(f"⚠️ visualizations.py not found at {viz_script}")
+        except Exception as viz_error:
+            print(f"⚠️ Visualization error (non-fatal): {viz_error}")
 
-            current_student = {}
-            if os.path.isfile(self.evaluator_temp_student):
-                with open(self.evaluator_temp_student, "r", encoding="utf-8") as f:
-                    current_student = json.load(f)
+    def _evaluator_outputs(self, ran_script: bool) -> Dict[str, Any]:
+        """
+        Last graded student, a score summary of all results and the run summary
+        written by the evaluator. Student records are paged through the results
+        API (/api/results/all-students), never loaded here in full.
+        """
+        current_student = {}
+        if os.path.isfile(self.evaluator_temp_student):
+            with open(self.evaluator_temp_student, "r", encoding="utf-8") as f:
+                current_student = json.load(f)
 
-            results_json = os.path.join(self.evaluator_dir, "results", "evaluation_results.json")
-            results_data = None
-            if os.path.isfile(results_json):
-                with open(results_json, "r", encoding="utf-8") as f:
-                    results_data = json.load(f)
+        results_data = self.results_summary()
 
-            return {
-                "script_ran": ran_script,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "current_student": current_student,
-                "results": results_data,
-            }
-        except subprocess.TimeoutExpired:
-            os.chdir(original_cwd)
-            print("❌ Evaluator timed out")
-            return {"status": "error", "message": "Evaluator timed out."}
-        except Exception as e:
-            os.chdir(original_cwd)
-            print(f"❌ Evaluator error: {e}")
-            return {"status": "error", "message": str(e)}
+        # Grading request / cache counters written by main.py
+        run_summary_json = os.path.join(self.evaluator_results_dir, "run_summary.json")
+        run_summary = None
+        if ran_script and os.path.isfile(run_summary_json):
+            with open(run_summary_json, "r", encoding="utf-8") as f:
+                run_summary = json.load(f)
+
+        return {
+            "current_student": current_student,
+            "results": results_data,
+            "run_summary": run_summary,
+        }
 
     # -------------------------------------------------------------------------
     # PIPELINE SEQUENCE
@@ -500,9 +757,13 @@ class PipelineController:
         print("\n" + "="*60)
         print("🚀 Starting Pipeline Execution")
         print("="*60)
+
+        if self.streaming:
+            return self.run_pipeline_streaming()
         
         # Step 1: Preprocessor
         pre = self.run_preprocessor()
+        self._report("align", pre.get("summary", {}).get("status") or "error")
         if pre.get("summary", {}).get("status") != "completed":
             print("\n❌ Pipeline stopped: Preprocessor failed")
             return {
@@ -514,14 +775,17 @@ class PipelineController:
         
         # Step 2: Region Selector
         reg = self.run_region_selector()
+        self._report("regions", reg.get("status", "error"))
         if reg.get("status") != "completed":
             print("\n⚠️ Pipeline continuing despite Region Selector issues")
             # Don't stop pipeline here - region selector might be optional
         
         # Step 3: Text Recognition
         ocr = self.run_text_recognition()
+        self._report("ocr", ocr.get("status", "error"))
         if ocr.get("status") != "completed":
             print("\n❌ Pipeline stopped: Text Recognition failed")
+            self._flush_debug_artifacts()
             return {
                 "preprocessor": pre,
                 "region_selector": reg,
@@ -531,6 +795,8 @@ class PipelineController:
         
         # Step 4: Evaluator
         eva = self.run_evaluator()
+        self._report("grade", "completed" if eva.get("script_ran") else eva.get("status", "failed"))
+        self._flush_debug_artifacts()
         
         print("\n" + "="*60)
         print("✅ Pipeline Execution Complete")
@@ -543,12 +809,26 @@ class PipelineController:
             "evaluator": eva,
         }
 
+    def run_pipeline_streaming(self) -> Dict[str, Any]:
+        """All four stages at once, each sheet handed on as soon as its stage is done (see streaming.py)."""
+        print("\n🌊 Streaming mode: alignment, region selection, OCR and grading overlap per sheet")
+        results = StreamingPipeline(self, queue_size=self.stream_queue_size).run()
+        self._flush_debug_artifacts()
+
+        print("\n" + "="*60)
+        print("✅ Pipeline Execution Complete")
+        print("="*60)
+        return results
+
     # -------------------------------------------------------------------------
     # CLEANUP / SESSION CLOSE
     # -------------------------------------------------------------------------
-    def cleanup_session_outputs(self) -> Dict[str, Any]:
+    def cleanup_session_outputs(self, keep_sheets: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Clears all output directories when session is closed.
+        keep_sheets (answer sheet filenames, e.g. from a new upload) keeps the
+        stage outputs and checkpoints of those sheets so a re-upload of the
+        same batch resumes instead of starting over; everything else is removed.
         Removes files from:
         - aligned_outputs (preprocessor)
         - evaluation_results (region_selector)
@@ -572,32 +852,34 @@ class PipelineController:
             "debug_crops": []
         }
         
+        keep = {sheet_id(name) for name in keep_sheets or []}
+
         try:
             # 1. Clear aligned_outputs (preprocessor outputs)
             if os.path.isdir(self.preprocessor_outputs_dir):
                 for filename in os.listdir(self.preprocessor_outputs_dir):
                     file_path = os.path.join(self.preprocessor_outputs_dir, filename)
-                    if os.path.isfile(file_path):
+                    if os.path.isfile(file_path) and sheet_id(filename) not in keep:
                         os.remove(file_path)
                         cleaned["aligned_outputs"].append(filename)
                         print(f"  ✓ Removed: {filename} from aligned_outputs")
             
             # 2. Clear evaluation_results (region_selector)
-            evaluation_results_dir = os.path.join(self.region_selector_dir, "evaluation_results")
+            evaluation_results_dir = self.region_results_dir
             if os.path.isdir(evaluation_results_dir):
                 for filename in os.listdir(evaluation_results_dir):
                     file_path = os.path.join(evaluation_results_dir, filename)
-                    if os.path.isfile(file_path):
+                    if os.path.isfile(file_path) and sheet_id(filename) not in keep:
                         os.remove(file_path)
                         cleaned["evaluation_results"].append(filename)
                         print(f"  ✓ Removed: {filename} from evaluation_results")
             
             # 3. Clear agent1_output (region_selector)
-            agent1_output_dir = os.path.join(self.region_selector_dir, "agent1_output")
+            agent1_output_dir = self.agent1_output_dir
             if os.path.isdir(agent1_output_dir):
                 for filename in os.listdir(agent1_output_dir):
                     file_path = os.path.join(agent1_output_dir, filename)
-                    if os.path.isfile(file_path):
+                    if os.path.isfile(file_path) and sheet_id(filename) not in keep:
                         os.remove(file_path)
                         cleaned["agent1_output"].append(filename)
                         print(f"  ✓ Removed: {filename} from agent1_output")
@@ -621,7 +903,7 @@ class PipelineController:
                         print(f"  ✓ Removed: {filename} from question_paper_templates")
             
             # 6. Clear visualizations (evaluator)
-            visualizations_dir = os.path.join(self.evaluator_dir, "results", "visualizations")
+            visualizations_dir = self.visualizations_dir
             if os.path.isdir(visualizations_dir):
                 for filename in os.listdir(visualizations_dir):
                     file_path = os.path.join(visualizations_dir, filename)
@@ -631,7 +913,7 @@ class PipelineController:
                         print(f"  ✓ Removed: {filename} from visualizations")
             
             # 7. Clear debug_crops (text_recognition)
-            debug_crops_dir = os.path.join(self.text_recognition_dir, "debug_crops")
+            debug_crops_dir = self.debug_crops_dir
             if os.path.isdir(debug_crops_dir):
                 for filename in os.listdir(debug_crops_dir):
                     file_path = os.path.join(debug_crops_dir, filename)
@@ -640,6 +922,12 @@ class PipelineController:
                         cleaned["debug_crops"].append(filename)
                         print(f"  ✓ Removed: {filename} from debug_crops")
             
+            # 8. Checkpoints of removed sheets
+            if keep:
+                self.checkpoints.prune(keep)
+            else:
+                self.checkpoints.clear()
+
             total_cleaned = sum(len(files) for files in cleaned.values())
             print(f"\n✅ Cleanup completed. Removed {total_cleaned} files total.")
             print("="*60)
@@ -660,6 +948,96 @@ class PipelineController:
                 "cleaned": cleaned
             }
 
+    # -------------------------------------------------------------------------
+    def _report(self, stage: str, status: str, sheet: Optional[str] = None, done: Optional[int] = None,
+                total: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Forwards stage / per-sheet progress to the progress callback, if any."""
+        if self.progress is None:
+            return
+        try:
+            self.progress(stage, status, sheet=sheet, done=done, total=total, message=message)
+        except Exception as e:
+            print(f"⚠️  Progress callback failed (non-fatal): {e}")
+
+    @staticmethod
+    def _flush_debug_artifacts() -> None:
+        """
+        Waits for the region selector's queued debug images (see agents/debug_artifacts.py),
+        so the outputs listed once a run is over are complete. The OCR servers flush on exit.
+        """
+        if AGENTS_ROOT not in sys.path:
+            sys.path.append(AGENTS_ROOT)
+        from debug_artifacts import get_artifact_writer
+        get_artifact_writer().flush()
+
+    # -------------------------------------------------------------------------
+    # CHECKPOINT KEYS (each stage chains the key of the stage before it)
+    # -------------------------------------------------------------------------
+    def _align_key(self, scan_path: str, template_paths: List[str]) -> str:
+        templates = [(os.path.basename(path), file_sha256(path)) for path in template_paths]
+        return stage_key("align", file_sha256(scan_path), templates,
+                         self.alignment_quality, self.alignment_matcher, self.alignment_top_k)
+
+    def _aligned_template(self, region_selector, image_path: str, template_paths: List[str]) -> str:
+        """Template an aligned image was aligned against, per its align checkpoint."""
+        record = self.checkpoints.record(sheet_id(image_path), "align")
+        template_used = (record.get("details") or {}).get("template_used") if record else None
+        return region_selector.route_template(template_used, template_paths)
+
+    def _regions_key(self, image_path: str, template_digest: str) -> str:
+        # Aligned images that were not produced by a checkpointed run are keyed by content
+        upstream = self.checkpoints.key(sheet_id(image_path), "align") or file_sha256(image_path)
+        # Detection settings read by region_selector (REGION_DOWNSCALE changes the ROIs slightly)
+        return stage_key("regions", upstream, template_digest,
+                         os.environ.get("REGION_ENGINE", ""), os.environ.get("REGION_DOWNSCALE", ""))
+
+    def _ocr_key(self, data_json_path: str) -> str:
+        upstream = self.checkpoints.key(sheet_id(data_json_path), "regions") or file_sha256(data_json_path)
+        return stage_key("ocr", upstream, os.environ.get("OCR_MODE", ""))
+
+    def _grade_key(self, ocr_key: str) -> str:
+        reference_path = self.reference_answers_file
+        reference = file_sha256(reference_path) if os.path.isfile(reference_path) else None
+        return stage_key("grade", ocr_key, reference)
+
+    @staticmethod
+    def _ocr_output_name(data_json_file: str) -> str:
+        # Same naming as run_agent2_test.process_job
+        return f"{os.path.splitext(data_json_file)[0].replace('_data', '')}_evaluation.json"
+
+    # -------------------------------------------------------------------------
+    def open_results_store(self):
+        """Evaluator results store (results/results.sqlite), or None before the first evaluation."""
+        db_path = os.path.join(self.evaluator_results_dir, "results.sqlite")
+        if not os.path.isfile(db_path):
+            return None
+        if self.evaluator_dir not in sys.path:
+            sys.path.append(self.evaluator_dir)
+        from results_store import ResultsStore
+        return ResultsStore(db_path)
+
+    def results_summary(self) -> Optional[Dict[str, Any]]:
+        """Student count and average / highest / lowest score from the results store."""
+        store = self.open_results_store()
+        if store is None:
+            return None
+        try:
+            summary = store.score_summary()
+        finally:
+            store.close()
+        return {"total_students": summary.pop("total_students"), "summary": summary}
+
+    def agent_env(self) -> Dict[str, str]:
+        """
+        Environment for agent subprocesses: points the OCR server and the
+        evaluator scripts at this controller's data folders (its workspace).
+        """
+        env = dict(os.environ)
+        env["OCR_DEBUG_DIR"] = self.debug_crops_dir
+        env["EVALUATOR_WORK_DIR"] = self.evaluator_work_dir
+        env["EVALUATOR_INCOMING_DIR"] = self.text_recognition_outputs_dir
+        return env
+
     # -------------------------------------------------------------------------
     @staticmethod
     def _python_executable() -> str:
@@ -669,9 +1047,14 @@ class PipelineController:
 # -------------------------------------------------------------------------
 # EXTERNAL TRIGGER (AFTER FILE UPLOADS)
 # -------------------------------------------------------------------------
-def run_pipeline_after_uploads(answer_key_paths: List[str], answer_sheet_paths: List[str], related_docs: List[str]) -> Dict[str, Any]:
+def run_pipeline_after_uploads(answer_key_paths: List[str], answer_sheet_paths: List[str], related_docs: List[str],
+                               progress: Optional[Callable[..., None]] = None,
+                               workspace_root: Optional[str] = None,
+                               ocr_service: Optional[Any] = None,
+                               streaming: Optional[bool] = None) -> Dict[str, Any]:
     """Run complete pipeline after uploading files"""
-    controller = PipelineController()
+    controller = PipelineController(progress=progress, workspace_root=workspace_root, ocr_service=ocr_service,
+                                    streaming=streaming)
     saved = controller.save_uploads(answer_key_paths, answer_sheet_paths, related_docs)
     results = controller.run_pipeline()
     return {"saved": saved, "results": results}
@@ -684,4 +1067,5 @@ if __name__ == "__main__":
     print(f"Preprocessor dir: {controller.preprocessor_dir}")
     print(f"Region selector dir: {controller.region_selector_dir}")
     print(f"Text recognition dir: {controller.text_recognition_dir}")
-    print(f"Evaluator dir: {controller.evaluator_dir}")
\ No newline at end of file
+    print(f"Evaluator dir: {controller.evaluator_dir}")
+    print(f"Data root: {controller.workspace_root or AGENTS_ROOT}")
\ No newline at end of file
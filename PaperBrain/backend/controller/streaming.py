@@ -0,0 +1,460 @@
+import asyncio
+import functools
+import importlib.util
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    from controller.checkpoints import sheet_id
+except ImportError:  # run directly from the controller folder
+    from checkpoints import sheet_id
+
+# Streaming execution: instead of stage barriers (all sheets aligned, then all
+# regions, ...), every sheet flows through bounded queues between one thread
+# per stage, so OCR of one sheet overlaps alignment of the next and grading of
+# the previous one:
+#
+#   align --q--> regions --q--> ocr (N OCR servers, or the resident service) --q--> grade
+#
+# Queues are bounded, so a slow stage holds back the ones before it instead of
+# piling up aligned images. Stages reuse the controller's checkpoints, key
+# helpers and student-info handling, so a streamed run and a staged run leave
+# the same outputs behind.
+
+STAGES = ("align", "regions", "ocr", "grade")
+# Marks the end of a queue; consumers pass it on once they are done
+END = None
+# The evaluator's main.py, loaded once per process (model client, prompt) by path
+_EVALUATOR_MODULES: Dict[str, Any] = {}
+_EVALUATOR_IMPORT_LOCK = threading.Lock()
+
+
+class StageStats:
+    """Per-stage counters: sheets processed / reused / failed, busy time and throughput."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.processed = 0
+        self.reused = 0
+        self.failed = 0
+        self.busy_s = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add(self, outcome: str, busy_s: float = 0.0) -> int:
+        """Counts one sheet ("processed", "reused" or "failed"); returns sheets done so far."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.busy_s += busy_s
+            self.finished_at = time.perf_counter()
+            return self.processed + self.reused
+
+    def as_dict(self) -> Dict[str, Any]:
+        active_s = (self.finished_at - self.started_at) if self.started_at and self.finished_at else 0.0
+        return {
+            "processed": self.processed,
+            "reused": self.reused,
+            "failed": self.failed,
+            "busy_s": round(self.busy_s, 3),
+            "active_s": round(active_s, 3),
+            "sheets_per_min": round(60 * self.processed / self.busy_s, 2) if self.busy_s else None,
+            "error": self.error,
+        }
+
+
+class QueueMonitor:
+    """Samples the depth of the stage queues in the background."""
+
+    def __init__(self, queues: Dict[str, "queue.Queue"], interval: float = 0.1) -> None:
+        self.queues = queues
+        self.interval = interval
+        self.samples: Dict[str, List[int]] = {name: [] for name in queues}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="queue-monitor", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            for name, q in self.queues.items():
+                self.samples[name].append(q.qsize())
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Dict[str, Any]]:
+        self._stop.set()
+        self._thread.join()
+        return {
+            name: {
+                "capacity": self.queues[name].maxsize,
+                "max_depth": max(samples, default=0),
+                "avg_depth": round(sum(samples) / len(samples), 2) if samples else 0,
+            }
+            for name, samples in self.samples.items()
+        }
+
+
+class StreamingPipeline:
+    """Runs one PipelineController's stages concurrently, sheet by sheet."""
+
+    def __init__(self, controller, queue_size: int = 2) -> None:
+        self.controller = controller
+        self.queue_size = max(1, queue_size)
+        self.stats = {stage: StageStats(stage) for stage in STAGES}
+        self.details: Dict[str, List[Dict[str, Any]]] = {"align": [], "regions": [], "ocr": []}
+        self.evaluator: Dict[str, Any] = {}
+        self.total = 0
+        # Stages that have taken END from their input queue
+        self._ended = set()
+
+    # ---------------- Run ----------------
+    def run(self) -> Dict[str, Any]:
+        c = self.controller
+        template_files = sorted(f for f in os.listdir(c.preprocessor_templates_dir) if f.startswith("template_"))
+        scan_files = sorted(f for f in os.listdir(c.preprocessor_inputs_dir) if f.startswith("scan_"))
+        if not template_files or not scan_files:
+            print("❌ Missing templates or scans")
+            return {"preprocessor": {"status": "error", "message": "Missing templates or scans.", "summary": {}}}
+
+        self.total = len(scan_files)
+        print(f"  Streaming {len(scan_files)} answer sheet(s) through the pipeline "
+              f"(queue size {self.queue_size}, {c.ocr_workers} OCR worker(s))")
+
+        queues = {
+            "align->regions": queue.Queue(self.queue_size),
+            "regions->ocr": queue.Queue(self.queue_size),
+            "ocr->grade": queue.Queue(self.queue_size),
+        }
+        template_paths = [os.path.join(c.preprocessor_templates_dir, f) for f in template_files]
+        scan_paths = [os.path.join(c.preprocessor_inputs_dir, f) for f in scan_files]
+        # (stage, body, input queue, output queue)
+        stages = [
+            ("align", lambda outputs: self._align_stage(scan_paths, template_paths, outputs),
+             None, queues["align->regions"]),
+            ("regions", self._regions_stage, queues["align->regions"], queues["regions->ocr"]),
+            ("ocr", self._ocr_stage, queues["regions->ocr"], queues["ocr->grade"]),
+            ("grade", lambda inputs, outputs: self._grade_stage(inputs), queues["ocr->grade"], None),
+        ]
+
+        monitor = QueueMonitor(queues)
+        started = time.perf_counter()
+        monitor.start()
+        threads = [threading.Thread(target=self._stage_main, args=stage, name=f"stream-{stage[0]}")
+                   for stage in stages]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_s = time.perf_counter() - started
+        queue_stats = monitor.stop()
+
+        streaming = {
+            "wall_s": round(wall_s, 3),
+            "sheets": self.total,
+            "sheets_per_min": round(60 * self.total / wall_s, 2) if wall_s else None,
+            "stages": {name: stats.as_dict() for name, stats in self.stats.items()},
+            "queues": queue_stats,
+        }
+        self._print_report(streaming)
+        return self._results(streaming)
+
+    def _stage_main(self, name: str, body: Callable[..., None], inputs: Optional["queue.Queue"],
+                    outputs: Optional["queue.Queue"]) -> None:
+        stats = self.stats[name]
+        stats.started_at = time.perf_counter()
+        self.controller._report(name, "running", total=self.total, done=0)
+        try:
+            if inputs is None:
+                body(outputs)
+            else:
+                body(inputs, outputs)
+        except Exception as e:
+            # A broken stage must neither leave the stage before it blocked on a
+            # full queue nor the stage after it waiting for more sheets
+            print(f"❌ Streaming stage '{name}' failed: {e}")
+            traceback.print_exc()
+            stats.error = str(e)
+            if inputs is not None and name not in self._ended:
+                self._drain(inputs, stats)
+            if outputs is not None:
+                outputs.put(END)
+        self.controller.checkpoints.flush()
+        status = "error" if stats.error else ("completed" if stats.processed + stats.reused else "failed")
+        self.controller._report(name, status)
+
+    def _next(self, stage: str, inputs: "queue.Queue") -> Optional[Dict[str, Any]]:
+        item = inputs.get()
+        if item is END:
+            self._ended.add(stage)
+        return item
+
+    def _drain(self, inputs: "queue.Queue", stats: StageStats) -> None:
+        while self._next(stats.name, inputs) is not END:
+            stats.add("failed")
+
+    def _finish(self, stage: str, item: Dict[str, Any], outcome: str, started: float) -> None:
+        done = self.stats[stage].add(outcome, time.perf_counter() - started)
+        status = {"processed": "completed", "reused": "reused", "failed": "failed"}[outcome]
+        self.controller._report(stage, status, sheet=item["sheet"], done=done)
+
+    # ---------------- Stages ----------------
+    def _align_stage(self, scan_paths: List[str], template_paths: List[str], outputs: "queue.Queue") -> None:
+        c = self.controller
+        if c.preprocessor_dir not in sys.path:
+            sys.path.append(c.preprocessor_dir)
+        from alignment_agent import align_scan
+        from template_features import get_default_store
+
+        store = get_default_store()
+        for scan_path in scan_paths:
+            started = time.perf_counter()
+            item = {"sheet": sheet_id(scan_path), "scan_path": scan_path}
+            output_path = os.path.join(c.preprocessor_outputs_dir, f"aligned_{os.path.basename(scan_path)}")
+            key = c._align_key(scan_path, template_paths)
+            if c.checkpoints.is_done(item["sheet"], "align", key):
+                result, outcome = c.checkpoints.record(item["sheet"], "align")["details"], "reused"
+                print(f"  ↺ Reusing alignment: {os.path.basename(scan_path)}")
+            else:
+                try:
+                    result = align_scan(scan_path, template_paths, output_path, store,
+                                        top_k=c.alignment_top_k, quality=c.alignment_quality,
+                                        matcher=c.alignment_matcher, keep_image=True)
+                    # Handed to the regions stage in memory; never stored in the checkpoint
+                    item["aligned_image"] = result.pop("aligned_image", None)
+                except Exception as e:
+                    result = {"status": "failed", "scan_file": os.path.basename(scan_path), "message": str(e)}
+                outcome = "processed" if result["status"] == "completed" else "failed"
+                if outcome == "processed":
+                    c.checkpoints.mark_done(item["sheet"], "align", key, outputs=[output_path], details=result)
+            self.details["align"].append(result)
+            self._finish("align", item, outcome, started)
+            if outcome == "failed":
+                print(f"  ✗ Alignment failed for {os.path.basename(scan_path)}")
+                continue
+            print(f"  ✓ Aligned: {os.path.basename(result['output_image'])} (template: {result['template_used']})")
+            item["aligned_path"] = result["output_image"]
+            item["template_used"] = result.get("template_used")
+            outputs.put(item)
+        outputs.put(END)
+
+    def _regions_stage(self, inputs: "queue.Queue", outputs: "queue.Queue") -> None:
+        c = self.controller
+        if c.region_selector_dir not in sys.path:
+            sys.path.append(c.region_selector_dir)
+        import region_selector
+
+        template_paths = region_selector.find_template_paths(c.preprocessor_templates_dir)
+        if not template_paths:
+            raise ValueError(f"No template images found in {c.preprocessor_templates_dir}")
+        cache = region_selector.get_template_cache()
+
+        while True:
+            item = self._next("regions", inputs)
+            if item is END:
+                break
+            started = time.perf_counter()
+            image_path = item["aligned_path"]
+            # Aligned this run: use the warped array instead of reading it back
+            aligned_image = item.pop("aligned_image", None)
+            # Compare with the template the sheet was aligned against, prepared once
+            template_path = region_selector.route_template(item.get("template_used"), template_paths)
+            key = c._regions_key(image_path, cache.digest(template_path))
+            if c.checkpoints.is_done(item["sheet"], "regions", key):
+                detail, outcome = c.checkpoints.record(item["sheet"], "regions")["details"], "reused"
+                print(f"  ↺ Reusing regions: {os.path.basename(image_path)}")
+            else:
+                try:
+                    detail = region_selector.process_images(
+                        template_path, [image_path],
+                        results_folder=c.region_results_dir,
+                        output_folder=c.agent1_output_dir,
+                        cache=cache,
+                        images={image_path: aligned_image} if aligned_image is not None else None,
+                    )[0]
+                except Exception as e:
+                    detail = {"status": "failed", "image": os.path.basename(image_path), "message": str(e)}
+                    print(f"  ✗ Region selection failed for {os.path.basename(image_path)}: {e}")
+                outcome = "processed" if detail["status"] == "completed" else "failed"
+                if outcome == "processed":
+                    c.checkpoints.mark_done(item["sheet"], "regions", key,
+                                            outputs=[detail["output_json"]], details=detail)
+            self.details["regions"].append(detail)
+            self._finish("regions", item, outcome, started)
+            if outcome != "failed":
+                item["data_json"] = detail["output_json"]
+                outputs.put(item)
+        outputs.put(END)
+
+    def _ocr_stage(self, inputs: "queue.Queue", outputs: "queue.Queue") -> None:
+        c = self.controller
+        self._student_info_map = c._load_student_info_map()
+        if c.uses_ocr_service():
+            asyncio.run(self._ocr_service_main(c.ocr_service, inputs, outputs))
+        else:
+            if c.text_recognition_dir not in sys.path:
+                sys.path.append(c.text_recognition_dir)
+            import run_agent2_test
+            asyncio.run(self._ocr_main(run_agent2_test, inputs, outputs))
+        outputs.put(END)
+
+    async def _ocr_main(self, ocr, inputs: "queue.Queue", outputs: "queue.Queue") -> None:
+        workers = self.controller.ocr_workers
+        torch_threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None
+        output_folder = self.controller.text_recognition_outputs_dir
+        async with AsyncExitStack() as stack:
+            # The OCR servers load EasyOCR while the first sheets are still being aligned
+            server = ocr.agent_2_server(torch_threads, debug_dir=self.controller.debug_crops_dir)
+            sessions = [await ocr.open_session(stack, server) for _ in range(workers)]
+            await asyncio.gather(*(session.initialize() for session in sessions))
+            print(f"  OCR servers ready ({workers})")
+            await asyncio.gather(*(
+                self._ocr_worker(functools.partial(ocr.process_job, session, worker_id=i, output_folder=output_folder),
+                                 inputs, outputs)
+                for i, session in enumerate(sessions)))
+
+    async def _ocr_service_main(self, service, inputs: "queue.Queue", outputs: "queue.Queue") -> None:
+        # One worker per engine of the resident service, so every engine stays busy
+        c = self.controller
+        print(f"  Using the resident OCR service ({service.status}, {service.workers} engine(s))")
+        loop = asyncio.get_running_loop()
+
+        def recognize(data_json):
+            return loop.run_in_executor(None, functools.partial(
+                service.process_job, data_json, c.text_recognition_outputs_dir, debug_dir=c.debug_crops_dir))
+
+        await asyncio.gather(*(self._ocr_worker(recognize, inputs, outputs) for _ in range(service.workers)))
+
+    async def _ocr_worker(self, recognize: Callable[[str], Awaitable[Optional[str]]],
+                          inputs: "queue.Queue", outputs: "queue.Queue") -> None:
+        """Recognizes sheets until the end of the queue; recognize(data_json) returns the saved output path."""
+        c = self.controller
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self._next, "ocr", inputs)
+            if item is END:
+                # Let the other workers see the end as well
+                inputs.put(END)
+                return
+            started = time.perf_counter()
+            data_json = item["data_json"]
+            key = c._ocr_key(data_json)
+            item["ocr_key"] = key
+            output_path = os.path.join(c.text_recognition_outputs_dir, c._ocr_output_name(os.path.basename(data_json)))
+            if c.checkpoints.is_done(item["sheet"], "ocr", key):
+                outcome = "reused"
+                print(f"  ↺ Reusing OCR: {os.path.basename(data_json)}")
+            elif c.checkpoints.is_done(item["sheet"], "grade", c._grade_key(key), require_outputs=False):
+                outcome, item["graded"] = "reused", True
+                print(f"  ↺ Already graded: {os.path.basename(data_json)}")
+            else:
+                try:
+                    saved = await recognize(data_json)
+                except Exception as e:
+                    print(f"  ⚠️  OCR failed for {os.path.basename(data_json)}: {e}")
+                    saved = None
+                outcome = "failed"
+                if saved and c._apply_student_info(output_path, self._student_info_map):
+                    c.checkpoints.mark_done(item["sheet"], "ocr", key, outputs=[output_path])
+                    outcome = "processed"
+            self.details["ocr"].append({"sheet": item["sheet"], "status": outcome, "output_file": output_path})
+            self._finish("ocr", item, outcome, started)
+            if outcome != "failed":
+                item["eval_path"] = output_path
+                await loop.run_in_executor(None, outputs.put, item)
+
+    def _grade_stage(self, inputs: "queue.Queue") -> None:
+        c = self.controller
+        missing = c._check_reference_answers()
+        if missing:
+            # OCR outputs stay (and are checkpointed) until reference answers are provided
+            self.evaluator = missing
+            self._drain(inputs, self.stats["grade"])
+            return
+
+        evaluator = self._load_evaluator()
+        results_store = evaluator.open_results_store()
+        found = committed = 0
+        try:
+            while True:
+                item = self._next("grade", inputs)
+                if item is END:
+                    break
+                started = time.perf_counter()
+                if item.get("graded"):
+                    self._finish("grade", item, "reused", started)
+                    continue
+                found += 1
+                grade_key = c._grade_key(item["ocr_key"])
+                if evaluator.grade_and_commit(results_store, item["eval_path"]) is not None:
+                    committed += 1
+                    c.checkpoints.mark_done(item["sheet"], "grade", grade_key)
+                    self._finish("grade", item, "processed", started)
+                else:
+                    self._finish("grade", item, "failed", started)
+        finally:
+            evaluator.close_results_store(results_store, committed)
+        run_summary = evaluator.report_run(found, committed)
+
+        if committed:
+            c._run_visualizations()
+        self.evaluator = {"script_ran": True, **c._evaluator_outputs(True), "run_summary": run_summary}
+
+    def _load_evaluator(self):
+        """
+        Evaluator of the evaluator's main.py on this run's workspace folders. The
+        module is loaded once per process; each run gets a fresh Evaluator (its
+        reference answers, counters and grade cache connection).
+        """
+        c = self.controller
+        path = os.path.join(c.evaluator_dir, "main.py")
+        with _EVALUATOR_IMPORT_LOCK:
+            module = _EVALUATOR_MODULES.get(path)
+            if module is None:
+                if c.evaluator_dir not in sys.path:
+                    sys.path.append(c.evaluator_dir)
+                spec = importlib.util.spec_from_file_location("paperbrain_evaluator_main", path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                _EVALUATOR_MODULES[path] = module
+        return module.Evaluator(work_dir=c.evaluator_work_dir, incoming_dir=c.text_recognition_outputs_dir)
+
+    # ---------------- Report ----------------
+    def _print_report(self, streaming: Dict[str, Any]) -> None:
+        print(f"\n  Streamed {streaming['sheets']} sheet(s) in {streaming['wall_s']}s "
+              f"({streaming['sheets_per_min']} sheets/min)")
+        for name, stats in streaming["stages"].items():
+            print(f"    {name:<8} processed {stats['processed']:>3}  reused {stats['reused']:>3}  "
+                  f"failed {stats['failed']:>3}  busy {stats['busy_s']:>8}s  "
+                  f"{stats['sheets_per_min'] or '-'} sheets/min")
+        for name, stats in streaming["queues"].items():
+            print(f"    queue {name:<15} max depth {stats['max_depth']}/{stats['capacity']}  "
+                  f"avg {stats['avg_depth']}")
+
+    def _results(self, streaming: Dict[str, Any]) -> Dict[str, Any]:
+        """Same layout as PipelineController.run_pipeline, plus the streaming stats."""
+        def status(stage):
+            stats = self.stats[stage]
+            if stats.error:
+                return "error"
+            return "completed" if stats.processed + stats.reused else "failed"
+
+        aligned = [d for d in self.details["align"] if d["status"] == "completed"]
+        return {
+            "preprocessor": {"summary": {"status": status("align"), "processed": len(aligned),
+                                         "details": self.details["align"]}},
+            "region_selector": {"status": status("regions"), "details": self.details["regions"],
+                                "message": self.stats["regions"].error},
+            "text_recognition": {"status": status("ocr"), "details": self.details["ocr"],
+                                 "processed_count": self.stats["ocr"].processed,
+                                 "reused": self.stats["ocr"].reused, "message": self.stats["ocr"].error},
+            "evaluator": self.evaluator or {"status": "error", "message": self.stats["grade"].error},
+            "streaming": streaming,
+        }
@@ -0,0 +1,126 @@
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Per-session workspaces. Each upload session (or API client) gets its own
+# copy of the agents' data folders under WORKSPACES_ROOT/<session>, so two
+# exams processed on the same host never see each other's scans, templates,
+# OCR outputs or results. Agent code, the grading cache, the upload registry
+# and the template feature cache stay shared (they are content-addressed).
+#
+# Workspace layout (mirrors the agents folder):
+#   <session>/preprocessor/{answer_scripts,question_paper_templates,aligned_outputs}
+#   <session>/region_selector/{evaluation_results,agent1_output}
+#   <session>/text_recognition/{Outputs,debug_crops}
+#   <session>/evaluator/{inputs,temp,results}
+#   <session>/run_state/checkpoints.json
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+WORKSPACES_ROOT = os.environ.get("PAPERBRAIN_WORKSPACES_DIR", os.path.join(PROJECT_ROOT, "workspaces"))
+# Workspaces untouched for this long are removed by the garbage collector
+WORKSPACE_TTL_HOURS = float(os.environ.get("PAPERBRAIN_WORKSPACE_TTL_HOURS", "24"))
+# How often the garbage collector runs
+WORKSPACE_GC_MINUTES = float(os.environ.get("PAPERBRAIN_WORKSPACE_GC_MINUTES", "30"))
+
+# Session ids become folder names: keep them to a safe alphabet
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Touched on every use; its mtime is the workspace's last activity
+LAST_USED_FILE = ".last_used"
+
+
+class WorkspaceManager:
+    """Creates, tracks and garbage-collects per-session workspaces. Thread-safe."""
+
+    def __init__(self, root: str = WORKSPACES_ROOT, ttl_hours: float = WORKSPACE_TTL_HOURS,
+                 gc_minutes: float = WORKSPACE_GC_MINUTES,
+                 in_use: Optional[Callable[[], Iterable[str]]] = None) -> None:
+        self.root = root
+        self.ttl_seconds = ttl_hours * 3600
+        self.gc_seconds = gc_minutes * 60
+        # Returns the session ids that must not be collected (e.g. with a running job)
+        self.in_use = in_use
+        self._lock = threading.Lock()
+        self._gc_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def valid_session_id(session_id: str) -> bool:
+        return bool(session_id) and SESSION_ID_PATTERN.match(session_id) is not None
+
+    def path_for(self, session_id: str) -> str:
+        """Workspace folder of a session (created on first use); raises ValueError for a bad id."""
+        if not self.valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        path = os.path.join(self.root, session_id)
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            self.touch(path)
+        return path
+
+    @staticmethod
+    def touch(path: str) -> None:
+        marker = os.path.join(path, LAST_USED_FILE)
+        with open(marker, "a", encoding="utf-8"):
+            pass
+        os.utime(marker, None)
+
+    def list_workspaces(self) -> List[Dict[str, float]]:
+        if not os.path.isdir(self.root):
+            return []
+        workspaces = []
+        for session_id in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, session_id)
+            if os.path.isdir(path):
+                workspaces.append({"session": session_id, "last_used": self._last_used(path)})
+        return workspaces
+
+    def remove(self, session_id: str) -> bool:
+        if not self.valid_session_id(session_id):
+            return False
+        path = os.path.join(self.root, session_id)
+        with self._lock:
+            if not os.path.isdir(path):
+                return False
+            shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def collect_garbage(self, now: Optional[float] = None) -> List[str]:
+        """Removes workspaces idle for longer than the TTL; returns the removed session ids."""
+        now = time.time() if now is None else now
+        busy = set(self.in_use()) if self.in_use else set()
+        removed = []
+        for workspace in self.list_workspaces():
+            session_id = workspace["session"]
+            if session_id in busy or now - workspace["last_used"] < self.ttl_seconds:
+                continue
+            if self.remove(session_id):
+                removed.append(session_id)
+        if removed:
+            print(f"🧹 Removed {len(removed)} idle workspace(s): {', '.join(removed)}")
+        return removed
+
+    def start_gc(self) -> None:
+        """Runs collect_garbage every gc_minutes on a daemon thread (once per manager)."""
+        if self._gc_thread is not None or self.gc_seconds <= 0:
+            return
+        self._gc_thread = threading.Thread(target=self._gc_loop, name="workspace-gc", daemon=True)
+        self._gc_thread.start()
+
+    def stop_gc(self) -> None:
+        self._stop.set()
+
+    # ---------------- Internals ----------------
+    def _gc_loop(self) -> None:
+        while not self._stop.wait(self.gc_seconds):
+            try:
+                self.collect_garbage()
+            except Exception as e:
+                print(f"⚠️  Workspace garbage collection failed (non-fatal): {e}")
+
+    @staticmethod
+    def _last_used(path: str) -> float:
+        marker = os.path.join(path, LAST_USED_FILE)
+        return os.path.getmtime(marker if os.path.exists(marker) else path)
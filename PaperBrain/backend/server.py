@@ -1,15 +1,18 @@
 import os
+import sys
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 import glob
 import traceback
 
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 
 # Import controller
 try:
     from controller.main_controller import PipelineController, run_pipeline_after_uploads
+    from controller.jobs import JobManager
+    from controller.workspaces import WorkspaceManager
     print("✅ Controller imported successfully")
 except ImportError as e:
     print(f"❌ Failed to import controller: {e}")
@@ -27,17 +30,76 @@ FRONTEND_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "frontend", "paperbr
 UPLOAD_ROOT = os.path.join(BASE_DIR, "uploads")
 os.makedirs(UPLOAD_ROOT, exist_ok=True)
 
+# Background pipeline runs for /api/jobs (one at a time per session workspace)
+JOB_WORKERS = int(os.environ.get("PAPERBRAIN_JOB_WORKERS", "2"))
+job_manager = JobManager(max_workers=JOB_WORKERS)
+
+# Per-session workspaces: clients that send a session id (X-Session-Id header,
+# or a "session" query / form field) get their own copy of the agents' data
+# folders; requests without one use the agents' folders as before.
+workspace_manager = WorkspaceManager(in_use=job_manager.active_sessions)
+workspace_manager.start_gc()
+
+# Resident OCR service: EasyOCR is loaded once in this process and shared by
+# every run, instead of each run starting OCR server processes that load it
+# again. It keeps OCR_WORKERS engines loaded (one EasyOCR reader each, so
+# N times the model memory) and recognizes that many sheets at once; runs
+# asking for more OCR workers than that use the per-run servers.
+# PAPERBRAIN_OCR_SERVICE=0 always uses the per-run servers;
+# PAPERBRAIN_OCR_WARMUP=0 loads the models on the first OCR request instead
+# of at startup.
+OCR_SERVICE_ENABLED = os.environ.get("PAPERBRAIN_OCR_SERVICE", "1") == "1"
+OCR_WARMUP = os.environ.get("PAPERBRAIN_OCR_WARMUP", "1") == "1"
+ocr_service = None
+if OCR_SERVICE_ENABLED:
+    sys.path.append(os.path.join(BASE_DIR, "agents", "text_recognition"))
+    from ocr_service import get_ocr_service
+    ocr_service = get_ocr_service()
+    # app.run(debug=True) imports this module twice; only the serving child
+    # (WERKZEUG_RUN_MAIN) loads the models, not the reloader's file watcher
+    if OCR_WARMUP and not (__name__ == "__main__" and os.environ.get("WERKZEUG_RUN_MAIN") != "true"):
+        ocr_service.start(warm_up=True)
+
 print(f"📁 Base directory: {BASE_DIR}")
 print(f"📁 Frontend directory: {FRONTEND_DIR}")
 print(f"📁 Upload directory: {UPLOAD_ROOT}")
 
 
+def _session_id() -> Optional[str]:
+    """Session id of the current request, if the client sent one."""
+    return request.headers.get("X-Session-Id") or request.args.get("session") or request.form.get("session") or None
+
+
+def _controller(**kwargs: Any) -> PipelineController:
+    """PipelineController on the request's session workspace (agents' folders without a session)."""
+    session = _session_id()
+    workspace = workspace_manager.path_for(session) if session else None
+    kwargs.setdefault("ocr_service", ocr_service)
+    return PipelineController(workspace_root=workspace, **kwargs)
+
+
+def _upload_dir() -> str:
+    """Upload folder of the request's session, so equally named files of two sessions don't collide."""
+    session = _session_id()
+    path = os.path.join(UPLOAD_ROOT, session) if session else UPLOAD_ROOT
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@app.before_request
+def _check_session_id() -> Any:
+    session = _session_id()
+    if session and not workspace_manager.valid_session_id(session):
+        return jsonify({"error": "Invalid session id (use 1-64 letters, digits, '-' or '_')"}), 400
+    return None
+
+
 def _save_file(field_name: str) -> str:
     """Save uploaded file and return path"""
     file = request.files.get(field_name)
     if not file or not file.filename:
         return ""
-    dest = os.path.join(UPLOAD_ROOT, file.filename)
+    dest = os.path.join(_upload_dir(), file.filename)
     file.save(dest)
     print(f"  Saved {field_name}: {dest}")
     return dest
@@ -57,6 +119,8 @@ def index():
         </ul>
         <h3>Upload & Run Pipeline:</h3>
         <p>POST to <code>/api/upload</code> then <code>/api/run</code></p>
+        <p>Or POST to <code>/api/jobs</code> and follow <code>/api/jobs/&lt;id&gt;/events</code></p>
+        <p>Send an <code>X-Session-Id</code> header to work in a separate per-session workspace</p>
         <p style='color: #9ca3af; margin-top: 40px;'>
             💡 Tip: For the React UI, open <code>/ui</code> so Babel can load modules over HTTP.
         </p>
@@ -67,7 +131,7 @@ def index():
 def health() -> Any:
     """Health check endpoint"""
     try:
-        controller = PipelineController()
+        controller = _controller()
         return jsonify({
             "status": "ok",
             "message": "Server is healthy",
@@ -76,7 +140,10 @@ def health() -> Any:
                 "region_selector": os.path.exists(controller.region_selector_dir),
                 "text_recognition": os.path.exists(controller.text_recognition_dir),
                 "evaluator": os.path.exists(controller.evaluator_dir),
-            }
+            },
+            "workspace": controller.workspace_root,
+            "workspaces": len(workspace_manager.list_workspaces()),
+            "ocr_service": ocr_service.health() if ocr_service else {"status": "disabled"},
         })
     except Exception as e:
         return jsonify({
@@ -105,6 +172,72 @@ def ui_static(path: str):
     return jsonify({"error": "asset not found", "path": path}), 404
 
 
+def _save_uploads() -> Any:
+    """Saves the request's files into the session; upload() runs it while no job of the session runs."""
+    upload_dir = _upload_dir()
+
+    # Handle multiple answer keys (REQUIRED)
+    answer_key_files = request.files.getlist("answer_key[]") or request.files.getlist("answer_key")
+    answer_key_paths = []
+    for f in answer_key_files:
+        if f.filename:
+            dest = os.path.join(upload_dir, f.filename)
+            f.save(dest)
+            answer_key_paths.append(dest)
+            print(f"  ✓ Answer key: {f.filename}")
+    
+    # Handle multiple answer sheets (REQUIRED)
+    answer_sheet_files = request.files.getlist("answer_sheet[]") or request.files.getlist("answer_sheet")
+    answer_sheet_paths = []
+    for f in answer_sheet_files:
+        if f.filename:
+            dest = os.path.join(upload_dir, f.filename)
+            f.save(dest)
+            answer_sheet_paths.append(dest)
+            print(f"  ✓ Answer sheet: {f.filename}")
+    
+    # Also check for single answer_sheet (backward compatibility)
+    if not answer_sheet_paths:
+        answer_sheet_path = _save_file("answer_sheet")
+        if answer_sheet_path:
+            answer_sheet_paths = [answer_sheet_path]
+            print(f"  ✓ Answer sheet: {os.path.basename(answer_sheet_path)}")
+
+    # related_docs is OPTIONAL
+    related_docs_files = request.files.getlist("related_docs") or request.files.getlist("related_docs[]")
+    related_doc_paths = []
+    for f in related_docs_files:
+        if f.filename:
+            dest = os.path.join(upload_dir, f.filename)
+            f.save(dest)
+            related_doc_paths.append(dest)
+            print(f"  ✓ Related doc: {f.filename}")
+
+    if not answer_key_paths or not answer_sheet_paths:
+        print("❌ Missing required files")
+        return jsonify({"error": "at least one answer_key and one answer_sheet are required"}), 400
+
+    controller = _controller()
+    
+    # Clean up old outputs before uploading new files (sheets uploaded again
+    # keep their checkpointed outputs, so an interrupted batch resumes)
+    print("\n🧹 Cleaning up previous session outputs...")
+    cleanup_result = controller.cleanup_session_outputs(
+        keep_sheets=[f"scan_{os.path.basename(path)}" for path in answer_sheet_paths])
+    print(f"  Cleaned up {cleanup_result.get('total_files', 0)} files\n")
+    
+    saved = controller.save_uploads(answer_key_paths, answer_sheet_paths, related_doc_paths)
+    
+    print("✅ All files uploaded successfully")
+    print("="*60)
+    
+    return jsonify({
+        "status": "success",
+        "message": "Files uploaded successfully",
+        "saved": saved
+    })
+
+
 @app.route("/api/upload", methods=["POST"]) 
 def upload() -> Any:
     """
@@ -116,66 +249,14 @@ def upload() -> Any:
     try:
         print("\n" + "="*60)
         print("📤 Processing file uploads...")
-        
-        # Handle multiple answer keys (REQUIRED)
-        answer_key_files = request.files.getlist("answer_key[]") or request.files.getlist("answer_key")
-        answer_key_paths = []
-        for f in answer_key_files:
-            if f.filename:
-                dest = os.path.join(UPLOAD_ROOT, f.filename)
-                f.save(dest)
-                answer_key_paths.append(dest)
-                print(f"  ✓ Answer key: {f.filename}")
-        
-        # Handle multiple answer sheets (REQUIRED)
-        answer_sheet_files = request.files.getlist("answer_sheet[]") or request.files.getlist("answer_sheet")
-        answer_sheet_paths = []
-        for f in answer_sheet_files:
-            if f.filename:
-                dest = os.path.join(UPLOAD_ROOT, f.filename)
-                f.save(dest)
-                answer_sheet_paths.append(dest)
-                print(f"  ✓ Answer sheet: {f.filename}")
-        
-        # Also check for single answer_sheet (backward compatibility)
-        if not answer_sheet_paths:
-            answer_sheet_path = _save_file("answer_sheet")
-            if answer_sheet_path:
-                answer_sheet_paths = [answer_sheet_path]
-                print(f"  ✓ Answer sheet: {os.path.basename(answer_sheet_path)}")
-
-        # related_docs is OPTIONAL
-        related_docs_files = request.files.getlist("related_docs") or request.files.getlist("related_docs[]")
-        related_doc_paths = []
-        for f in related_docs_files:
-            if f.filename:
-                dest = os.path.join(UPLOAD_ROOT, f.filename)
-                f.save(dest)
-                related_doc_paths.append(dest)
-                print(f"  ✓ Related doc: {f.filename}")
-
-        if not answer_key_paths or not answer_sheet_paths:
-            print("❌ Missing required files")
-            return jsonify({"error": "at least one answer_key and one answer_sheet are required"}), 400
-
-        controller = PipelineController()
-        
-        # Clean up old outputs before uploading new files
-        print("\n🧹 Cleaning up previous session outputs...")
-        cleanup_result = controller.cleanup_session_outputs()
-        print(f"  Cleaned up {cleanup_result.get('total_files', 0)} files\n")
-        
-        saved = controller.save_uploads(answer_key_paths, answer_sheet_paths, related_doc_paths)
-        
-        print("✅ All files uploaded successfully")
-        print("="*60)
-        
-        return jsonify({
-            "status": "success",
-            "message": "Files uploaded successfully",
-            "saved": saved
-        })
-    
+
+        # New uploads clean up the session's outputs, so they wait until its jobs are done
+        with job_manager.idle_session(_session_id()) as idle:
+            if not idle:
+                print("❌ A pipeline job of this session is still running")
+                return jsonify({"error": "a pipeline job of this session is still queued or running"}), 409
+            return _save_uploads()
+
     except Exception as e:
         print(f"❌ Upload error: {e}")
         traceback.print_exc()
@@ -187,35 +268,24 @@ def upload() -> Any:
 
 @app.route("/api/run", methods=["POST"]) 
 def run_pipeline() -> Any:
-    """Run the complete pipeline"""
+    """
+    Run the complete pipeline and wait for it (optional "streaming": true for
+    the overlapped mode). 409 while a job of the same session is queued or running.
+    """
     try:
         print("\n" + "="*60)
         print("🚀 Starting pipeline via API...")
         print("="*60)
         
         data: Dict[str, Any] = request.get_json(silent=True) or {}
-        
-        # Optional: accept paths if already uploaded via other means
-        answer_keys = data.get("answer_key_paths", [])
-        answer_sheet = data.get("answer_sheet_path")
-        related = data.get("related_docs_paths", [])
-
-        if answer_keys and (answer_sheet or (isinstance(answer_sheet, list) and len(answer_sheet) > 0)):
-            print("Running pipeline with provided paths...")
-            answer_sheets = answer_sheet if isinstance(answer_sheet, list) else [answer_sheet]
-            results = run_pipeline_after_uploads(answer_keys, answer_sheets, related)
-            return jsonify(results)
-
-        # Otherwise run pipeline on already saved files in agents dirs
-        print("Running pipeline on existing files...")
-        controller = PipelineController()
-        results = controller.run_pipeline()
-        
-        return jsonify({
-            "status": "success",
-            "saved": {},
-            "results": results
-        })
+        session = _session_id()
+
+        # Runs in the session's workspace: never alongside one of its background jobs
+        with job_manager.idle_session(session) as idle:
+            if not idle:
+                print("❌ A pipeline job of this session is still running")
+                return jsonify({"error": "a pipeline job of this session is still queued or running"}), 409
+            return jsonify(_pipeline_job(data, session)(None))
     
     except Exception as e:
         print(f"❌ Pipeline error: {e}")
@@ -226,11 +296,96 @@ def run_pipeline() -> Any:
         }), 500
 
 
+def _pipeline_job(data: Dict[str, Any], session: Optional[str] = None):
+    """
+    Pipeline body shared by /api/run (called directly) and /api/jobs (run as a
+    job): optional answer_key_paths + answer_sheet_path(s) + related_docs_paths
+    to save first, else the files already in the workspace.
+    """
+    workspace = workspace_manager.path_for(session) if session else None
+    answer_keys = data.get("answer_key_paths", [])
+    answer_sheet = data.get("answer_sheet_path")
+    related = data.get("related_docs_paths", [])
+
+    streaming = data.get("streaming")
+
+    def run(progress):
+        if answer_keys and answer_sheet:
+            print("Running pipeline with provided paths...")
+            answer_sheets = answer_sheet if isinstance(answer_sheet, list) else [answer_sheet]
+            return run_pipeline_after_uploads(answer_keys, answer_sheets, related, progress=progress,
+                                              workspace_root=workspace, ocr_service=ocr_service,
+                                              streaming=streaming)
+        print("Running pipeline on existing files...")
+        controller = PipelineController(progress=progress, streaming=streaming, workspace_root=workspace,
+                                        ocr_service=ocr_service)
+        return {"status": "success", "saved": {}, "results": controller.run_pipeline()}
+
+    return run
+
+
+@app.route("/api/jobs", methods=["POST"])
+def create_job() -> Any:
+    """
+    Starts the pipeline in the background (same body as /api/run, including
+    the optional "streaming": true) and returns the job id right away. Follow it with GET /api/jobs/<id> or the
+    Server-Sent Events stream at /api/jobs/<id>/events.
+    """
+    data: Dict[str, Any] = request.get_json(silent=True) or {}
+    session = _session_id()
+    job = job_manager.submit(_pipeline_job(data, session), session=session)
+    print(f"🚀 Queued pipeline job {job['job_id']}")
+    job.update(
+        status_url=f"/api/jobs/{job['job_id']}",
+        events_url=f"/api/jobs/{job['job_id']}/events",
+    )
+    return jsonify(job), 202
+
+
+@app.route("/api/jobs", methods=["GET"])
+def list_jobs() -> Any:
+    return jsonify({"jobs": job_manager.list_jobs(session=_session_id())})
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str) -> Any:
+    """Job status with per-stage progress; "result" holds the /api/run response once completed."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id: str) -> Any:
+    """
+    Server-Sent Events: one "progress" event per stage / sheet update, then a
+    final "done" event with the job status. Reconnecting clients resume from
+    Last-Event-ID (or ?after=N).
+    """
+    if job_manager.get(job_id, include_result=False) is None:
+        return jsonify({"error": "Job not found"}), 404
+    after = request.headers.get("Last-Event-ID", type=int)
+    after = request.args.get("after", 0, type=int) if after is None else after + 1
+
+    def stream():
+        for event in job_manager.follow(job_id, after=after):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['seq']}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+        job = job_manager.get(job_id, include_result=False) or {}
+        yield f"event: done\ndata: {json.dumps({'job_id': job_id, 'status': job.get('status')})}\n\n"
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.route("/api/results/current-student", methods=["GET"]) 
 def current_student() -> Any:
     """Get current student JSON"""
     try:
-        controller = PipelineController()
+        controller = _controller()
         path = controller.evaluator_temp_student
         if os.path.isfile(path):
             with open(path, "r", encoding="utf-8") as f:
@@ -245,7 +400,7 @@ def current_student() -> Any:
 def get_preprocessor_outputs() -> Any:
     """Get list of aligned output images from preprocessor"""
     try:
-        controller = PipelineController()
+        controller = _controller()
         outputs_dir = controller.preprocessor_outputs_dir
         images = []
         if os.path.isdir(outputs_dir):
@@ -261,7 +416,7 @@ def get_preprocessor_outputs() -> Any:
 def serve_preprocessor_image(filename: str):
     """Serve aligned output images"""
     try:
-        controller = PipelineController()
+        controller = _controller()
         return send_from_directory(controller.preprocessor_outputs_dir, filename)
     except Exception as e:
         return jsonify({"error": str(e)}), 404
@@ -271,8 +426,8 @@ def serve_preprocessor_image(filename: str):
 def get_text_recognition_outputs() -> Any:
     """Get list of debug crop images from text recognition"""
     try:
-        controller = PipelineController()
-        debug_dir = os.path.join(controller.text_recognition_dir, "debug_crops")
+        controller = _controller()
+        debug_dir = controller.debug_crops_dir
         images = []
         if os.path.isdir(debug_dir):
             image_files = glob.glob(os.path.join(debug_dir, "*.png")) + \
@@ -287,8 +442,8 @@ def get_text_recognition_outputs() -> Any:
 def serve_text_recognition_image(filename: str):
     """Serve debug crop images"""
     try:
-        controller = PipelineController()
-        debug_dir = os.path.join(controller.text_recognition_dir, "debug_crops")
+        controller = _controller()
+        debug_dir = controller.debug_crops_dir
         return send_from_directory(debug_dir, filename)
     except Exception as e:
         return jsonify({"error": str(e)}), 404
@@ -298,8 +453,8 @@ def serve_text_recognition_image(filename: str):
 def get_region_selector_outputs() -> Any:
     """Get list of region selector evaluation result images"""
     try:
-        controller = PipelineController()
-        region_selector_dir = os.path.join(controller.region_selector_dir, "evaluation_results")
+        controller = _controller()
+        region_selector_dir = controller.region_results_dir
         images = []
         if os.path.isdir(region_selector_dir):
             image_files = glob.glob(os.path.join(region_selector_dir, "*.png")) + \
@@ -314,8 +469,8 @@ def get_region_selector_outputs() -> Any:
 def serve_region_selector_image(filename: str):
     """Serve region selector evaluation result images"""
     try:
-        controller = PipelineController()
-        region_selector_dir = os.path.join(controller.region_selector_dir, "evaluation_results")
+        controller = _controller()
+        region_selector_dir = controller.region_results_dir
         return send_from_directory(region_selector_dir, filename)
     except Exception as e:
         return jsonify({"error": str(e)}), 404
@@ -325,8 +480,8 @@ def serve_region_selector_image(filename: str):
 def get_visualizations() -> Any:
     """Get list of visualization images"""
     try:
-        controller = PipelineController()
-        viz_dir = os.path.join(controller.evaluator_dir, "results", "visualizations")
+        controller = _controller()
+        viz_dir = controller.visualizations_dir
         images = []
         if os.path.isdir(viz_dir):
             image_files = glob.glob(os.path.join(viz_dir, "*.png"))
@@ -340,8 +495,8 @@ def get_visualizations() -> Any:
 def serve_visualization(filename: str):
     """Serve visualization images"""
     try:
-        controller = PipelineController()
-        viz_dir = os.path.join(controller.evaluator_dir, "results", "visualizations")
+        controller = _controller()
+        viz_dir = controller.visualizations_dir
         return send_from_directory(viz_dir, filename)
     except Exception as e:
         return jsonify({"error": str(e)}), 404
@@ -351,7 +506,7 @@ def serve_visualization(filename: str):
 def list_all_outputs() -> Any:
     """Get all available outputs from all stages"""
     try:
-        controller = PipelineController()
+        controller = _controller()
         
         # Preprocessor outputs (aligned images)
         preprocessor_images = []
@@ -361,7 +516,7 @@ def list_all_outputs() -> Any:
             preprocessor_images = [os.path.basename(f) for f in image_files]
         
         # Region selector evaluation results
-        region_selector_dir = os.path.join(controller.region_selector_dir, "evaluation_results")
+        region_selector_dir = controller.region_results_dir
         region_selector_images = []
         if os.path.isdir(region_selector_dir):
             image_files = glob.glob(os.path.join(region_selector_dir, "*.png")) + \
@@ -369,7 +524,7 @@ def list_all_outputs() -> Any:
             region_selector_images = sorted([os.path.basename(f) for f in image_files])
         
         # Text recognition debug crops
-        debug_dir = os.path.join(controller.text_recognition_dir, "debug_crops")
+        debug_dir = controller.debug_crops_dir
         debug_images = []
         if os.path.isdir(debug_dir):
             image_files = glob.glob(os.path.join(debug_dir, "*.png")) + \
@@ -388,15 +543,15 @@ def list_all_outputs() -> Any:
                 print(f"Error reading text recognition JSON: {e}")
         
         # Evaluator visualizations
-        viz_dir = os.path.join(controller.evaluator_dir, "results", "visualizations")
+        viz_dir = controller.visualizations_dir
         visualization_images = []
         if os.path.isdir(viz_dir):
             image_files = glob.glob(os.path.join(viz_dir, "*.png"))
             visualization_images = sorted([os.path.basename(f) for f in image_files])
         
-        # Evaluation results
-        results_json = os.path.join(controller.evaluator_dir, "results", "evaluation_results.json")
-        results_exists = os.path.isfile(results_json)
+        # Evaluation results (results store, or a JSON file from before it existed)
+        results_exists = any(os.path.isfile(os.path.join(controller.evaluator_results_dir, name))
+                             for name in ("results.sqlite", "evaluation_results.json"))
         
         # Current student file
         current_student_exists = os.path.isfile(controller.evaluator_temp_student)
@@ -435,12 +590,37 @@ def list_all_outputs() -> Any:
         return jsonify({"error": str(e)}), 500
 
 
+def _page_args() -> Tuple[Optional[int], Optional[int], int, Optional[int]]:
+    """(page, page_size, offset, limit) from ?page=N&page_size=M; limit is None without them."""
+    page = request.args.get("page", type=int)
+    page_size = request.args.get("page_size", type=int)
+    if page is None and page_size is None:
+        return None, None, 0, None
+    page = max(1, page or 1)
+    page_size = max(1, min(page_size or 50, 500))
+    return page, page_size, (page - 1) * page_size, page_size
+
+
 @app.route("/api/results/evaluation", methods=["GET"]) 
 def evaluation_results() -> Any:
-    """Get the full evaluation results JSON"""
+    """
+    Evaluation results in the evaluation_results.json layout, read from the
+    results store on demand. Optional ?page=N&page_size=M returns one page.
+    """
     try:
-        controller = PipelineController()
-        results_path = os.path.join(controller.evaluator_dir, "results", "evaluation_results.json")
+        page, page_size, offset, limit = _page_args()
+        controller = _controller()
+        store = controller.open_results_store()
+        if store is not None:
+            try:
+                data = {"students": store.list_students(offset=offset, limit=limit)}
+                if limit is not None:
+                    data.update(page=page, page_size=page_size, total_students=store.count_students())
+            finally:
+                store.close()
+            return jsonify(data)
+        # Results written before the results store existed
+        results_path = os.path.join(controller.evaluator_results_dir, "evaluation_results.json")
         if os.path.isfile(results_path):
             with open(results_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
@@ -450,73 +630,94 @@ def evaluation_results() -> Any:
         return jsonify({"error": str(e)}), 500
 
 
+def _process_student_result(student: Dict[str, Any]) -> Dict[str, Any]:
+    """Process student data to match frontend expectations"""
+    student_info = student.get("student_info", {})
+    total_awarded = student.get("total_awarded_marks", 0)
+    total_possible = student.get("total_possible_marks", 0)
+    answers = student.get("answers", {})
+
+    # Calculate additional metrics
+    correct_count = sum(1 for q in answers.values() if q.get("awarded_marks", 0) > 0)
+    incorrect_count = len(answers) - correct_count
+    percentage = (total_awarded / total_possible * 100) if total_possible > 0 else 0
+
+    # Convert answers to question_results format for frontend
+    question_results = []
+    for q_num, q_data in answers.items():
+        question_results.append({
+            "question_number": q_num,
+            "student_answer": q_data.get("answer", ""),
+            "correct_answer": "",  # We don't have this in current format
+            "is_correct": q_data.get("awarded_marks", 0) > 0,
+            "marks": q_data.get("awarded_marks", 0),
+            "max_marks": q_data.get("max_marks", 0),
+            "feedback": q_data.get("feedback", "")
+        })
+
+    return {
+        "student_id": student_info.get("roll_no", ""),
+        "name": student_info.get("name", ""),
+        "total_score": total_awarded,
+        "max_score": total_possible,
+        "score": total_awarded,
+        "total": total_awarded,
+        "percentage": percentage,
+        "correct_count": correct_count,
+        "incorrect_count": incorrect_count,
+        "total_questions": len(answers),
+        "question_results": question_results,
+        "answers": answers,  # Keep original format too
+        "raw_data": student  # Keep original data
+    }
+
+
 @app.route("/api/results/all-students", methods=["GET"]) 
 def all_students_results() -> Any:
-    """Get all students' results with processed data for frontend"""
+    """
+    Get all students' results with processed data for frontend.
+    Optional ?page=N&page_size=M (page starts at 1) returns one page; the
+    summary always covers every student.
+    """
     try:
-        controller = PipelineController()
-        results_path = os.path.join(controller.evaluator_dir, "results", "evaluation_results.json")
-        if not os.path.isfile(results_path):
-            return jsonify({"error": "evaluation_results.json not found"}), 404
-            
-        with open(results_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        students = data.get("students", [])
-        processed_students = []
-        
-        for student in students:
-            # Process student data to match frontend expectations
-            student_info = student.get("student_info", {})
-            total_awarded = student.get("total_awarded_marks", 0)
-            total_possible = student.get("total_possible_marks", 0)
-            answers = student.get("answers", {})
-            
-            # Calculate additional metrics
-            correct_count = sum(1 for q in answers.values() if q.get("awarded_marks", 0) > 0)
-            incorrect_count = len(answers) - correct_count
-            percentage = (total_awarded / total_possible * 100) if total_possible > 0 else 0
-            
-            # Convert answers to question_results format for frontend
-            question_results = []
-            for q_num, q_data in answers.items():
-                question_results.append({
-                    "question_number": q_num,
-                    "student_answer": q_data.get("answer", ""),
-                    "correct_answer": "",  # We don't have this in current format
-                    "is_correct": q_data.get("awarded_marks", 0) > 0,
-                    "marks": q_data.get("awarded_marks", 0),
-                    "max_marks": q_data.get("max_marks", 0),
-                    "feedback": q_data.get("feedback", "")
-                })
-            
-            processed_student = {
-                "student_id": student_info.get("roll_no", ""),
-                "name": student_info.get("name", ""),
-                "total_score": total_awarded,
-                "max_score": total_possible,
-                "score": total_awarded,
-                "total": total_awarded,
-                "percentage": percentage,
-                "correct_count": correct_count,
-                "incorrect_count": incorrect_count,
-                "total_questions": len(answers),
-                "question_results": question_results,
-                "answers": answers,  # Keep original format too
-                "raw_data": student  # Keep original data
-            }
-            
-            processed_students.append(processed_student)
-        
-        return jsonify({
-            "students": processed_students,
-            "total_students": len(processed_students),
-            "summary": {
-                "average_score": sum(s["total_score"] for s in processed_students) / len(processed_students) if processed_students else 0,
-                "highest_score": max(s["total_score"] for s in processed_students) if processed_students else 0,
-                "lowest_score": min(s["total_score"] for s in processed_students) if processed_students else 0
+        page, page_size, offset, limit = _page_args()
+        controller = _controller()
+        store = controller.open_results_store()
+        if store is not None:
+            try:
+                students = store.list_students(offset=offset, limit=limit)
+                summary = store.score_summary()
+            finally:
+                store.close()
+            total_students = summary.pop("total_students")
+        else:
+            # Results written before the results store existed
+            results_path = os.path.join(controller.evaluator_results_dir, "evaluation_results.json")
+            if not os.path.isfile(results_path):
+                return jsonify({"error": "evaluation_results.json not found"}), 404
+            with open(results_path, "r", encoding="utf-8") as f:
+                all_students = json.load(f).get("students", [])
+            scores = [s.get("total_awarded_marks", 0) for s in all_students]
+            total_students = len(all_students)
+            summary = {
+                "average_score": sum(scores) / len(scores) if scores else 0,
+                "highest_score": max(scores) if scores else 0,
+                "lowest_score": min(scores) if scores else 0
             }
-        })
+            students = all_students[offset:None if limit is None else offset + limit]
+
+        response = {
+            "students": [_process_student_result(student) for student in students],
+            "total_students": total_students,
+            "summary": summary
+        }
+        if limit is not None:
+            response.update({
+                "page": page,
+                "page_size": page_size,
+                "total_pages": (total_students + page_size - 1) // page_size
+            })
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -526,7 +727,7 @@ def all_students_results() -> Any:
 def get_questions_for_reference() -> Any:
     """Get list of questions detected from student answers or region selector"""
     try:
-        controller = PipelineController()
+        controller = _controller()
         questions = []
         
         # Try to get questions from student answers JSON (after text recognition)
@@ -544,7 +745,7 @@ def get_questions_for_reference() -> Any:
                     })
         
         # Try to get from region selector agent1_output (count ROIs)
-        agent1_output_dir = os.path.join(controller.region_selector_dir, "agent1_output")
+        agent1_output_dir = controller.agent1_output_dir
         if os.path.isdir(agent1_output_dir):
             json_files = glob.glob(os.path.join(agent1_output_dir, "*_data.json"))
             if json_files:
@@ -562,7 +763,7 @@ def get_questions_for_reference() -> Any:
                         })
         
         # Try to get from existing reference answers
-        reference_path = os.path.join(controller.evaluator_dir, "inputs", "reference_answers.json")
+        reference_path = controller.reference_answers_file
         if os.path.isfile(reference_path):
             with open(reference_path, "r", encoding="utf-8") as f:
                 ref_data = json.load(f)
@@ -589,8 +790,8 @@ def get_questions_for_reference() -> Any:
 def update_reference_answers() -> Any:
     """Update reference answers JSON with provided answers"""
     try:
-        controller = PipelineController()
-        reference_path = os.path.join(controller.evaluator_dir, "inputs", "reference_answers.json")
+        controller = _controller()
+        reference_path = controller.reference_answers_file
         
         data = request.get_json(silent=True) or {}
         answers = data.get("answers", {})
@@ -653,7 +854,7 @@ def update_reference_answers() -> Any:
 def save_student_info() -> Any:
     """Save student name and roll number mapping for answer sheets"""
     try:
-        controller = PipelineController()
+        controller = _controller()
         data = request.get_json(silent=True) or {}
         student_info_map = data.get("student_info", {})  # {filename: {name: "...", roll_no: "..."}}
         
@@ -695,8 +896,8 @@ def save_student_info() -> Any:
 def get_reference_answers() -> Any:
     """Get current reference answers"""
     try:
-        controller = PipelineController()
-        reference_path = os.path.join(controller.evaluator_dir, "inputs", "reference_answers.json")
+        controller = _controller()
+        reference_path = controller.reference_answers_file
         
         if os.path.isfile(reference_path):
             with open(reference_path, "r", encoding="utf-8") as f:
@@ -717,8 +918,19 @@ def close_session() -> Any:
         print("🔒 Closing session and cleaning up outputs...")
         print("="*60)
         
-        controller = PipelineController()
-        result = controller.cleanup_session_outputs()
+        # Outputs (and the workspace) of a session whose job is queued or running stay in place
+        session = _session_id()
+        with job_manager.idle_session(session) as idle:
+            if not idle:
+                print("❌ A pipeline job of this session is still running")
+                return jsonify({"error": "a pipeline job of this session is still queued or running"}), 409
+
+            controller = _controller()
+            result = controller.cleanup_session_outputs()
+
+            # A session's workspace goes away with it
+            if session:
+                result["workspace_removed"] = workspace_manager.remove(session)
         
         return jsonify(result)
     
@@ -1,5 +1,27 @@
 const API_BASE = import.meta.env.VITE_API_URL || 'http://localhost:5000';
 
+// Each browser tab works in its own server-side workspace, so two exams
+// processed at the same time don't overwrite each other's files.
+const SESSION_KEY = 'paperbrain-session-id';
+
+export function getSessionId() {
+  let id = sessionStorage.getItem(SESSION_KEY);
+  if (!id) {
+    id = (crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`);
+    sessionStorage.setItem(SESSION_KEY, id);
+  }
+  return id;
+}
+
+// For URLs the browser loads itself (img src, EventSource), which can't carry headers
+export function withSession(url) {
+  return `${url}${url.includes('?') ? '&' : '?'}session=${encodeURIComponent(getSessionId())}`;
+}
+
+function sessionFetch(url, options = {}) {
+  return fetch(url, { ...options, headers: { ...(options.headers || {}), 'X-Session-Id': getSessionId() } });
+}
+
 export async function apiUpload(answerKeys, answerSheets, relatedDocs = []) {
   const formData = new FormData();
   
@@ -21,7 +43,7 @@ export async function apiUpload(answerKeys, answerSheets, relatedDocs = []) {
     formData.append('related_docs[]', file);
   });
 
-  const resp = await fetch(`${API_BASE}/api/upload`, {
+  const resp = await sessionFetch(`${API_BASE}/api/upload`, {
     method: 'POST',
     body: formData
   });
@@ -32,7 +54,7 @@ export async function apiUpload(answerKeys, answerSheets, relatedDocs = []) {
 }
 
 export async function apiSaveStudentInfo(studentInfo) {
-  const resp = await fetch(`${API_BASE}/api/student-info`, {
+  const resp = await sessionFetch(`${API_BASE}/api/student-info`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ student_info: studentInfo })
@@ -43,7 +65,7 @@ export async function apiSaveStudentInfo(studentInfo) {
 }
 
 export async function apiRunPipeline() {
-  const resp = await fetch(`${API_BASE}/api/run`, {
+  const resp = await sessionFetch(`${API_BASE}/api/run`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({})
@@ -54,50 +76,129 @@ export async function apiRunPipeline() {
   return data;
 }
 
+// Background pipeline job: returns { job_id, status, ... } immediately
+export async function apiStartJob(body = {}) {
+  const resp = await sessionFetch(`${API_BASE}/api/jobs`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body)
+  });
+  const data = await resp.json().catch(() => ({}));
+  if (!resp.ok) throw new Error(data.error || `Could not start pipeline (${resp.status})`);
+  return data;
+}
+
+export async function apiGetJob(jobId) {
+  const resp = await sessionFetch(`${API_BASE}/api/jobs/${jobId}`);
+  const data = await resp.json().catch(() => ({}));
+  if (!resp.ok) throw new Error(data.error || `Job not found (${resp.status})`);
+  return data;
+}
+
+// Streams job progress (Server-Sent Events, falling back to polling every
+// pollMs) and resolves with the finished job. onProgress gets the job
+// snapshot after every update.
+export function apiFollowJob(jobId, onProgress = () => {}, pollMs = 2000) {
+  return new Promise((resolve, reject) => {
+    let finished = false;
+
+    const refresh = async () => {
+      const job = await apiGetJob(jobId);
+      onProgress(job);
+      if (job.status === 'completed' || job.status === 'failed') {
+        finished = true;
+        resolve(job);
+      }
+      return job;
+    };
+
+    const poll = async () => {
+      try {
+        await refresh();
+        if (!finished) setTimeout(poll, pollMs);
+      } catch (err) {
+        reject(err);
+      }
+    };
+
+    if (typeof EventSource === 'undefined') {
+      poll();
+      return;
+    }
+
+    const source = new EventSource(withSession(`${API_BASE}/api/jobs/${jobId}/events`));
+    source.addEventListener('progress', () => {
+      refresh().catch(() => {});
+    });
+    source.addEventListener('done', () => {
+      source.close();
+      poll();
+    });
+    source.onerror = () => {
+      // Stream dropped (proxy, server restart): keep going by polling
+      source.close();
+      if (!finished) poll();
+    };
+  });
+}
+
+// Same result as apiRunPipeline, without holding one request open for the whole run
+export async function apiRunPipelineJob(onProgress) {
+  const job = await apiStartJob({});
+  const finished = await apiFollowJob(job.job_id, onProgress);
+  if (finished.status === 'failed') throw new Error(finished.error || 'Pipeline failed');
+  return finished.result;
+}
+
 export async function apiCurrentStudent() {
-  const resp = await fetch(`${API_BASE}/api/results/current-student`);
+  const resp = await sessionFetch(`${API_BASE}/api/results/current-student`);
   const data = await resp.json().catch(() => ({}));
   if (!resp.ok) throw new Error(data.error || `Not found (${resp.status})`);
   return data;
 }
 
 export async function apiOutputsList() {
-  const resp = await fetch(`${API_BASE}/api/outputs/list`);
+  const resp = await sessionFetch(`${API_BASE}/api/outputs/list`);
   const data = await resp.json().catch(() => ({}));
   if (!resp.ok) throw new Error(`Failed to load outputs (${resp.status})`);
   return data;
 }
 
 export async function apiEvaluationResults() {
-  const resp = await fetch(`${API_BASE}/api/results/evaluation`);
+  const resp = await sessionFetch(`${API_BASE}/api/results/evaluation`);
   const data = await resp.json().catch(() => ({}));
   if (!resp.ok) throw new Error(data.error || `Not found (${resp.status})`);
   return data;
 }
 
-export async function apiAllStudentsResults() {
-  const resp = await fetch(`${API_BASE}/api/results/all-students`);
+// Without page/pageSize every student is returned (as before)
+export async function apiAllStudentsResults(page, pageSize) {
+  const params = new URLSearchParams();
+  if (page) params.set('page', page);
+  if (pageSize) params.set('page_size', pageSize);
+  const query = params.toString() ? `?${params}` : '';
+  const resp = await sessionFetch(`${API_BASE}/api/results/all-students${query}`);
   const data = await resp.json().catch(() => ({}));
   if (!resp.ok) throw new Error(data.error || `Not found (${resp.status})`);
   return data;
 }
 
 export async function apiGetQuestionsForReference() {
-  const resp = await fetch(`${API_BASE}/api/reference-answers/questions`);
+  const resp = await sessionFetch(`${API_BASE}/api/reference-answers/questions`);
   const data = await resp.json().catch(() => ({}));
   if (!resp.ok) throw new Error(data.error || `Failed to get questions (${resp.status})`);
   return data;
 }
 
 export async function apiGetReferenceAnswers() {
-  const resp = await fetch(`${API_BASE}/api/reference-answers`);
+  const resp = await sessionFetch(`${API_BASE}/api/reference-answers`);
   const data = await resp.json().catch(() => ({}));
   if (!resp.ok) throw new Error(data.error || `Failed to get reference answers (${resp.status})`);
   return data;
 }
 
 export async function apiUpdateReferenceAnswers(answers) {
-  const resp = await fetch(`${API_BASE}/api/reference-answers/update`, {
+  const resp = await sessionFetch(`${API_BASE}/api/reference-answers/update`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ answers })
@@ -109,7 +210,7 @@ export async function apiUpdateReferenceAnswers(answers) {
 
 export async function apiCloseSession() {
   try {
-    const resp = await fetch(`${API_BASE}/api/session/close`, {
+    const resp = await sessionFetch(`${API_BASE}/api/session/close`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' }
     });
@@ -130,7 +231,7 @@ export function getImageUrl(type, filename) {
     'region-selector': `/api/outputs/region-selector/${filename}`,
     visualizations: `/api/outputs/visualizations/${filename}`
   };
-  return `${API_BASE}${paths[type] || ''}`;
+  return withSession(`${API_BASE}${paths[type] || ''}`);
 }
 
 export { API_BASE };
\ No newline at end of file
@@ -1,10 +1,78 @@
 import { useState } from 'react';
+import { withSession } from '../api';
 
-export default function PipelineOutputs({ outputs }) {
+// Pipeline job stages (controller/jobs.py progress events)
+export const STAGE_LABELS = {
+  align: 'Aligning answer sheets',
+  regions: 'Selecting answer regions',
+  ocr: 'Recognizing text',
+  grade: 'Grading answers'
+};
+
+// Per-stage progress of a pipeline job snapshot from /api/jobs/<id>
+export function JobProgress({ progress }) {
+  if (!progress || !progress.stages) return null;
+
+  return (
+    <section style={{
+      marginBottom: '3rem',
+      padding: '2rem',
+      backgroundColor: 'rgba(17, 24, 39, 0.4)',
+      backdropFilter: 'blur(10px)',
+      border: '1px solid rgba(255, 255, 255, 0.1)',
+      borderRadius: '16px'
+    }}>
+      <h2 style={{
+        fontSize: '1.5rem',
+        fontWeight: 600,
+        marginBottom: '1.5rem'
+      }}>
+        Pipeline Progress ({progress.status})
+      </h2>
+      {Object.keys(STAGE_LABELS).filter(stage => progress.stages[stage]).map(stage => {
+        const { status, done, total } = progress.stages[stage];
+        const percent = total ? Math.round((done / total) * 100) : (status === 'completed' ? 100 : 0);
+        return (
+          <div key={stage} style={{ marginBottom: '1rem' }}>
+            <div style={{
+              display: 'flex',
+              justifyContent: 'space-between',
+              fontSize: '0.95rem',
+              color: 'rgba(255, 255, 255, 0.8)',
+              marginBottom: '0.4rem'
+            }}>
+              <span>{STAGE_LABELS[stage]}</span>
+              <span>{total ? `${done}/${total} · ` : ''}{status}</span>
+            </div>
+            <div style={{
+              height: '6px',
+              backgroundColor: 'rgba(255, 255, 255, 0.1)',
+              borderRadius: '100px',
+              overflow: 'hidden'
+            }}>
+              <div style={{
+                width: `${percent}%`,
+                height: '100%',
+                backgroundColor: status === 'error' || status === 'failed' ? '#ef4444' : '#5227FF',
+                transition: 'width 0.3s ease'
+              }} />
+            </div>
+          </div>
+        );
+      })}
+    </section>
+  );
+}
+
+export default function PipelineOutputs({ outputs, progress }) {
   const [selectedImage, setSelectedImage] = useState(null);
   const [zoom, setZoom] = useState(1);
   const [position, setPosition] = useState({ x: 0, y: 0 });
 
+  if (!outputs && progress) {
+    return <JobProgress progress={progress} />;
+  }
+
   if (!outputs) {
     return (
       <div style={{
@@ -24,7 +92,7 @@ export default function PipelineOutputs({ outputs }) {
   const { preprocessor, region_selector, text_recognition, evaluator } = outputs;
 
   const getImageUrl = (stage, filename) => {
-    return `/api/outputs/${stage}/${filename}`;
+    return withSession(`/api/outputs/${stage}/${filename}`);
   };
 
   const handleImageClick = (stage, filename) => {
@@ -129,6 +197,8 @@ export default function PipelineOutputs({ outputs }) {
 
   return (
     <div>
+      <JobProgress progress={progress} />
+
       {preprocessor && preprocessor.count > 0 && (
         <Section
           title="Preprocessor - Aligned Outputs"
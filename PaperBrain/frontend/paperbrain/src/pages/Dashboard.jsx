@@ -1,8 +1,8 @@
 import { useState, useEffect } from 'react';
-import { apiUpload, apiRunPipeline, apiOutputsList, apiCurrentStudent, apiGetQuestionsForReference, apiGetReferenceAnswers, apiUpdateReferenceAnswers, apiSaveStudentInfo } from '../api';
+import { apiUpload, apiRunPipelineJob, apiOutputsList, apiCurrentStudent, apiGetQuestionsForReference, apiGetReferenceAnswers, apiUpdateReferenceAnswers, apiSaveStudentInfo } from '../api';
 import ImageGrid from '../components/ImageGrid';
 import UploadPanel from '../components/UploadPanel';
-import PipelineOutputs from '../components/PipelineOutputs';
+import PipelineOutputs, { STAGE_LABELS } from '../components/PipelineOutputs';
 
 // DotGrid Component
 function DotGrid({ 
@@ -37,6 +37,7 @@ export default function Dashboard() {
   const [messageType, setMessageType] = useState('info');
   const [uploaded, setUploaded] = useState(false);
   const [pipelineOutputs, setPipelineOutputs] = useState(null);
+  const [jobProgress, setJobProgress] = useState(null);
   const [studentResults, setStudentResults] = useState(null);
   const [showResults, setShowResults] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(0);
@@ -245,9 +246,17 @@ export default function Dashboard() {
     setShowResults(false);
     
     try {
-      // Run the pipeline
+      // Run the pipeline as a background job and follow its progress
       setMessage('🔄 Running preprocessor...');
-      await apiRunPipeline();
+      setJobProgress(null);
+      await apiRunPipelineJob(job => {
+        setJobProgress(job);
+        const stage = job.stages?.[job.stage];
+        if (stage) {
+          const count = stage.total ? ` (${stage.done}/${stage.total} sheets)` : '';
+          setMessage(`🔄 ${STAGE_LABELS[job.stage] || job.stage}${count}...`);
+        }
+      });
       setMessage('✅ Pipeline completed! Fetching results...');
       
       // Get the outputs
@@ -373,6 +382,11 @@ export default function Dashboard() {
         {/* Message Display */}
         <div style={getMessageStyle()}>{message}</div>
 
+        {/* Live progress of the running pipeline job */}
+        {running && jobProgress && (
+          <PipelineOutputs outputs={null} progress={jobProgress} />
+        )}
+
         {/* Demo sections */}
         <div style={{
           display: 'grid',
@@ -584,7 +598,7 @@ export default function Dashboard() {
               </section>
             )}
 
-            {pipelineOutputs && <PipelineOutputs outputs={pipelineOutputs} />}
+            {pipelineOutputs && <PipelineOutputs outputs={pipelineOutputs} progress={jobProgress} />}
           </div>
         )}
       </div>